@@ -0,0 +1,43 @@
+"""Hatch build hook that precompiles the bundled Jinja2 templates into the wheel.
+
+The compiled modules are loaded by marimushka.templating, so rendering the
+default template never parses it at run time. Editable installs are skipped,
+as their templates are edited in place.
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import jinja2
+from hatchling.builders.hooks.plugin.interface import BuildHookInterface
+
+# Must match marimushka.templating
+AUTOESCAPE = ["html", "xml"]
+COMPILED_TEMPLATES = "marimushka/templates/_compiled"
+COMPILED_VERSION = "JINJA_VERSION"
+
+
+class TemplateBuildHook(BuildHookInterface):
+    """Compile src/marimushka/templates into Python modules shipped with the wheel."""
+
+    PLUGIN_NAME = "custom"
+
+    def initialize(self, version: str, build_data: dict) -> None:
+        """Compile the templates into a temporary directory and force-include it."""
+        if self.target_name != "wheel" or version == "editable":
+            return
+
+        self._compiled = tempfile.mkdtemp(prefix="marimushka-templates-")
+        env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(Path(self.root) / "src" / "marimushka" / "templates"),
+            autoescape=jinja2.select_autoescape(AUTOESCAPE),
+        )
+        env.compile_templates(self._compiled, extensions=["j2"], zip=None, ignore_errors=False)
+        (Path(self._compiled) / COMPILED_VERSION).write_text(jinja2.__version__)
+        build_data["force_include"][self._compiled] = COMPILED_TEMPLATES
+
+    def finalize(self, version: str, build_data: dict, artifact_path: str) -> None:
+        """Remove the temporary directory with the compiled templates."""
+        if getattr(self, "_compiled", None):
+            shutil.rmtree(self._compiled, ignore_errors=True)
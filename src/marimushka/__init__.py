@@ -1,5 +1,9 @@
 """Marimushka."""
 
-import importlib.metadata
+try:
+    # Written by the hatch version build hook, reading it avoids importing importlib.metadata at start-up
+    from ._version import __version__
+except ImportError:  # source tree that was never built
+    import importlib.metadata
 
-__version__ = importlib.metadata.version("marimushka")
+    __version__ = importlib.metadata.version("marimushka")
@@ -0,0 +1,218 @@
+"""Archive module for streaming a built site into a tar or zip file.
+
+This module provides the SiteArchive class, which collects exported notebooks and
+the rendered index into a single archive as soon as they are produced, instead of
+leaving a full directory tree on disk. The archive can also be written to stdout.
+"""
+
+import hashlib
+import io
+import mmap
+import sys
+import tarfile
+import time
+import zipfile
+from pathlib import Path
+
+from loguru import logger
+
+# Archive formats keyed by the file suffix that selects them
+FORMATS = {
+    ".tar": "tar",
+    ".tar.gz": "tar.gz",
+    ".tgz": "tar.gz",
+    ".tar.bz2": "tar.bz2",
+    ".tbz2": "tar.bz2",
+    ".tar.xz": "tar.xz",
+    ".txz": "tar.xz",
+    ".zip": "zip",
+}
+
+# Target name that selects stdout instead of a file
+STDOUT = "-"
+
+# Files from this size on are hashed through a memory map instead of read in chunks
+MMAP_THRESHOLD = 1 << 20
+
+
+def file_digest(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file.
+
+    Large files are memory-mapped and hashed without copying them into Python
+    buffers; small files, and files that cannot be mapped, are read in chunks.
+    """
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        try:
+            if Path(path).stat().st_size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+                return digest.hexdigest()
+        except (OSError, ValueError):
+            f.seek(0)
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def archive_format(target: str | Path) -> str:
+    """Determine the archive format from the name of the target.
+
+    Args:
+        target (str | Path): Path of the archive, or "-" for stdout
+
+    Returns:
+        str: One of the values in FORMATS. Stdout always uses "tar.gz".
+
+    Raises:
+        ValueError: If the suffix of the target is not a supported archive format
+
+    >>> archive_format("site.tar.gz")
+    'tar.gz'
+    >>> archive_format("site.zip")
+    'zip'
+    >>> archive_format("-")
+    'tar.gz'
+
+    """
+    if str(target) == STDOUT:
+        return "tar.gz"
+
+    name = Path(target).name.lower()
+    for suffix in sorted(FORMATS, key=len, reverse=True):
+        if name.endswith(suffix):
+            return FORMATS[suffix]
+
+    raise ValueError(f"Unsupported archive format: {target!r}. Must end with one of {sorted(FORMATS)}")
+
+
+class SiteArchive:
+    """A tar or zip archive that the build streams its output into.
+
+    Files are added under their path relative to the site root. Each name is only
+    written once, so assets that several exports copy next to their HTML (e.g. a
+    shared public/ folder) appear a single time in the archive.
+
+    Attributes:
+        target (str | Path): Path of the archive, or "-" to write to stdout
+        format (str): The archive format, derived from the target
+
+    """
+
+    def __init__(self, target: str | Path):
+        """Prepare an archive for the given target without opening it yet.
+
+        Args:
+            target (str | Path): Path of the archive, or "-" to write to stdout
+
+        """
+        self.target = target
+        self.format = archive_format(target)
+        self._digests: dict[str, str] = {}
+        self._tar: tarfile.TarFile | None = None
+        self._zip: zipfile.ZipFile | None = None
+
+    def __enter__(self) -> "SiteArchive":
+        """Open the archive for writing."""
+        to_stdout = str(self.target) == STDOUT
+        fileobj = sys.stdout.buffer if to_stdout else None
+
+        if self.format == "zip":
+            self._zip = zipfile.ZipFile(fileobj or self.target, "w", compression=zipfile.ZIP_DEFLATED)
+        else:
+            compression = self.format.removeprefix("tar").lstrip(".")
+            # Streaming mode "w|" never seeks, which is required for pipes
+            mode = f"w{'|' if to_stdout else ':'}{compression}"
+            self._tar = tarfile.open(name=None if to_stdout else self.target, mode=mode, fileobj=fileobj)
+
+        logger.info(f"Writing {self.format} archive to {'stdout' if to_stdout else self.target}")
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Finalise and close the archive."""
+        if self._zip is not None:
+            self._zip.close()
+        if self._tar is not None:
+            self._tar.close()
+        if str(self.target) == STDOUT:
+            sys.stdout.buffer.flush()
+
+    @property
+    def names(self) -> set[str]:
+        """Return the names of all entries written so far."""
+        return set(self._digests)
+
+    @property
+    def digests(self) -> dict[str, str]:
+        """Return the SHA-256 hex digest of every entry written so far, keyed by name."""
+        return dict(self._digests)
+
+    def add_bytes(self, data: bytes, arcname: str | Path) -> bool:
+        """Add an in-memory file to the archive.
+
+        Args:
+            data (bytes): Content of the file
+            arcname (str | Path): Path of the file inside the archive
+
+        Returns:
+            bool: True if the entry was written, False if the name was already present
+
+        """
+        name = Path(arcname).as_posix()
+        if name in self._digests:
+            return False
+
+        if self._zip is not None:
+            self._zip.writestr(name, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            info.mode = 0o644
+            self._tar.addfile(info, io.BytesIO(data))
+
+        self._digests[name] = hashlib.sha256(data).hexdigest()
+        return True
+
+    def add_file(self, path: Path, arcname: str | Path) -> bool:
+        """Add a file from disk to the archive.
+
+        Args:
+            path (Path): File to read
+            arcname (str | Path): Path of the file inside the archive
+
+        Returns:
+            bool: True if the entry was written, False if the name was already present
+
+        """
+        name = Path(arcname).as_posix()
+        if name in self._digests:
+            return False
+
+        if self._zip is not None:
+            self._zip.write(path, name)
+        else:
+            self._tar.add(path, arcname=name, recursive=False)
+
+        self._digests[name] = file_digest(path)
+        return True
+
+    def absorb(self, root: Path) -> int:
+        """Move every file below a staging directory into the archive.
+
+        Files are removed from disk once they are archived, so the staging
+        directory never holds more than the output of the most recent export.
+
+        Args:
+            root (Path): Staging directory whose layout mirrors the site
+
+        Returns:
+            int: Number of new entries written to the archive
+
+        """
+        added = 0
+        for path in sorted(p for p in Path(root).rglob("*") if p.is_file()):
+            if self.add_file(path, path.relative_to(root)):
+                added += 1
+            path.unlink()
+        return added
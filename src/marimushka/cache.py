@@ -0,0 +1,66 @@
+"""Cache module for locating the persistent marimushka cache directory.
+
+Everything marimushka keeps between runs (compiled templates, exports, build
+history) lives below a single directory, so CI systems can restore and save it
+as one unit.
+"""
+
+import contextlib
+import os
+from collections.abc import Iterator
+from pathlib import Path
+
+# Environment variable that overrides the location of the cache
+CACHE_ENV = "MARIMUSHKA_CACHE_DIR"
+
+# Environment variable uv reads its cache location from, inherited by the export subprocesses
+UV_CACHE_ENV = "UV_CACHE_DIR"
+
+
+def cache_dir(name: str | None = None) -> Path:
+    """Return the marimushka cache directory, or a named subdirectory of it.
+
+    The location is taken from $MARIMUSHKA_CACHE_DIR, then $XDG_CACHE_HOME/marimushka,
+    then ~/.cache/marimushka. The directory is not created.
+
+    Args:
+        name (str, optional): Subdirectory for one kind of cached data
+
+    Returns:
+        Path: The cache directory
+
+    """
+    if os.environ.get(CACHE_ENV):
+        root = Path(os.environ[CACHE_ENV])
+    else:
+        root = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "marimushka"
+    return root / name if name else root
+
+
+@contextlib.contextmanager
+def use_cache_dir(path: str | Path) -> Iterator[Path]:
+    """Keep everything a build caches below one directory while the block runs.
+
+    Sets $MARIMUSHKA_CACHE_DIR to the directory and $UV_CACHE_DIR to its uv/
+    subdirectory, so the environments uv resolves for the sandboxed exports are
+    kept next to the exports themselves. Both variables are restored afterwards.
+
+    Args:
+        path (str | Path): The cache directory
+
+    Yields:
+        Path: The absolute cache directory
+
+    """
+    root = Path(path).resolve()
+    saved = {name: os.environ.get(name) for name in (CACHE_ENV, UV_CACHE_ENV)}
+    os.environ[CACHE_ENV] = str(root)
+    os.environ[UV_CACHE_ENV] = str(root / "uv")
+    try:
+        yield root
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
@@ -0,0 +1,156 @@
+"""Catalog module for splitting large indexes into pages and searching them.
+
+With thousands of notebooks a single index page becomes megabytes of DOM. This
+module splits the notebook sections into pages of a fixed size and builds a compact
+search index that the index page loads lazily for client-side filtering.
+"""
+
+import dataclasses
+import json
+import re
+from pathlib import Path
+
+from .notebook import Notebook
+
+# Name of the search index inside the site
+SEARCH_INDEX = "search-index.json"
+
+# File name of every page of the index after the first
+PAGE_NAME = re.compile(r"index-(\d+)\.html")
+
+
+def page_url(number: int) -> str:
+    """Return the site-relative URL of a page of the index.
+
+    The first page is the index itself, so existing links keep working.
+
+    >>> page_url(1)
+    'index.html'
+    >>> page_url(3)
+    'index-3.html'
+
+    """
+    return "index.html" if number == 1 else f"index-{number}.html"
+
+
+def surplus_pages(output: Path, pages: int) -> list[Path]:
+    """Return the index pages in an output directory numbered beyond the given page count."""
+    return sorted(
+        path
+        for path in Path(output).glob("index-*.html")
+        if (match := PAGE_NAME.fullmatch(path.name)) and int(match[1]) > pages
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class Page:
+    """One page of a paginated index.
+
+    Attributes:
+        page (int): Number of the page, starting at 1
+        pages (int): Total number of pages
+        notebooks (list[Notebook]): Static notebooks shown on this page
+        apps (list[Notebook]): Apps shown on this page
+        notebooks_wasm (list[Notebook]): Interactive notebooks shown on this page
+
+    """
+
+    page: int
+    pages: int
+    notebooks: list[Notebook] = dataclasses.field(default_factory=list)
+    apps: list[Notebook] = dataclasses.field(default_factory=list)
+    notebooks_wasm: list[Notebook] = dataclasses.field(default_factory=list)
+
+    @property
+    def url(self) -> str:
+        """Return the site-relative URL of this page."""
+        return page_url(self.page)
+
+    @property
+    def urls(self) -> list[str]:
+        """Return the URLs of all pages, in order."""
+        return [page_url(number) for number in range(1, self.pages + 1)]
+
+    @property
+    def previous(self) -> str | None:
+        """Return the URL of the previous page, or None on the first page."""
+        return page_url(self.page - 1) if self.page > 1 else None
+
+    @property
+    def next(self) -> str | None:
+        """Return the URL of the next page, or None on the last page."""
+        return page_url(self.page + 1) if self.page < self.pages else None
+
+
+def paginate(
+    page_size: int,
+    notebooks: list[Notebook] | None = None,
+    apps: list[Notebook] | None = None,
+    notebooks_wasm: list[Notebook] | None = None,
+) -> list[Page]:
+    """Split the notebook sections into pages of at most page_size entries.
+
+    The sections are laid out one after the other in the order the index shows
+    them (notebooks, notebooks_wasm, apps), so a page may end one section and
+    start the next one.
+
+    Args:
+        page_size (int): Maximum number of entries on a page
+        notebooks (list[Notebook], optional): Static notebooks
+        apps (list[Notebook], optional): Apps
+        notebooks_wasm (list[Notebook], optional): Interactive notebooks
+
+    Returns:
+        list[Page]: The pages, at least one even if all sections are empty
+
+    Raises:
+        ValueError: If page_size is not positive
+
+    >>> [(p.page, p.notebooks, p.apps) for p in paginate(2, notebooks=["a", "b", "c"], apps=["x"])]
+    [(1, ['a', 'b'], []), (2, ['c'], ['x'])]
+
+    """
+    if page_size < 1:
+        raise ValueError(f"Page size must be positive, got {page_size}")
+
+    entries = [
+        *(("notebooks", nb) for nb in notebooks or []),
+        *(("notebooks_wasm", nb) for nb in notebooks_wasm or []),
+        *(("apps", nb) for nb in apps or []),
+    ]
+    chunks = [entries[start : start + page_size] for start in range(0, len(entries), page_size)] or [[]]
+
+    pages = []
+    for number, chunk in enumerate(chunks, start=1):
+        sections: dict[str, list[Notebook]] = {"notebooks": [], "apps": [], "notebooks_wasm": []}
+        for section, nb in chunk:
+            sections[section].append(nb)
+        pages.append(Page(page=number, pages=len(chunks), **sections))
+    return pages
+
+
+def search_index(pages: list[Page]) -> bytes:
+    """Build the compact JSON search index of a paginated catalog.
+
+    Each entry carries the display name, kind, path and extracted title of a
+    notebook, and the page of the index that lists it.
+
+    Args:
+        pages (list[Page]): The pages of the index
+
+    Returns:
+        bytes: The UTF-8 encoded JSON document
+
+    """
+    entries = [
+        {
+            "name": nb.display_name,
+            "kind": nb.kind.value,
+            "path": nb.html_path.as_posix(),
+            "title": nb.title,
+            "page": page.url,
+        }
+        for page in pages
+        for nb in (*page.notebooks, *page.notebooks_wasm, *page.apps)
+    ]
+    return json.dumps(entries, separators=(",", ":"), ensure_ascii=False).encode()
@@ -0,0 +1,72 @@
+"""Changes module for selecting the notebooks a change touched.
+
+For pull request builds only the notebooks the pull request changed need to be
+exported. The local git repository is asked which files changed since the point
+where the current branch left a reference (the merge base, as in a pull request
+diff), including uncommitted and untracked files. A notebook is affected when its
+source, its lock or one of the data files it reads (see notebook.data_references)
+changed.
+"""
+
+import subprocess
+from pathlib import Path
+
+from .lockfile import lock_path
+from .notebook import Notebook, data_references
+
+
+def _git(*args: str, cwd: Path | None = None) -> str:
+    """Run a git command and return its output.
+
+    Raises:
+        ValueError: If git is not installed or the command fails
+
+    """
+    try:
+        result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True)
+    except FileNotFoundError as e:
+        raise ValueError("git is needed to find changed notebooks but was not found") from e
+    except subprocess.CalledProcessError as e:
+        raise ValueError(f"git {' '.join(args)} failed: {e.stderr.strip()}") from e
+    return result.stdout
+
+
+def changed_files(ref: str, cwd: str | Path | None = None) -> set[Path]:
+    """Return the files changed on the current branch since it left a git reference.
+
+    Args:
+        ref (str): The reference, e.g. "origin/main"
+        cwd (str | Path, optional): A directory inside the repository. Defaults to the
+            current directory.
+
+    Returns:
+        set[Path]: Absolute paths of changed, added, deleted and untracked files
+
+    Raises:
+        ValueError: If the directory is not in a git repository or the reference is unknown
+
+    """
+    top = Path(_git("rev-parse", "--show-toplevel", cwd=cwd).strip())
+    base = _git("merge-base", ref, "HEAD", cwd=cwd).strip()
+    names = _git("diff", "--name-only", "-z", "--no-renames", base, "--", cwd=cwd).split("\0")
+    names += _git("ls-files", "--others", "--exclude-standard", "-z", cwd=cwd).split("\0")
+    return {(top / name).resolve() for name in names if name}
+
+
+def affected(notebook: Notebook, changed: set[Path]) -> bool:
+    """Return True if a notebook's source, its lock or data it reads is among the changed files.
+
+    Deleted data files count as well, so they are matched against the references in
+    the source rather than against the files that exist.
+    """
+    source = notebook.path.resolve()
+    if source in changed or lock_path(notebook).resolve() in changed:
+        return True
+    folder = source.parent
+    data = [(folder / reference).resolve() for reference in data_references(source.read_text(encoding="utf-8"))]
+    return any(path == target or path.is_relative_to(target) for path in changed for target in data)
+
+
+def select_changed(notebooks: list[Notebook], changed: set[Path]) -> list[Notebook]:
+    """Return the notebooks affected by the changed files, in their original order."""
+    return [notebook for notebook in notebooks if affected(notebook, changed)]
@@ -0,0 +1,171 @@
+"""Delta module for publishing only the files of a site that a build changed.
+
+A build rewrites every export, even when the bytes are identical, and rsync or
+object-store sync steps that compare modification times then upload the whole
+site again. For a delta build the notebooks are therefore exported into a staging
+directory and only files whose bytes changed are copied into the site (see
+copy_if_changed), and auxiliary files are not rewritten either if their bytes are
+unchanged (see write_if_changed). The files of the output directory are hashed
+before and after the build to find what changed by content.
+
+The digests of every build are recorded in the marimushka cache directory, keyed
+by the resolved output directory. The next build is compared against that record,
+not against the files found on disk, so a build into a fresh checkout with a
+restored cache still lists only what changed since the last deploy. A file whose
+size and modification time are as recorded is not hashed again.
+
+The files that did change, or appeared, and the files that disappeared can be
+written to changed-files.txt and deleted-files.txt, one site-relative path per
+line, for deploy steps such as `rsync --files-from`. Pages of notebooks that no
+longer exist are removed from the site (see remove_stale_pages), so they are listed
+as deleted.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from loguru import logger
+
+from .archive import file_digest
+from .cache import cache_dir
+
+# Names of the delta manifests
+CHANGED_FILES = "changed-files.txt"
+DELETED_FILES = "deleted-files.txt"
+
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    """Write data to a file unless the file already holds exactly these bytes.
+
+    Returns:
+        bool: True if the file was written
+
+    """
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return True
+
+
+def copy_if_changed(source: Path, target: Path) -> bool:
+    """Copy a file with its metadata unless the target already has the same content.
+
+    Returns:
+        bool: True if the file was copied
+
+    """
+    try:
+        if target.stat().st_size == source.stat().st_size and file_digest(target) == file_digest(source):
+            return False
+    except OSError:
+        pass
+    target.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(source, target)
+    return True
+
+
+class SiteDelta:
+    """The files of an output directory before a build, to find what the build changed.
+
+    Attributes:
+        output (Path): The output directory
+        path (Path): The JSON file the digests of the last build are stored in
+        before (dict[str, tuple[int, int, str]]): Size, modification time (ns) and
+            SHA-256 of every file when the build started, by site-relative path
+        baseline (dict[str, tuple[int, int, str]]): The same for the files of the last
+            build, as recorded then; the files found on disk if nothing was recorded
+
+    """
+
+    def __init__(self, output: Path):
+        """Hash the files of an output directory, reusing the digests of unchanged files."""
+        self.output = Path(output)
+        key = hashlib.sha256(str(self.output.resolve()).encode()).hexdigest()[:16]
+        self.path = cache_dir("delta") / f"{key}.json"
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                recorded = {name: tuple(entry) for name, entry in json.load(f).items()}
+        except (OSError, ValueError, TypeError):
+            recorded = {}
+        self.before = self._scan(recorded)
+        self.baseline = recorded or self.before
+
+    def _scan(self, known: dict) -> dict[str, tuple[int, int, str]]:
+        """Return size, modification time and digest of every file, hashing those not known by their stat."""
+        files = {}
+        for dirpath, _, filenames in os.walk(self.output):
+            for filename in filenames:
+                path = Path(dirpath) / filename
+                try:
+                    stat = path.stat()
+                    name = path.relative_to(self.output).as_posix()
+                    entry = known.get(name)
+                    if entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+                        files[name] = entry
+                    else:
+                        files[name] = (stat.st_size, stat.st_mtime_ns, file_digest(path))
+                except OSError:
+                    continue
+        return files
+
+    def finish(self) -> tuple[list[str], list[str]]:
+        """Record the digests of the files after the build and return the delta.
+
+        Returns:
+            tuple[list[str], list[str]]: The files changed or new since the last build and the
+                files deleted since then, sorted
+
+        """
+        after = self._scan(self.before)
+        changed = [name for name, entry in after.items() if self.baseline.get(name, (0, 0, ""))[2] != entry[2]]
+        deleted = sorted(set(self.baseline) - set(after))
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.path.parent, delete=False) as f:
+                json.dump(after, f, sort_keys=True)
+            os.replace(f.name, self.path)
+        except OSError as e:
+            logger.debug(f"Could not record the site digests in {self.path}: {e}")
+        return sorted(changed), deleted
+
+
+def remove_stale_pages(output: str | Path, folders: list[str], pages: set[str]) -> list[str]:
+    """Delete the HTML pages directly inside the given folders of a site that no notebook produces any more.
+
+    Args:
+        output (str | Path): The output directory
+        folders (list[str]): Site-relative folders the pages of the notebooks are exported to
+        pages (set[str]): Site-relative paths of the pages the notebooks of this build produce
+
+    Returns:
+        list[str]: The removed pages, sorted
+
+    """
+    output = Path(output)
+    removed = []
+    for folder in folders:
+        for path in sorted((output / folder).glob("*.html")):
+            name = path.relative_to(output).as_posix()
+            if name not in pages:
+                path.unlink()
+                removed.append(name)
+    if removed:
+        logger.info(f"Removed {len(removed)} pages of notebooks that no longer exist: {', '.join(removed)}")
+    return removed
+
+
+def write_manifests(directory: str | Path, changed: list[str], deleted: list[str]) -> None:
+    """Write changed-files.txt and deleted-files.txt into a directory."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, files in ((CHANGED_FILES, changed), (DELETED_FILES, deleted)):
+        (directory / name).write_text("".join(f"{file}\n" for file in files), encoding="utf-8")
@@ -0,0 +1,134 @@
+"""Events module for following a build while it runs.
+
+A build reports its progress as a stream of typed events, so library users, the
+live progress view of the CLI (see progress.py) and dashboards see each notebook
+as it is discovered, queued, started and done:
+
+- DISCOVERED: a notebook was found in one of the folders
+- QUEUED: the notebook will be exported in this build
+- STARTED: its export started
+- CACHE_HIT, FINISHED or FAILED: exactly one of them ends every started export,
+  carrying how long it took
+
+Pass a callback to main(on_event=...) or iterate over build_events(...). Callbacks
+are called from the worker threads exporting the notebooks, so they must be
+thread-safe and fast.
+"""
+
+import dataclasses
+import enum
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterator
+from typing import Any
+
+from .notebook import Notebook
+
+
+class EventType(enum.Enum):
+    """What happened to a notebook."""
+
+    DISCOVERED = "discovered"
+    QUEUED = "queued"
+    STARTED = "started"
+    CACHE_HIT = "cache-hit"
+    FINISHED = "finished"
+    FAILED = "failed"
+
+    @property
+    def done(self) -> bool:
+        """Return True for the events that end an export."""
+        return self in (EventType.CACHE_HIT, EventType.FINISHED, EventType.FAILED)
+
+
+@dataclasses.dataclass(frozen=True)
+class BuildEvent:
+    """An event of a build.
+
+    Attributes:
+        type (EventType): What happened
+        notebook (Notebook): The notebook it happened to
+        elapsed (float): Seconds since the build started
+        seconds (float | None): Duration of the export, for the events ending one
+        error (str | None): Why the export failed, for FAILED events
+        timestamp (float): Wall-clock time of the event (seconds since the epoch)
+
+    """
+
+    type: EventType
+    notebook: Notebook
+    elapsed: float
+    seconds: float | None = None
+    error: str | None = None
+    timestamp: float = dataclasses.field(default_factory=time.time)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the event as a JSON-serialisable dictionary."""
+        return {
+            "type": self.type.value,
+            "notebook": self.notebook.path.as_posix(),
+            "kind": self.notebook.kind.value,
+            "page": self.notebook.html_path.as_posix(),
+            "elapsed": round(self.elapsed, 3),
+            "seconds": None if self.seconds is None else round(self.seconds, 3),
+            "error": self.error,
+            "timestamp": self.timestamp,
+        }
+
+
+class BuildEvents:
+    """Emit the events of one build to a callback, timed from the start of the build.
+
+    Attributes:
+        callback (Callable[[BuildEvent], None]): Receives every event
+
+    """
+
+    def __init__(self, callback: Callable[[BuildEvent], None]):
+        """Start the clock of a build."""
+        self.callback = callback
+        self._start = time.perf_counter()
+
+    def emit(
+        self, event: EventType, notebook: Notebook, seconds: float | None = None, error: str | None = None
+    ) -> None:
+        """Send an event to the callback."""
+        elapsed = time.perf_counter() - self._start
+        self.callback(BuildEvent(event, notebook, elapsed, seconds=seconds, error=error))
+
+
+def build_events(**kwargs: Any) -> Iterator[BuildEvent]:
+    """Run a build in a background thread and yield its events as they happen.
+
+    Args:
+        **kwargs: Arguments of marimushka.export.main, except on_event
+
+    Yields:
+        BuildEvent: The events of the build
+
+    Raises:
+        Exception: Whatever the build raised, after its last event
+
+    """
+    from .export import main
+
+    events: queue.Queue = queue.Queue()
+    done = object()
+    failure: list[BaseException] = []
+
+    def run() -> None:
+        try:
+            main(**kwargs, on_event=events.put)
+        except BaseException as e:  # re-raised in the consuming thread
+            failure.append(e)
+        finally:
+            events.put(done)
+
+    thread = threading.Thread(target=run, name="marimushka-build", daemon=True)
+    thread.start()
+    while (event := events.get()) is not done:
+        yield event
+    thread.join()
+    if failure:
+        raise failure[0]
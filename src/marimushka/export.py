@@ -5,9 +5,10 @@ an index.html file that lists all the notebooks. It handles both regular noteboo
 (from the notebooks/ directory) and apps (from the apps/ directory).
 
 The script can be run from the command line with optional arguments:
-    uvx marimushka [--output-dir OUTPUT_DIR]
+    uvx marimushka [--output-dir OUTPUT_DIR] [--archive ARCHIVE]
 
-The exported files will be placed in the specified output directory (default: _site).
+The exported files will be placed in the specified output directory (default: _site),
+or streamed into a tar/zip archive (or stdout) when an archive is given.
 """
 
 # /// script
@@ -19,19 +20,40 @@ The exported files will be placed in the specified output directory (default: _s
 # ]
 # ///
 
+import contextlib
 from pathlib import Path
+from typing import TYPE_CHECKING, NoReturn
 
-import jinja2
 import typer
-from loguru import logger
-from rich import print as rich_print
 
 from . import __version__
 from .notebook import Kind, Notebook, folder2notebooks
 
+# jinja2, loguru, rich and the build modules are imported where they are used,
+# so `marimushka version` and `--help` start without loading them
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    import jinja2
+
+    from .archive import SiteArchive
+    from .catalog import Page
+    from .events import BuildEvent, BuildEvents
+    from .preload import PyodideLock
+    from .store import ExportCache
+    from .weight import WeightReport
+
 app = typer.Typer(help=f"Marimushka - Export marimo notebooks in style. Version: {__version__}")
 
 
+def _fail(error: ValueError) -> NoReturn:
+    """Log the message of an error that is the user's to fix and exit with status 1."""
+    from loguru import logger
+
+    logger.error(str(error))
+    raise typer.Exit(code=1) from None
+
+
 @app.callback(invoke_without_command=True)
 def callback(ctx: typer.Context):
     """Run before any command and display help if no command is provided."""
@@ -48,13 +70,33 @@ def _generate_index(
     notebooks: list[Notebook] | None = None,
     apps: list[Notebook] | None = None,
     notebooks_wasm: list[Notebook] | None = None,
-) -> str:
+    archive: "SiteArchive | None" = None,
+    tailwind: str = "cdn",
+    page_size: int | None = None,
+    service_worker: bool = False,
+    preload: "PyodideLock | None" = None,
+    fingerprint: bool = False,
+    self_host_assets: bool = False,
+    asset_mirror: Path | None = None,
+    optimise_images: bool = False,
+    return_html: bool = True,
+    export_notebooks: bool = True,
+    export_cache: "ExportCache | None" = None,
+    weight_report: "WeightReport | None" = None,
+    export_only: "set[Notebook] | None" = None,
+    jobs: int | None = None,
+    events: "BuildEvents | None" = None,
+    write_changed_only: bool = False,
+) -> str | None:
     """Generate an index.html file that lists all the notebooks.
 
     This function creates an HTML index page that displays links to all the exported
     notebooks. The index page includes the marimo logo and displays each notebook
     with a formatted title and a link to open it.
 
+    Index pages rendered from the same template source, notebooks and options as in the
+    previous build into the same output directory are neither rendered nor written again.
+
     Args:
         notebooks_wasm:
         notebooks (List[Notebook]): List of notebooks with data for notebooks
@@ -62,26 +104,106 @@ def _generate_index(
         notebooks_wasm (List[Notebook]): List of notebooks with data for notebooks_wasm
         output (Path): Directory where the index.html file will be saved
         template_file (Path, optional): Path to the template file. If None, uses the default template.
+        archive (SiteArchive, optional): Open archive to stream the site into. Each export is moved
+            from the output directory into the archive as soon as it is produced, and the index is
+            written to the archive instead of to disk.
+        tailwind (str, optional): How the page gets its Tailwind CSS. "cdn" keeps the runtime CDN
+            script of the template, "inline" replaces it by a build-time stylesheet in a <style>
+            element and "link" writes that stylesheet to _assets/tailwind.css and links it.
+        page_size (int, optional): Maximum number of notebooks per index page. If given, the
+            sections are split over index.html, index-2.html, ... and a search-index.json for
+            client-side filtering is written next to them. The template receives the current
+            page as `pagination` and the URL of the search index as `search_index`.
+        service_worker (bool, optional): Write a sw.js and precache-manifest.json that cache the
+            site by content hash and the WASM runtime from its CDNs. The template receives the
+            URL of the worker as `service_worker` to register it.
+        preload (PyodideLock, optional): Lock of the Pyodide distribution the WASM runtime loads.
+            If given, every exported WASM notebook and app gets preload hints for the runtime and
+            for the Pyodide packages its PEP 723 dependencies map to.
+        fingerprint (bool, optional): Rename static assets to content-hashed names, rewrite the
+            references to them, and write a _headers cache policy and, next to the output directory
+            or archive, an nginx-cache.conf snippet. With an archive, the site is staged completely
+            and archived after the rewrite.
+        self_host_assets (bool, optional): Download the external scripts, stylesheets and images the
+            pages load (Tailwind CDN, logo, marimo runtime) into _assets/ and rewrite the pages to load
+            them from there. With an archive, the site is staged completely and archived afterwards.
+        asset_mirror (Path, optional): Directory the self-hosted assets are taken from instead of the
+            network, in the layout of _assets/ (one folder per host).
+        optimise_images (bool, optional): Recompress the PNG and JPEG images below public/ folders and
+            asset directories losslessly and write WebP variants next to them, in a process pool. Results
+            are cached by content hash. With an archive, the site is staged completely and archived afterwards.
+        return_html (bool, optional): Return the rendered index. If False, the pages are streamed
+            from the template into a temporary file that is renamed into place, so the document is
+            never held in memory. Compiling Tailwind CSS needs the full page and renders in memory.
+        export_notebooks (bool, optional): Export the notebooks before rendering the index. If False,
+            only the index is rendered and the exports are left to the caller (the preview server
+            exports each notebook when it is first requested).
+        export_cache (ExportCache, optional): Cache the exports are taken from, and added to, so
+            notebooks exported by an earlier or a concurrent build are not exported again.
+        weight_report (WeightReport, optional): Report every exported page is measured into. It is
+            logged after the exports; checking the budgets is left to the caller.
+        export_only (set[Notebook], optional): Export only these notebooks. The index still lists
+            all notebooks. Defaults to exporting all of them.
+        jobs (int, optional): Maximum number of concurrent exports. Below it, exports are admitted
+            as long as their predicted peak memory fits. Defaults to 1 (one export at a time).
+        events (BuildEvents, optional): Receives an event when an export is queued, starts and ends.
+        write_changed_only (bool, optional): Export into a staging directory and copy only the files
+            whose content changed into the output directory, so unchanged exports keep their
+            modification time. Defaults to False.
 
     Returns:
-        str: The rendered HTML content as a string
+        str | None: The rendered HTML content of the (first) index page as a string, or None
+            if return_html is False
 
     """
+    import json
+
+    import jinja2
+    from loguru import logger
+
+    from .archive import STDOUT
+    from .catalog import SEARCH_INDEX, paginate, search_index, surplus_pages
+    from .delta import write_if_changed
+    from .fingerprint import HEADERS, NGINX, NGINX_SNIPPET, fingerprint_assets, headers_policy
+    from .history import BuildHistory
+    from .images import optimise_images as shrink_images
+    from .incremental import RenderState, render_digest
+    from .selfhost import self_host_assets as mirror_assets
+    from .serviceworker import PRECACHE_MANIFEST, SERVICE_WORKER, build_service_worker, digest_tree, precache_manifest
+    from .tailwind import CDN
+    from .templating import get_environment
+
     # Initialize empty lists if None is provided
     notebooks = notebooks or []
     apps = apps or []
     notebooks_wasm = notebooks_wasm or []
 
-    # Export notebooks to WebAssembly
-    for nb in notebooks:
-        nb.export(output_dir=output / "notebooks")
-
-    # Export apps to WebAssembly
-    for nb in apps:
-        nb.export(output_dir=output / "apps")
+    # Files go straight into the archive unless a later pass has to rewrite the whole tree
+    stream = None if fingerprint or self_host_assets or optimise_images else archive
 
-    for nb in notebooks_wasm:
-        nb.export(output_dir=output / "notebooks_wasm")
+    # Export notebooks, apps and WASM notebooks, and remember the time and memory each export took
+    if export_notebooks:
+        selected = [
+            [nb for nb in section if export_only is None or nb in export_only]
+            for section in (notebooks, apps, notebooks_wasm)
+        ]
+        measured = _export_notebooks(
+            output,
+            *selected,
+            stream=stream,
+            preload=preload,
+            cache=export_cache,
+            report=weight_report,
+            jobs=jobs,
+            events=events,
+            write_changed_only=write_changed_only,
+        )
+        if weight_report is not None:
+            weight_report.log()
+        history = BuildHistory()
+        for nb, metrics in measured.items():
+            history.record(nb, **metrics)
+        history.save()
 
     # Create the full path for the index.html file
     index_path: Path = Path(output) / "index.html"
@@ -93,52 +215,389 @@ def _generate_index(
     template_dir = template_file.parent
     template_name = template_file.name
 
-    rendered_html = ""
+    rendered_html: str | None = "" if return_html else None
     try:
-        # Create Jinja2 environment and load template
-        env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader(template_dir), autoescape=jinja2.select_autoescape(["html", "xml"])
-        )
+        # Reuse the Jinja2 environment of the template directory and load the template
+        env = get_environment(template_dir)
         template = env.get_template(template_name)
 
-        # Render the template with notebook and app data
-        rendered_html = template.render(
-            notebooks=notebooks,
-            apps=apps,
-            notebooks_wasm=notebooks_wasm,
-        )
+        # Split the sections into pages, or render everything on a single page
+        pages = paginate(page_size, notebooks=notebooks, apps=apps, notebooks_wasm=notebooks_wasm) if page_size else []
+
+        def _context(page: "Page | None") -> dict:
+            # Template variables of one page, or of the single unpaginated index
+            return {
+                "notebooks": page.notebooks if page else notebooks,
+                "apps": page.apps if page else apps,
+                "notebooks_wasm": page.notebooks_wasm if page else notebooks_wasm,
+                "pagination": page,
+                "search_index": SEARCH_INDEX if page else None,
+                "service_worker": SERVICE_WORKER if service_worker else None,
+            }
+
+        names = [page.url for page in pages] or ["index.html"]
+        contexts = [_context(page) for page in pages or [None]]
+
+        # Pages rendered from the same inputs as last time keep their file (and its mtime)
+        state = RenderState(output) if archive is None else None
+        options = {"tailwind": tailwind, "fingerprint": fingerprint, "self_host_assets": self_host_assets}
+        digests = [render_digest(template_file, context, options, env) for context in contexts]
+        stale = [i for i, name in enumerate(names) if state is None or not state.unchanged(name, digests[i])]
+        if stale and tailwind != CDN:
+            # A compiled stylesheet covers the classes of all pages
+            stale = list(range(len(names)))
+        if len(stale) < len(names):
+            logger.info(f"Index pages unchanged since the last build: {len(names) - len(stale)} of {len(names)}")
+
+        if not return_html and tailwind == CDN:
+            # Stream every page from the template straight into its file
+            for i in stale:
+                _dump_site_file(output, names[i], template.stream(**contexts[i]), stream)
+        else:
+            # Render the template with notebook and app data
+            rendered_pages = {names[i]: template.render(**contexts[i]) for i in stale}
+            rendered_pages = _write_pages(output, rendered_pages, tailwind, stream)
+            if return_html:
+                rendered_html = rendered_pages.get("index.html") or index_path.read_text()
+
+        # The search index lists all pages, so it only changes together with one of them
+        if pages and stale:
+            _write_site_file(output, SEARCH_INDEX, search_index(pages), stream)
+
+        if state is not None:
+            for i in stale:
+                state.record(names[i], digests[i])
+            state.save()
+
+            # Pages of an earlier build with more pages would keep linking to notebooks no longer listed
+            for path in surplus_pages(output, len(names)):
+                path.unlink()
+                logger.info(f"Removed the surplus index page {path.name}")
+
+        # Load external assets from the site, before they are fingerprinted like the others
+        if self_host_assets:
+            mirror_assets(output, asset_mirror)
+
+        # Shrink images first, so content-hashed names are computed from their final bytes
+        if optimise_images:
+            shrink_images(output)
+
+        # Rename static assets to content-hashed names once the whole tree is on disk
+        if fingerprint:
+            fingerprint_assets(output)
+
+        if fingerprint or self_host_assets or optimise_images:
+            if return_html and index_path.exists():
+                rendered_html = index_path.read_text()
+            if archive is not None:
+                archive.absorb(output)
+
+        # The worker comes last, as its manifest lists the content hash of every other file
+        if service_worker:
+            digests = archive.digests if archive is not None else digest_tree(output)
+            # Server configuration is not for browsers, and the copy on disk is the one of the previous build
+            manifest = precache_manifest({name: digest for name, digest in digests.items() if name != HEADERS})
+            _write_site_file(output, PRECACHE_MANIFEST, json.dumps(manifest, indent=2).encode(), archive)
+            _write_site_file(output, SERVICE_WORKER, build_service_worker(manifest).encode(), archive)
+
+        # Cache policies: a year for hashed assets, revalidation for HTML and the worker
+        if fingerprint:
+            names = archive.names if archive is not None else _site_files(output)
+            _write_site_file(output, HEADERS, headers_policy(sorted(names)).encode(), archive)
+            # The nginx snippet is server configuration, so it is kept next to the site instead of published in it
+            site = Path(output) if archive is None or str(archive.target) == STDOUT else Path(archive.target)
+            write_if_changed(site.absolute().parent / NGINX, NGINX_SNIPPET.encode())
+            if archive is None:
+                # Builds before this one wrote it into the site
+                (Path(output) / NGINX).unlink(missing_ok=True)
+    except jinja2.exceptions.TemplateError as e:
+        logger.error(f"Error rendering template {template_file}: {e}")
+
+    return rendered_html
+
+
+def _export_notebooks(
+    output: Path,
+    notebooks: list[Notebook],
+    apps: list[Notebook],
+    notebooks_wasm: list[Notebook],
+    stream: "SiteArchive | None" = None,
+    preload: "PyodideLock | None" = None,
+    cache: "ExportCache | None" = None,
+    report: "WeightReport | None" = None,
+    jobs: int | None = None,
+    events: "BuildEvents | None" = None,
+    write_changed_only: bool = False,
+) -> dict[Notebook, dict[str, float]]:
+    """Export notebooks, apps and WASM notebooks into their folders below the output directory.
+
+    Exports run concurrently, as many as fit into the available memory according to the
+    peak memory measured for each notebook in earlier builds (see scheduler.py).
+
+    Args:
+        output (Path): The output (or staging) directory
+        notebooks (list[Notebook]): Notebooks exported to notebooks/
+        apps (list[Notebook]): Apps exported to apps/
+        notebooks_wasm (list[Notebook]): WASM notebooks exported to notebooks_wasm/
+        stream (SiteArchive, optional): Archive each export is moved into as soon as it is produced.
+            Exports run one at a time, as the archive takes in everything below the output directory.
+        preload (PyodideLock, optional): Lock used to add preload hints to WASM exports
+        cache (ExportCache, optional): Cache exports are taken from and added to
+        report (WeightReport, optional): Report each exported page is measured into
+        jobs (int, optional): Maximum number of concurrent exports. Defaults to 1.
+        events (BuildEvents, optional): Receives the queued, started and cache-hit, finished or
+            failed events of every export
+        write_changed_only (bool, optional): Export and post-process each notebook in a staging
+            directory and copy only the files whose content changed into the output directory
+
+    Returns:
+        dict[Notebook, dict[str, float]]: Wall time ("seconds") and, where measured, peak
+            resident memory ("peak_rss") of each export
+
+    """
+    import shutil
+    import tempfile
+    import threading
+    import time
+
+    from .delta import copy_if_changed
+    from .events import EventType
+    from .history import BuildHistory
+    from .preload import inject_hints
+    from .scheduler import predicted_peak, run_within_memory
+
+    workers = 1 if stream is not None else jobs or 1
+    # Concurrent exports from one folder would copy the same public/ folder at once,
+    # so each export is staged and moved into the output directory one at a time
+    stage = write_changed_only or workers > 1
+    moving = threading.Lock()
+
+    def task(nb: Notebook, folder: str):
+        def run() -> None:
+            start = time.perf_counter()
+            if events is not None:
+                events.emit(EventType.STARTED, nb)
+            staging = Path(tempfile.mkdtemp(prefix="marimushka-export-")) if stage else None
+            target = staging or output
+            try:
+                if cache is not None:
+                    hit = events is not None and cache.contains(nb)
+                    ok = cache.export(nb, output_dir=target / folder)
+                else:
+                    hit, ok = False, nb.export(output_dir=target / folder)
+
+                # Post-process a fresh export before it is moved into the archive or the output directory
+                if preload is not None and nb.kind in (Kind.NB_WASM, Kind.APP):
+                    inject_hints(target / nb.html_path, preload.hints(nb.dependencies))
+                if staging is not None:
+                    with moving:
+                        for path in staging.rglob("*"):
+                            if path.is_file():
+                                copy_if_changed(path, output / path.relative_to(staging))
+                if report is not None:
+                    report.measure(nb, output / nb.html_path)
+                if stream is not None:
+                    stream.absorb(output)
+            except Exception as e:
+                if events is not None:
+                    events.emit(EventType.FAILED, nb, seconds=time.perf_counter() - start, error=str(e))
+                raise
+            finally:
+                if staging is not None:
+                    shutil.rmtree(staging, ignore_errors=True)
+
+            if events is not None:
+                outcome = EventType.CACHE_HIT if hit and ok else EventType.FINISHED if ok else EventType.FAILED
+                error = None if ok else "The export failed, see the log for the output of marimo"
+                events.emit(outcome, nb, seconds=time.perf_counter() - start, error=error)
+
+        return run
+
+    tasks = [
+        (nb, task(nb, folder))
+        for folder, section in (("notebooks", notebooks), ("apps", apps), ("notebooks_wasm", notebooks_wasm))
+        for nb in section
+    ]
+    if events is not None:
+        for nb, _ in tasks:
+            events.emit(EventType.QUEUED, nb)
+    history = BuildHistory()
+    return run_within_memory(
+        tasks,
+        estimate=lambda nb: predicted_peak(nb, history),
+        workers=workers,
+    )
+
+
+def _write_pages(
+    output: Path, rendered_pages: dict[str, str], tailwind: str, stream: "SiteArchive | None"
+) -> dict[str, str]:
+    """Compile the CSS of rendered index pages and write them.
+
+    Args:
+        output (Path): The output directory
+        rendered_pages (dict[str, str]): Rendered HTML keyed by the file name of the page
+        tailwind (str): How the pages get their Tailwind CSS
+        stream (SiteArchive, optional): Archive to write the pages to instead of the output directory
+
+    Returns:
+        dict[str, str]: The HTML as written, keyed by the file name of the page
+
+    """
+    from loguru import logger
+
+    from .tailwind import STYLESHEET_PATH, compile_css
+
+    if not rendered_pages:
+        return {}
+
+    # Replace the Tailwind CDN script by a stylesheet compiled at build time
+    _, stylesheet = compile_css("\n".join(rendered_pages.values()), mode=tailwind)
+    rendered_pages = {name: compile_css(html, mode=tailwind)[0] for name, html in rendered_pages.items()}
+    if stylesheet is not None:
+        _write_site_file(output, STYLESHEET_PATH, stylesheet.encode(), stream)
 
-        # Write the rendered HTML to the index.html file
+    # Further pages of a paginated catalog
+    for name, html in rendered_pages.items():
+        if name != "index.html":
+            _write_site_file(output, name, html.encode(), stream)
+
+    # Write the rendered HTML of the (first) page to the archive or to the index.html file
+    if "index.html" not in rendered_pages:
+        return rendered_pages
+    rendered_html = rendered_pages["index.html"]
+    index_path = Path(output) / "index.html"
+    if stream is not None:
+        stream.add_bytes(rendered_html.encode(), "index.html")
+        logger.info(f"Successfully added index file to archive {stream.target}")
+    else:
         try:
             with Path.open(index_path, "w") as f:
                 f.write(rendered_html)
             logger.info(f"Successfully generated index file at {index_path}")
         except OSError as e:
             logger.error(f"Error writing index file to {index_path}: {e}")
-    except jinja2.exceptions.TemplateError as e:
-        logger.error(f"Error rendering template {template_file}: {e}")
 
-    return rendered_html
+    return rendered_pages
+
+
+def _dump_site_file(
+    output: Path, name: str, rendered: "jinja2.environment.TemplateStream", archive: "SiteArchive | None" = None
+) -> None:
+    """Stream a rendered template into a temporary file and rename it into place.
+
+    The temporary file lives next to the target, so the rename is atomic and readers
+    never see a partially written page.
+    """
+    import tempfile
+
+    from loguru import logger
+
+    path = Path(output) / name
+    tmp: Path | None = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+        ) as f:
+            tmp = Path(f.name)
+            rendered.dump(f)
+        tmp.replace(path)
+    except OSError as e:
+        logger.error(f"Error writing {path}: {e}")
+        return
+    finally:
+        # Only left behind if rendering or writing failed
+        if tmp is not None:
+            tmp.unlink(missing_ok=True)
+
+    if archive is not None:
+        archive.add_file(path, name)
+        path.unlink()
+        logger.info(f"Successfully added {name} to archive {archive.target}")
+    else:
+        logger.info(f"Successfully generated {path}")
+
+
+def _site_files(output: Path) -> list[str]:
+    """Return the site-relative POSIX paths of all files below the output directory."""
+    return [path.relative_to(output).as_posix() for path in Path(output).rglob("*") if path.is_file()]
+
+
+def _write_site_file(output: Path, name: str, data: bytes, archive: "SiteArchive | None" = None) -> None:
+    """Write an auxiliary file of the site to the archive, or below the output directory if it changed."""
+    from loguru import logger
+
+    if archive is not None:
+        archive.add_bytes(data, name)
+        return
+
+    from .delta import write_if_changed
+
+    path = Path(output) / name
+    try:
+        if write_if_changed(path, data):
+            logger.info(f"Successfully generated {path}")
+        else:
+            logger.debug(f"Unchanged: {path}")
+    except OSError as e:
+        logger.error(f"Error writing {path}: {e}")
 
 
 def _main_impl(
-    output: str | Path, template: str | Path, notebooks: str | Path, apps: str | Path, notebooks_wasm: str | Path
-) -> str:
+    output: str | Path,
+    template: str | Path,
+    notebooks: str | Path,
+    apps: str | Path,
+    notebooks_wasm: str | Path,
+    archive: str | Path | None = None,
+    tailwind: str = "cdn",
+    page_size: int | None = None,
+    service_worker: bool = False,
+    pyodide_lock: str | Path | None = None,
+    fingerprint: bool = False,
+    return_html: bool = True,
+    shard: str | None = None,
+    export_cache: str | Path | None = None,
+    budgets: list[str] | None = None,
+    changed_since: str | None = None,
+    jobs: int | None = None,
+    on_event: "Callable[[BuildEvent], None] | None" = None,
+    delta_dir: str | Path | None = None,
+    self_host_assets: bool = False,
+    asset_mirror: str | Path | None = None,
+    optimise_images: bool = False,
+) -> str | None:
     """Implement the main function.
 
     This function contains the actual implementation of the main functionality.
     It is called by the main() function, which handles the Typer options.
     """
+    import tempfile
+
+    from loguru import logger
+
+    from .archive import SiteArchive
+    from .delta import SiteDelta, remove_stale_pages, write_manifests
+    from .events import BuildEvents, EventType
+    from .preload import PyodideLock
+    from .shard import parse_shard
+    from .store import ExportCache
+    from .weight import WeightReport, parse_budgets
+
     logger.info("Starting marimushka build process")
     logger.info(f"Version of Marimushka: {__version__}")
     output = output or "_site"
 
     # Convert output_dir explicitly to Path
     output_dir: Path = Path(output)
-    logger.info(f"Output directory: {output_dir}")
+    if archive:
+        logger.info(f"Archive: {archive}")
+    else:
+        logger.info(f"Output directory: {output_dir}")
 
-    # Make sure the output directory exists
-    output_dir.mkdir(parents=True, exist_ok=True)
+        # Make sure the output directory exists
+        output_dir.mkdir(parents=True, exist_ok=True)
 
     # Convert template to Path if provided
     template_file: Path = Path(template)
@@ -147,6 +606,28 @@ def _main_impl(
     logger.info(f"Apps: {apps}")
     logger.info(f"Notebooks-wasm: {notebooks_wasm}")
 
+    _check_index_options(tailwind, page_size)
+    if jobs is not None and jobs < 1:
+        raise ValueError(f"Number of jobs must be positive, got {jobs}")
+    if shard:
+        parse_shard(shard)
+        if archive:
+            raise ValueError("A shard is merged from its output directory and cannot be written to an archive")
+    if delta_dir and (archive or shard):
+        raise ValueError("The changed and deleted files are only listed for a site built into an output directory")
+    if asset_mirror and not self_host_assets:
+        raise ValueError("An asset mirror is only used when self-hosting the assets")
+    if asset_mirror and not Path(asset_mirror).is_dir():
+        raise ValueError(f"Asset mirror {asset_mirror} is not a directory")
+    preload = PyodideLock.from_file(pyodide_lock) if pyodide_lock else None
+    if preload is not None:
+        logger.info(f"Preloading Pyodide {preload.version} packages from {preload.base_url}")
+    cache = ExportCache(export_cache) if export_cache else None
+    report = WeightReport(parse_budgets(budgets))
+    events = BuildEvents(on_event) if on_event is not None else None
+    if cache is not None:
+        logger.info(f"Export cache: {cache.root}")
+
     notebooks_data = folder2notebooks(folder=notebooks, kind=Kind.NB)
     apps_data = folder2notebooks(folder=apps, kind=Kind.APP)
     notebooks_wasm_data = folder2notebooks(folder=notebooks_wasm, kind=Kind.NB_WASM)
@@ -154,19 +635,142 @@ def _main_impl(
     logger.info(f"# notebooks_data: {len(notebooks_data)}")
     logger.info(f"# apps_data: {len(apps_data)}")
     logger.info(f"# notebooks_wasm_data: {len(notebooks_wasm_data)}")
+    if events is not None:
+        for nb in [*notebooks_data, *apps_data, *notebooks_wasm_data]:
+            events.emit(EventType.DISCOVERED, nb)
 
     # Exit if no notebooks or apps were found
     if not notebooks_data and not apps_data and not notebooks_wasm_data:
         logger.warning("No notebooks or apps found!")
         return ""
 
-    return _generate_index(
-        output=output_dir,
-        template_file=template_file,
-        notebooks=notebooks_data,
-        apps=apps_data,
-        notebooks_wasm=notebooks_wasm_data,
+    export_only = None
+    if changed_since:
+        from .changes import changed_files, select_changed
+
+        everything = [*notebooks_data, *apps_data, *notebooks_wasm_data]
+        export_only = set(select_changed(everything, changed_files(changed_since)))
+        logger.info(f"{len(export_only)} of {len(everything)} notebooks changed since {changed_since}")
+
+    if shard:
+        html = _export_shard(
+            output_dir,
+            shard,
+            *[
+                [nb for nb in section if export_only is None or nb in export_only]
+                for section in (notebooks_data, apps_data, notebooks_wasm_data)
+            ],
+            preload=preload,
+            cache=cache,
+            report=report,
+            jobs=jobs,
+            events=events,
+        )
+        report.check()
+        return html
+
+    # Hash the site before the build only when the delta is asked for, it reads every file
+    delta = SiteDelta(output_dir) if delta_dir else None
+
+    with contextlib.ExitStack() as stack:
+        site_archive = None
+        if archive:
+            # Exports land in a staging directory and are moved into the archive one at a time
+            output_dir = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="marimushka-")))
+            site_archive = stack.enter_context(SiteArchive(archive))
+
+        html = _generate_index(
+            output=output_dir,
+            template_file=template_file,
+            notebooks=notebooks_data,
+            apps=apps_data,
+            notebooks_wasm=notebooks_wasm_data,
+            archive=site_archive,
+            tailwind=tailwind,
+            page_size=page_size,
+            service_worker=service_worker,
+            preload=preload,
+            fingerprint=fingerprint,
+            self_host_assets=self_host_assets,
+            asset_mirror=Path(asset_mirror) if asset_mirror else None,
+            optimise_images=optimise_images,
+            return_html=return_html,
+            export_cache=cache,
+            weight_report=report,
+            export_only=export_only,
+            jobs=jobs,
+            events=events,
+            write_changed_only=delta is not None,
+        )
+
+    if delta is not None:
+        # The deploy mirrors the output directory, so pages of deleted notebooks must leave it
+        pages = {nb.html_path.as_posix() for nb in [*notebooks_data, *apps_data, *notebooks_wasm_data]}
+        remove_stale_pages(output_dir, sorted({kind.html_path.as_posix() for kind in Kind}), pages)
+        changed, deleted = delta.finish()
+        logger.info(f"Since the last build {len(changed)} files changed and {len(deleted)} were deleted")
+        write_manifests(delta_dir, changed, deleted)
+
+    # The site is complete, so it can be inspected, but the build fails
+    report.check()
+    return html
+
+
+def _check_index_options(tailwind: str, page_size: int | None) -> None:
+    """Raise a ValueError for an unknown Tailwind mode or a page size below one."""
+    from .tailwind import MODES
+
+    if tailwind not in MODES:
+        raise ValueError(f"Invalid Tailwind mode: {tailwind!r}. Must be one of {list(MODES)}")
+    if page_size is not None and page_size < 1:
+        raise ValueError(f"Page size must be positive, got {page_size}")
+
+
+def _export_shard(
+    output: Path,
+    spec: str,
+    notebooks: list[Notebook],
+    apps: list[Notebook],
+    notebooks_wasm: list[Notebook],
+    preload: "PyodideLock | None" = None,
+    cache: "ExportCache | None" = None,
+    report: "WeightReport | None" = None,
+    jobs: int | None = None,
+    events: "BuildEvents | None" = None,
+) -> str:
+    """Export one shard of the combined notebook list and leave the index to merge.
+
+    The build history is only read here: it changes when the shards are merged, so
+    every runner of one build computes the same partition.
+    """
+    from loguru import logger
+
+    from .history import BuildHistory
+    from .shard import layout_digest, parse_shard, partition, write_manifest
+
+    index, count = parse_shard(spec)
+    history = BuildHistory()
+    everything = [*notebooks, *apps, *notebooks_wasm]
+    shards = partition(everything, count, cost=lambda nb: history.get(nb, "seconds"))
+    layout = layout_digest(shards)
+    selected = set(shards[index - 1])
+    logger.info(f"Shard {spec} (layout {layout}): exporting {len(selected)} of {len(everything)} notebooks")
+
+    measured = _export_notebooks(
+        output,
+        [nb for nb in notebooks if nb in selected],
+        [nb for nb in apps if nb in selected],
+        [nb for nb in notebooks_wasm if nb in selected],
+        preload=preload,
+        cache=cache,
+        report=report,
+        jobs=jobs,
+        events=events,
     )
+    if report is not None:
+        report.log()
+    write_manifest(output, spec, layout, measured)
+    return ""
 
 
 def main(
@@ -175,7 +779,26 @@ def main(
     notebooks: str | Path = "notebooks",
     apps: str | Path = "apps",
     notebooks_wasm: str | Path = "notebooks",
-) -> str:
+    archive: str | Path | None = None,
+    tailwind: str = "cdn",
+    page_size: int | None = None,
+    service_worker: bool = False,
+    pyodide_lock: str | Path | None = None,
+    fingerprint: bool = False,
+    return_html: bool = True,
+    shard: str | None = None,
+    export_cache: str | Path | None = None,
+    cache_dir: str | Path | None = None,
+    budgets: list[str] | None = None,
+    changed_since: str | None = None,
+    jobs: int | None = None,
+    wheelhouse: str | Path | None = None,
+    on_event: "Callable[[BuildEvent], None] | None" = None,
+    delta_dir: str | Path | None = None,
+    self_host_assets: bool = False,
+    asset_mirror: str | Path | None = None,
+    optimise_images: bool = False,
+) -> str | None:
     """Call the implementation function with the provided parameters and return its result.
 
     Parameters
@@ -194,16 +817,251 @@ def main(
     notebooks_wasm: str | Path
         Directory containing WebAssembly-related files for notebooks.
         Defaults to "notebooks".
+    archive: str | Path | None
+        Optional tar (.tar, .tar.gz, .tgz, .tar.bz2, .tar.xz) or .zip file to
+        stream the site into instead of writing it to the output directory.
+        Use "-" to write a tar.gz stream to stdout. Defaults to None.
+    tailwind: str
+        How the index page gets its Tailwind CSS: "cdn" keeps the runtime
+        CDN script, "inline" embeds a stylesheet compiled at build time and
+        "link" writes it to _assets/tailwind.css. Defaults to "cdn".
+    page_size: int | None
+        Maximum number of notebooks per index page. When given, the index is
+        split into index.html, index-2.html, ... and a search-index.json is
+        written for client-side filtering. Defaults to None (a single page).
+    service_worker: bool
+        Write a sw.js and precache-manifest.json, registered from the index,
+        that cache pages and runtime assets by content hash. Defaults to False.
+    pyodide_lock: str | Path | None
+        The pyodide-lock.json of the Pyodide version the WASM runtime loads.
+        If given, exported WASM notebooks and apps get preload hints for the
+        runtime and the packages of their PEP 723 header. Defaults to None.
+    fingerprint: bool
+        Rename static assets to content-hashed names, rewrite the references
+        to them and write a _headers cache policy and, next to the output
+        directory, an nginx-cache.conf snippet (immutable hashed assets,
+        revalidated HTML). Defaults to False.
+    return_html: bool
+        Return the rendered index page. If False, pages are streamed from the
+        template to disk and never held in memory as a whole. Defaults to True.
+    shard: str | None
+        Export only shard "i/n" of the combined notebook list into the output
+        directory, without an index. The shards are balanced by the export
+        times of earlier builds and combined with merge(). Defaults to None.
+    export_cache: str | Path | None
+        Directory of finished exports, keyed by notebook source, that is safe
+        to share between concurrent builds (also on a network filesystem).
+        Notebooks found there are copied instead of exported, and a notebook
+        another build is exporting is waited for. Defaults to None.
+    cache_dir: str | Path | None
+        Directory for everything the build caches: the uv cache of the
+        sandboxed exports (in uv/), finished exports (in exports/, unless
+        export_cache is given) and the build history. Restoring it before a
+        build skips the notebooks that did not change. Defaults to None (the
+        marimushka and uv caches of the user, no export cache).
+    budgets: list[str] | None
+        Size budgets per kind of notebook as KIND=SIZE, e.g. "app=5MB". A
+        notebook can set its own with `budget` in the [tool.marimushka] table
+        of its PEP 723 header. The size of every export is logged, and the
+        build fails after writing the site if a page exceeds its budget.
+        Defaults to None.
+    changed_since: str | None
+        A git reference, e.g. "origin/main". Only notebooks whose source or
+        data changed since the current branch left it are exported; the
+        index still lists all notebooks. Defaults to None (export all).
+    jobs: int | None
+        Maximum number of concurrent exports. Below it, an export starts only
+        while the peak memory measured for the running exports in earlier
+        builds fits into the available memory. Defaults to None (one export
+        at a time).
+    wheelhouse: str | Path | None
+        Directory of wheels, filled by `marimushka fetch`, that the exports
+        install all dependencies from without contacting a package index.
+        Requirements no wheel in it satisfies are logged. Defaults to None.
+    on_event: Callable[[BuildEvent], None] | None
+        Called with every event of the build (see events.py): when a notebook
+        is discovered and queued, and when its export starts and ends, with
+        timings. Called from the threads running the exports. Defaults to None.
+    delta_dir: str | Path | None
+        Directory to write changed-files.txt and deleted-files.txt to, listing
+        the site files whose content changed (or that are new) and that were
+        removed since the last build into the output directory. With it, exports
+        whose content did not change are not rewritten, so they keep their
+        modification time, and pages of notebooks that no longer exist are
+        removed from the output directory. Defaults to None (no lists).
+    self_host_assets: bool
+        Download the external scripts, stylesheets and images the pages load
+        (the Tailwind CDN script, the marimo logo and runtime) into _assets/
+        and rewrite the pages to load them from the site. Downloads are kept
+        in the marimushka cache. Defaults to False.
+    asset_mirror: str | Path | None
+        Directory the self-hosted assets are taken from instead of the
+        network, laid out like _assets/ with one folder per host, e.g. the
+        _assets folder of an earlier build. Defaults to None.
+    optimise_images: bool
+        Recompress the PNG and JPEG images below public/ folders and asset
+        directories without loss and write smaller WebP variants next to
+        them (logo.png.webp), in a process pool. JPEG recompression needs
+        jpegtran and WebP variants need cwebp on the PATH. Results are cached
+        by content hash. Defaults to False.
 
     Returns:
     -------
-    str
+    str | None
         The result returned by the implementation function, representing the
-        completion of the generation process or final outcome.
+        completion of the generation process or final outcome. None if
+        return_html is False.
 
     """
-    # Call the implementation function with the provided parameters and return its result
-    return _main_impl(output=output, template=template, notebooks=notebooks, apps=apps, notebooks_wasm=notebooks_wasm)
+    from . import cache
+
+    with contextlib.ExitStack() as stack:
+        if cache_dir:
+            stack.enter_context(cache.use_cache_dir(cache_dir))
+            export_cache = export_cache or cache.cache_dir("exports")
+        if wheelhouse:
+            from loguru import logger
+
+            from .wheelhouse import missing_wheels, use_wheelhouse
+
+            stack.enter_context(use_wheelhouse(wheelhouse))
+            everything = [
+                *folder2notebooks(folder=notebooks, kind=Kind.NB),
+                *folder2notebooks(folder=apps, kind=Kind.APP),
+                *folder2notebooks(folder=notebooks_wasm, kind=Kind.NB_WASM),
+            ]
+            for nb, needed in missing_wheels(everything, wheelhouse).items():
+                logger.warning(f"No wheel in {wheelhouse} for {', '.join(needed)} needed by {nb.path}")
+
+        # Call the implementation function with the provided parameters and return its result
+        return _main_impl(
+            output=output,
+            template=template,
+            notebooks=notebooks,
+            apps=apps,
+            notebooks_wasm=notebooks_wasm,
+            archive=archive,
+            tailwind=tailwind,
+            page_size=page_size,
+            service_worker=service_worker,
+            pyodide_lock=pyodide_lock,
+            fingerprint=fingerprint,
+            return_html=return_html,
+            shard=shard,
+            export_cache=export_cache,
+            budgets=budgets,
+            changed_since=changed_since,
+            jobs=jobs,
+            on_event=on_event,
+            delta_dir=delta_dir,
+            self_host_assets=self_host_assets,
+            asset_mirror=asset_mirror,
+            optimise_images=optimise_images,
+        )
+
+
+def merge(
+    shards: list[str | Path],
+    output: str | Path = "_site",
+    template: str | Path = Path(__file__).parent / "templates" / "tailwind.html.j2",
+    notebooks: str | Path = "notebooks",
+    apps: str | Path = "apps",
+    notebooks_wasm: str | Path = "notebooks",
+    tailwind: str = "cdn",
+    page_size: int | None = None,
+    service_worker: bool = False,
+    fingerprint: bool = False,
+    return_html: bool = True,
+    cache_dir: str | Path | None = None,
+    self_host_assets: bool = False,
+    asset_mirror: str | Path | None = None,
+    optimise_images: bool = False,
+) -> str | None:
+    """Combine the output directories of a sharded export and render the index once.
+
+    Parameters
+    ----------
+    shards: list[str | Path]
+        The output directories of all shards of one build.
+    output: str | Path
+        The directory the site is merged into. Defaults to "_site".
+    template: str | Path
+        Path to the template of the index page.
+    notebooks: str | Path
+        Directory containing the notebooks, listed in the index.
+    apps: str | Path
+        Directory containing the apps, listed in the index.
+    notebooks_wasm: str | Path
+        Directory containing the WASM notebooks, listed in the index.
+    tailwind: str
+        How the index page gets its Tailwind CSS, see main(). Defaults to "cdn".
+    page_size: int | None
+        Maximum number of notebooks per index page, see main(). Defaults to None.
+    service_worker: bool
+        Write a service worker for the merged site, see main(). Defaults to False.
+    fingerprint: bool
+        Fingerprint the assets of the merged site, see main(). Defaults to False.
+    return_html: bool
+        Return the rendered index page. Defaults to True.
+    cache_dir: str | Path | None
+        The cache directory the shards were exported with, see main(). The
+        merged export times are added to its build history. Defaults to None.
+    self_host_assets: bool
+        Serve the external assets from the merged site, see main(). Defaults to False.
+    asset_mirror: str | Path | None
+        Directory the self-hosted assets are taken from, see main(). Defaults to None.
+    optimise_images: bool
+        Shrink the images of the merged site, see main(). Defaults to False.
+
+    Returns:
+    -------
+    str | None
+        The rendered index page, None if return_html is False.
+
+    Raises:
+    ------
+    ValueError
+        If the shards are incomplete, were partitioned differently, or
+        contain different files under the same path.
+
+    """
+    from loguru import logger
+
+    from .history import HISTORY_FILE, BuildHistory
+    from .shard import merge_shards
+
+    _check_index_options(tailwind, page_size)
+    output_dir = Path(output or "_site")
+    measurements = merge_shards([Path(shard) for shard in shards], output_dir)
+
+    # The merged timings weight the partition of the next build
+    history = BuildHistory(Path(cache_dir) / HISTORY_FILE if cache_dir else None)
+    history.update(measurements)
+    history.save()
+
+    notebooks_data = folder2notebooks(folder=notebooks, kind=Kind.NB)
+    apps_data = folder2notebooks(folder=apps, kind=Kind.APP)
+    notebooks_wasm_data = folder2notebooks(folder=notebooks_wasm, kind=Kind.NB_WASM)
+    missing = [nb for nb in [*notebooks_data, *apps_data, *notebooks_wasm_data] if history.key(nb) not in measurements]
+    if missing:
+        logger.warning(f"Not exported by any shard: {', '.join(str(nb.path) for nb in missing)}")
+
+    return _generate_index(
+        output=output_dir,
+        template_file=Path(template),
+        notebooks=notebooks_data,
+        apps=apps_data,
+        notebooks_wasm=notebooks_wasm_data,
+        tailwind=tailwind,
+        page_size=page_size,
+        service_worker=service_worker,
+        fingerprint=fingerprint,
+        self_host_assets=self_host_assets,
+        asset_mirror=Path(asset_mirror) if asset_mirror else None,
+        optimise_images=optimise_images,
+        return_html=return_html,
+        export_notebooks=False,
+    )
 
 
 @app.command(name="export")
@@ -220,6 +1078,64 @@ def _main_typer(
     notebooks_wasm: str = typer.Option(
         "notebooks_wasm", "--notebooks-wasm", "-nw", help="Directory containing marimo notebooks"
     ),
+    archive: str | None = typer.Option(
+        None,
+        "--archive",
+        help="Stream the site into a .tar[.gz|.bz2|.xz] or .zip archive instead of the output dir ('-' for stdout)",
+    ),
+    tailwind: str = typer.Option(
+        "cdn",
+        "--tailwind",
+        help="Tailwind CSS delivery: 'cdn' (runtime script), 'inline' or 'link' (stylesheet built at export time)",
+    ),
+    page_size: int | None = typer.Option(
+        None, "--page-size", help="Split the index into pages of this many notebooks and write a search index"
+    ),
+    service_worker: bool = typer.Option(
+        False, "--service-worker", help="Write a service worker that caches the site and the WASM runtime"
+    ),
+    pyodide_lock: str | None = typer.Option(
+        None, "--pyodide-lock", help="pyodide-lock.json used to add package preload hints to WASM exports"
+    ),
+    fingerprint: bool = typer.Option(
+        False, "--fingerprint", help="Content-hash asset file names and write _headers/nginx cache policies"
+    ),
+    shard: str | None = typer.Option(
+        None, "--shard", help="Export only shard i/n of the notebooks, without an index (combine with 'merge')"
+    ),
+    export_cache: str | None = typer.Option(
+        None, "--export-cache", help="Directory of finished exports to reuse and share with concurrent builds"
+    ),
+    cache_dir: str | None = typer.Option(
+        None, "--cache-dir", help="Keep the uv cache, finished exports and build history in this directory"
+    ),
+    budget: list[str] | None = typer.Option(
+        None, "--budget", help="Size budget of a kind of notebook, e.g. 'app=5MB' (repeatable); fails the build"
+    ),
+    changed_since: str | None = typer.Option(
+        None, "--changed-since", help="Export only notebooks whose source or data changed since this git ref"
+    ),
+    jobs: int | None = typer.Option(
+        None, "--jobs", "-j", help="Maximum concurrent exports, admitted by available memory (default: 1)"
+    ),
+    wheelhouse: str | None = typer.Option(
+        None, "--wheelhouse", help="Install dependencies only from this directory of wheels (see 'fetch')"
+    ),
+    progress: bool = typer.Option(
+        False, "--progress", help="Show a live view of the exports: throughput, ETA and active workers"
+    ),
+    delta_dir: str | None = typer.Option(
+        None, "--delta-dir", help="Write changed-files.txt and deleted-files.txt for a delta deploy to this directory"
+    ),
+    self_host_assets: bool = typer.Option(
+        False, "--self-host-assets", help="Serve CDN scripts, stylesheets and images from _assets/ of the site"
+    ),
+    asset_mirror: str | None = typer.Option(
+        None, "--asset-mirror", help="Take the self-hosted assets from this directory instead of the network"
+    ),
+    optimise_images: bool = typer.Option(
+        False, "--optimise-images", help="Recompress PNG/JPEG images losslessly and write WebP variants"
+    ),
 ) -> None:
     """Export marimo notebooks and build an HTML index page linking to them."""
     # When called through Typer, the parameters might be typer.Option objects
@@ -229,21 +1145,272 @@ def _main_typer(
     notebooks_val = getattr(notebooks, "default", notebooks)
     apps_val = getattr(apps, "default", apps)
     notebooks_wasm_val = getattr(notebooks_wasm, "default", notebooks_wasm)
+    archive_val = getattr(archive, "default", archive)
+    tailwind_val = getattr(tailwind, "default", tailwind)
+    page_size_val = getattr(page_size, "default", page_size)
+    service_worker_val = getattr(service_worker, "default", service_worker)
+    pyodide_lock_val = getattr(pyodide_lock, "default", pyodide_lock)
+    fingerprint_val = getattr(fingerprint, "default", fingerprint)
+    shard_val = getattr(shard, "default", shard)
+    export_cache_val = getattr(export_cache, "default", export_cache)
+    cache_dir_val = getattr(cache_dir, "default", cache_dir)
+    budget_val = getattr(budget, "default", budget)
+    changed_since_val = getattr(changed_since, "default", changed_since)
+    jobs_val = getattr(jobs, "default", jobs)
+    wheelhouse_val = getattr(wheelhouse, "default", wheelhouse)
+    progress_val = getattr(progress, "default", progress)
+    delta_dir_val = getattr(delta_dir, "default", delta_dir)
+    self_host_assets_val = getattr(self_host_assets, "default", self_host_assets)
+    asset_mirror_val = getattr(asset_mirror, "default", asset_mirror)
+    optimise_images_val = getattr(optimise_images, "default", optimise_images)
+
+    with contextlib.ExitStack() as stack:
+        view = None
+        if progress_val:
+            from .progress import ProgressView
+
+            view = stack.enter_context(ProgressView())
+
+        # Call the main function with the resolved parameter values. Invalid options and pages
+        # over budget are reported without a traceback
+        try:
+            main(
+                output=output_val,
+                template=template_val,
+                notebooks=notebooks_val,
+                apps=apps_val,
+                notebooks_wasm=notebooks_wasm_val,
+                archive=archive_val,
+                tailwind=tailwind_val,
+                page_size=page_size_val,
+                service_worker=service_worker_val,
+                pyodide_lock=pyodide_lock_val,
+                fingerprint=fingerprint_val,
+                return_html=False,
+                shard=shard_val,
+                export_cache=export_cache_val,
+                cache_dir=cache_dir_val,
+                budgets=budget_val,
+                changed_since=changed_since_val,
+                jobs=jobs_val,
+                wheelhouse=wheelhouse_val,
+                on_event=view,
+                delta_dir=delta_dir_val,
+                self_host_assets=self_host_assets_val,
+                asset_mirror=asset_mirror_val,
+                optimise_images=optimise_images_val,
+            )
+        except ValueError as e:
+            _fail(e)
+
+
+@app.command(name="merge")
+def _merge_typer(
+    shards: list[str] = typer.Argument(..., help="Output directories of all shards"),
+    output: str = typer.Option("_site", "--output", "-o", help="Directory the site is merged into"),
+    template: str = typer.Option(
+        str(Path(__file__).parent / "templates" / "tailwind.html.j2"),
+        "--template",
+        "-t",
+        help="Path to the template file",
+    ),
+    notebooks: str = typer.Option("notebooks", "--notebooks", "-n", help="Directory containing marimo notebooks"),
+    apps: str = typer.Option("apps", "--apps", "-a", help="Directory containing marimo apps"),
+    notebooks_wasm: str = typer.Option(
+        "notebooks_wasm", "--notebooks-wasm", "-nw", help="Directory containing marimo notebooks"
+    ),
+    tailwind: str = typer.Option("cdn", "--tailwind", help="Tailwind CSS delivery: 'cdn', 'inline' or 'link'"),
+    page_size: int | None = typer.Option(None, "--page-size", help="Split the index into pages of this many notebooks"),
+    service_worker: bool = typer.Option(False, "--service-worker", help="Write a service worker for the merged site"),
+    fingerprint: bool = typer.Option(False, "--fingerprint", help="Content-hash asset file names"),
+    cache_dir: str | None = typer.Option(
+        None, "--cache-dir", help="Cache directory the shards were exported with, to record their export times"
+    ),
+    self_host_assets: bool = typer.Option(
+        False, "--self-host-assets", help="Serve CDN scripts, stylesheets and images from _assets/ of the site"
+    ),
+    asset_mirror: str | None = typer.Option(
+        None, "--asset-mirror", help="Take the self-hosted assets from this directory instead of the network"
+    ),
+    optimise_images: bool = typer.Option(
+        False, "--optimise-images", help="Recompress PNG/JPEG images losslessly and write WebP variants"
+    ),
+) -> None:
+    """Combine the output directories of a sharded export and build the index once."""
+    try:
+        merge(
+            shards=getattr(shards, "default", shards),
+            output=getattr(output, "default", output),
+            template=getattr(template, "default", template),
+            notebooks=getattr(notebooks, "default", notebooks),
+            apps=getattr(apps, "default", apps),
+            notebooks_wasm=getattr(notebooks_wasm, "default", notebooks_wasm),
+            tailwind=getattr(tailwind, "default", tailwind),
+            page_size=getattr(page_size, "default", page_size),
+            service_worker=getattr(service_worker, "default", service_worker),
+            fingerprint=getattr(fingerprint, "default", fingerprint),
+            return_html=False,
+            cache_dir=getattr(cache_dir, "default", cache_dir),
+            self_host_assets=getattr(self_host_assets, "default", self_host_assets),
+            asset_mirror=getattr(asset_mirror, "default", asset_mirror),
+            optimise_images=getattr(optimise_images, "default", optimise_images),
+        )
+    except ValueError as e:
+        _fail(e)
+
+
+@app.command(name="serve")
+def _serve_typer(
+    output: str | None = typer.Option(
+        None, "--output", "-o", help="Directory for the exports (default: a folder in the marimushka cache)"
+    ),
+    template: str = typer.Option(
+        str(Path(__file__).parent / "templates" / "tailwind.html.j2"),
+        "--template",
+        "-t",
+        help="Path to the template file",
+    ),
+    notebooks: str = typer.Option("notebooks", "--notebooks", "-n", help="Directory containing marimo notebooks"),
+    apps: str = typer.Option("apps", "--apps", "-a", help="Directory containing marimo apps"),
+    notebooks_wasm: str = typer.Option(
+        "notebooks_wasm", "--notebooks-wasm", "-nw", help="Directory containing marimo notebooks"
+    ),
+    host: str = typer.Option("127.0.0.1", "--host", help="Interface to listen on"),
+    port: int = typer.Option(8000, "--port", "-p", help="Port to listen on"),
+) -> None:
+    """Preview the site locally, exporting each notebook when it is first opened."""
+    import hashlib
+
+    from .cache import cache_dir
+    from .server import PreviewSite, serve
 
-    # Call the main function with the resolved parameter values
-    main(
+    output_val = getattr(output, "default", output)
+    if not output_val:
+        # One export folder per project, so a restarted server reuses the exports that are still fresh
+        project = hashlib.sha256(str(Path.cwd().resolve()).encode()).hexdigest()[:16]
+        output_val = cache_dir("serve") / project
+
+    site = PreviewSite(
         output=output_val,
-        template=template_val,
-        notebooks=notebooks_val,
-        apps=apps_val,
-        notebooks_wasm=notebooks_wasm_val,
+        template=getattr(template, "default", template),
+        notebooks=getattr(notebooks, "default", notebooks),
+        apps=getattr(apps, "default", apps),
+        notebooks_wasm=getattr(notebooks_wasm, "default", notebooks_wasm),
     )
+    serve(site, host=getattr(host, "default", host), port=getattr(port, "default", port))
+
+
+@app.command(name="check")
+def _check_typer(
+    site: str = typer.Argument("_site", help="Directory of the built site"),
+    workers: int | None = typer.Option(None, "--workers", "-w", help="Worker processes (default: number of CPUs)"),
+) -> None:
+    """Check that the internal links and assets of every page of a built site exist."""
+    from .linkcheck import check_site
+
+    broken = check_site(getattr(site, "default", site), workers=getattr(workers, "default", workers))
+    for link in broken:
+        typer.echo(str(link))
+    if broken:
+        raise typer.Exit(code=1)
+
+
+@app.command(name="lock")
+def _lock_typer(
+    notebooks: str = typer.Option("notebooks", "--notebooks", "-n", help="Directory containing marimo notebooks"),
+    apps: str = typer.Option("apps", "--apps", "-a", help="Directory containing marimo apps"),
+    notebooks_wasm: str = typer.Option(
+        "notebooks_wasm", "--notebooks-wasm", "-nw", help="Directory containing marimo notebooks"
+    ),
+    jobs: int | None = typer.Option(None, "--jobs", "-j", help="Notebooks resolved at once (default: number of CPUs)"),
+    upgrade: bool = typer.Option(False, "--upgrade", help="Renew all locks with the newest allowed versions"),
+    check: bool = typer.Option(False, "--check", help="Only list missing and stale locks, failing if there are any"),
+) -> None:
+    """Pin the dependencies of every notebook header in a lock next to the notebook, for faster exports."""
+    from .lockfile import lock_notebooks, lock_path, lock_status
+
+    everything = [
+        *folder2notebooks(folder=getattr(notebooks, "default", notebooks), kind=Kind.NB),
+        *folder2notebooks(folder=getattr(apps, "default", apps), kind=Kind.APP),
+        *folder2notebooks(folder=getattr(notebooks_wasm, "default", notebooks_wasm), kind=Kind.NB_WASM),
+    ]
+    if getattr(check, "default", check):
+        outdated = [nb for nb in everything if lock_status(nb) != "fresh"]
+        for nb in outdated:
+            typer.echo(f"{lock_path(nb)}: {lock_status(nb)}")
+        if outdated:
+            raise typer.Exit(code=1)
+        return
+
+    results = lock_notebooks(
+        everything, workers=getattr(jobs, "default", jobs), upgrade=getattr(upgrade, "default", upgrade)
+    )
+    if any(result not in ("locked", "fresh") for result in results.values()):
+        raise typer.Exit(code=1)
+
+
+@app.command(name="fetch")
+def _fetch_typer(
+    wheelhouse: str = typer.Option("wheelhouse", "--wheelhouse", "-w", help="Directory the wheels are saved in"),
+    notebooks: str = typer.Option("notebooks", "--notebooks", "-n", help="Directory containing marimo notebooks"),
+    apps: str = typer.Option("apps", "--apps", "-a", help="Directory containing marimo apps"),
+    notebooks_wasm: str = typer.Option(
+        "notebooks_wasm", "--notebooks-wasm", "-nw", help="Directory containing marimo notebooks"
+    ),
+    python_version: str | None = typer.Option(
+        None, "--python-version", help="Python version of the build host, e.g. 3.12 (default: the current one)"
+    ),
+    platform: list[str] | None = typer.Option(
+        None, "--platform", help="Platform tag of the build host, e.g. manylinux_2_17_x86_64 (repeatable)"
+    ),
+) -> None:
+    """Download the wheels the notebooks and marimo need, for exports with --wheelhouse on offline hosts."""
+    from .wheelhouse import fetch_wheels
+
+    everything = [
+        *folder2notebooks(folder=getattr(notebooks, "default", notebooks), kind=Kind.NB),
+        *folder2notebooks(folder=getattr(apps, "default", apps), kind=Kind.APP),
+        *folder2notebooks(folder=getattr(notebooks_wasm, "default", notebooks_wasm), kind=Kind.NB_WASM),
+    ]
+    missing = fetch_wheels(
+        everything,
+        getattr(wheelhouse, "default", wheelhouse),
+        python_version=getattr(python_version, "default", python_version),
+        platforms=getattr(platform, "default", platform),
+    )
+    for nb, needed in missing.items():
+        typer.echo(f"{nb.path}: no wheel for {', '.join(needed)}")
+    if missing:
+        raise typer.Exit(code=1)
+
+
+@app.command(name="prune")
+def _prune_typer(
+    cache_dir: str | None = typer.Option(
+        None, "--cache-dir", help="Cache directory the exports were kept in, as given to 'export --cache-dir'"
+    ),
+    export_cache: str | None = typer.Option(
+        None, "--export-cache", help="Directory of finished exports (default: exports/ in the cache directory)"
+    ),
+    max_age: float = typer.Option(7.0, "--max-age", help="Remove exports no build has used for this many days"),
+) -> None:
+    """Remove the finished exports no build has used for a while from the export cache."""
+    from . import cache
+    from .store import ExportCache
+
+    cache_dir_val = getattr(cache_dir, "default", cache_dir)
+    with cache.use_cache_dir(cache_dir_val) if cache_dir_val else contextlib.nullcontext():
+        store = ExportCache(getattr(export_cache, "default", export_cache))
+    removed = store.prune(max_age=getattr(max_age, "default", max_age) * 24 * 3600)
+    typer.echo(f"Removed {len(removed)} unused exports from {store.root}")
 
 
 @app.command(name="version")
 def version():
     """Show the version of Marimushka."""
-    rich_print(f"[bold green]Marimushka[/bold green] version: [bold blue]{__version__}[/bold blue]")
+    # typer.style rather than rich, so showing the version loads none of the build dependencies
+    name = typer.style("Marimushka", fg="green", bold=True)
+    typer.echo(f"{name} version: {typer.style(__version__, fg='blue', bold=True)}")
 
 
 def cli():
@@ -0,0 +1,156 @@
+"""Fingerprint module for content-hashed asset names and cache header policies.
+
+Assets with stable names can only be served with short cache lifetimes. This module
+renames the static assets of a built site to content-hashed file names, rewrites the
+references to them in the exported pages, stylesheets and scripts, and writes a
+_headers policy file (plus an nginx snippet next to the site) that lets browsers cache hashed assets
+for a year and revalidate HTML on every visit.
+"""
+
+import hashlib
+import posixpath
+import re
+from pathlib import Path, PurePosixPath
+
+from loguru import logger
+
+from .images import WEBP_SUFFIX, is_variant
+from .serviceworker import ASSET_DIRS, SERVICE_WORKER
+
+# Name of the generated policy file inside the site
+HEADERS = "_headers"
+
+# Name of the nginx snippet, written next to the site as it is server configuration
+NGINX = "nginx-cache.conf"
+
+# Cache-Control values for content-hashed assets and for everything that must revalidate
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+
+# Files whose references to assets are rewritten
+TEXT_SUFFIXES = (".html", ".css", ".js", ".mjs")
+
+# Length of the content hash inserted into file names
+HASH_LENGTH = 10
+
+# A file name that already carries a content hash, e.g. index-BPDp8tUL.js or tailwind.3f2a9c1b0d.css
+HASHED_NAME = re.compile(r"[-.](?=[A-Za-z0-9_]*\d)[A-Za-z0-9_]{8,20}\.[A-Za-z0-9]+$")
+
+NGINX_SNIPPET = f"""\
+# Generated by marimushka: include in the server block that serves the site
+location ~* "[-.](?=[A-Za-z0-9_]*[0-9])[A-Za-z0-9_]{{8,20}}\\.[A-Za-z0-9]+$" {{
+    add_header Cache-Control "{IMMUTABLE}";
+}}
+location ~* "(\\.html|/|/{SERVICE_WORKER})$" {{
+    add_header Cache-Control "{REVALIDATE}";
+}}
+"""
+
+
+def is_fingerprinted(name: str) -> bool:
+    """Return True if a file name already carries a content hash.
+
+    >>> is_fingerprinted("assets/index-BPDp8tUL.js"), is_fingerprinted("_assets/tailwind.3f2a9c1b0d.css")
+    (True, True)
+    >>> is_fingerprinted("assets/marimo-logotype.svg"), is_fingerprinted("_assets/tailwind.css")
+    (False, False)
+
+    """
+    return HASHED_NAME.search(PurePosixPath(name).name) is not None
+
+
+def _is_asset(name: str) -> bool:
+    """Return True if a site-relative path lies inside an asset directory."""
+    return any(part in ASSET_DIRS for part in PurePosixPath(name).parts[:-1])
+
+
+def fingerprint_assets(root: Path) -> dict[str, str]:
+    """Rename the static assets below a site to content-hashed names.
+
+    Files inside asset directories (assets/, _assets/) that do not carry a hash yet are
+    renamed to name.<hash>.suffix, and every reference to them in the HTML, CSS and
+    JavaScript files of the site is rewritten. Data in public/ folders is left alone,
+    as notebooks build those paths in Python at run time. The WebP variant of an image
+    (see images.py) follows its image, so it stays at the image name plus .webp.
+
+    Args:
+        root (Path): The site directory
+
+    Returns:
+        dict[str, str]: New site-relative names keyed by the old ones
+
+    """
+    root = Path(root)
+    renamed: dict[str, str] = {}
+
+    for path in sorted(p for p in root.rglob("*") if p.is_file()):
+        name = path.relative_to(root).as_posix()
+        if not _is_asset(name) or is_fingerprinted(name) or is_variant(name):
+            continue
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()[:HASH_LENGTH]
+        target = path.with_name(f"{path.stem}.{digest}{path.suffix}")
+        path.rename(target)
+        renamed[name] = target.relative_to(root).as_posix()
+        variant = path.with_name(path.name + WEBP_SUFFIX)
+        if variant.is_file():
+            variant.rename(target.with_name(target.name + WEBP_SUFFIX))
+
+    if not renamed:
+        return renamed
+
+    for path in (p for p in root.rglob("*") if p.is_file() and p.suffix in TEXT_SUFFIXES):
+        _rewrite_references(path, root, renamed)
+
+    logger.info(f"Fingerprinted {len(renamed)} assets below {root}")
+    return renamed
+
+
+def _rewrite_references(path: Path, root: Path, renamed: dict[str, str]) -> None:
+    """Rewrite the references of one file to renamed assets, relative to its own folder."""
+    folder = path.parent.relative_to(root).as_posix()
+    replacements = {posixpath.relpath(old, folder): posixpath.relpath(new, folder) for old, new in renamed.items()}
+    pattern = re.compile(
+        r"(?<=[\"'(=\s])(\./)?("
+        + "|".join(re.escape(old) for old in sorted(replacements, key=len, reverse=True))
+        + r")(?=[\"')?#\s])"
+    )
+
+    text = path.read_text(encoding="utf-8", errors="surrogateescape")
+    rewritten = pattern.sub(lambda m: (m[1] or "") + replacements[m[2]], text)
+    if rewritten != text:
+        path.write_text(rewritten, encoding="utf-8", errors="surrogateescape")
+
+
+def headers_policy(names: list[str]) -> str:
+    """Build a _headers policy file (Netlify / Cloudflare Pages format) for a site.
+
+    Content-hashed assets are cached for a year as immutable; HTML pages, the
+    site root and the service worker are revalidated on every request.
+
+    Args:
+        names (list[str]): Site-relative paths of all files
+
+    Returns:
+        str: The content of the _headers file
+
+    >>> print(headers_policy(["index.html", "_assets/tailwind.3f2a9c1b0d.css", "public/data.csv"]), end="")
+    # Generated by marimushka: cache policy for the built site
+    /
+      Cache-Control: public, max-age=0, must-revalidate
+    /_assets/tailwind.3f2a9c1b0d.css
+      Cache-Control: public, max-age=31536000, immutable
+    /index.html
+      Cache-Control: public, max-age=0, must-revalidate
+
+    """
+    rules = {"/": REVALIDATE}
+    for name in sorted(names):
+        if name.endswith(".html") or name == SERVICE_WORKER:
+            rules[f"/{name}"] = REVALIDATE
+        elif _is_asset(name) and is_fingerprinted(name):
+            rules[f"/{name}"] = IMMUTABLE
+
+    lines = ["# Generated by marimushka: cache policy for the built site"]
+    for url, value in rules.items():
+        lines += [url, f"  Cache-Control: {value}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,72 @@
+"""History module for remembering what exporting each notebook cost in earlier builds.
+
+Scheduling decisions (how to split a catalog over CI runners, how many exports fit
+in memory at once) are better with numbers from previous builds than with guesses.
+This module keeps per-notebook measurements in a JSON file in the marimushka cache
+directory.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from loguru import logger
+
+from .cache import cache_dir
+from .notebook import Notebook
+
+# Name of the history file inside the cache directory
+HISTORY_FILE = "history.json"
+
+
+class BuildHistory:
+    """Measurements of previous exports, keyed by notebook.
+
+    Attributes:
+        path (Path): The JSON file the history is stored in
+
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        """Load the history.
+
+        Args:
+            path (str | Path, optional): The history file. Defaults to history.json
+                in the marimushka cache directory.
+
+        """
+        self.path = Path(path) if path else cache_dir() / HISTORY_FILE
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries: dict[str, dict[str, float]] = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    @staticmethod
+    def key(notebook: Notebook) -> str:
+        """Return the key of a notebook, its kind and its path as given on the command line."""
+        return f"{notebook.kind.value}:{notebook.path.as_posix()}"
+
+    def get(self, notebook: Notebook, metric: str) -> float | None:
+        """Return the last recorded value of a metric for a notebook, None if there is none."""
+        return self._entries.get(self.key(notebook), {}).get(metric)
+
+    def record(self, notebook: Notebook, **metrics: float) -> None:
+        """Record measurements of a notebook's latest export, e.g. seconds=12.5."""
+        self._entries.setdefault(self.key(notebook), {}).update(metrics)
+
+    def update(self, entries: dict[str, dict[str, float]]) -> None:
+        """Merge measurements recorded elsewhere (e.g. by the shards of a build) into the history."""
+        for key, metrics in entries.items():
+            self._entries.setdefault(key, {}).update(metrics)
+
+    def save(self) -> None:
+        """Write the history atomically, logging instead of failing if the cache is not writable."""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.path.parent, delete=False) as f:
+                json.dump(self._entries, f, indent=2, sort_keys=True)
+            os.replace(f.name, self.path)
+        except OSError as e:
+            logger.debug(f"Could not save the build history to {self.path}: {e}")
@@ -0,0 +1,298 @@
+r"""Images module for shrinking the PNG and JPEG files of a built site.
+
+Notebook public/ folders and site assets are copied to the site as committed,
+often as PNGs saved with fast compression settings. This pass recompresses the
+images below public/ folders and asset directories without changing a pixel:
+
+- PNG: the image data is deflated again at the highest level, split IDAT chunks are
+  joined and textual metadata (tEXt, zTXt, iTXt, tIME) is dropped. Colour, gamma,
+  density and orientation chunks are kept.
+- JPEG: the Huffman tables are optimised and the scan made progressive with
+  jpegtran, if it is on the PATH.
+
+Next to every image a WebP variant (logo.png -> logo.png.webp) is written with
+cwebp, if it is on the PATH and the variant is smaller: lossless for PNG and at
+WEBP_QUALITY for JPEG. Pages keep their references, so a server can send the
+variant to browsers accepting image/webp, e.g. with nginx:
+
+    map $http_accept $webp { default ""; "~image/webp" ".webp"; }
+    location ~* \.(png|jpe?g)$ { add_header Vary Accept; try_files $uri$webp $uri =404; }
+
+Images are processed in a process pool. The results are kept in the marimushka
+cache directory keyed by the content hash of the image, so an image that did not
+change is never processed again.
+"""
+
+import hashlib
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePosixPath
+
+from loguru import logger
+
+from .cache import cache_dir
+from .delta import write_if_changed
+from .serviceworker import ASSET_DIRS
+
+# Folders whose images are optimised, besides the asset directories
+PUBLIC = "public"
+
+# Suffixes of the images, by format
+PNG_SUFFIXES = (".png",)
+JPEG_SUFFIXES = (".jpg", ".jpeg")
+
+# Suffix appended to the name of an image for its WebP variant
+WEBP_SUFFIX = ".webp"
+
+# Quality of WebP variants of JPEG images (PNG variants are lossless)
+WEBP_QUALITY = 85
+
+# Bumped whenever the output of the pass changes, so cached results are not reused
+VERSION = 1
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# PNG chunks that do not affect how an image is displayed
+PNG_TEXT_CHUNKS = {b"tEXt", b"zTXt", b"iTXt", b"tIME"}
+
+
+def is_image(name: str) -> bool:
+    """Return True for a PNG or JPEG below a public/ folder or an asset directory of a site.
+
+    >>> is_image("apps/public/logo.png"), is_image("_assets/photo.JPG")
+    (True, True)
+    >>> is_image("apps/logo.png"), is_image("apps/public/logo.png.webp")
+    (False, False)
+
+    """
+    path = PurePosixPath(name)
+    folders = set(path.parts[:-1])
+    return path.suffix.lower() in PNG_SUFFIXES + JPEG_SUFFIXES and bool(folders & {PUBLIC, *ASSET_DIRS})
+
+
+def is_variant(name: str) -> bool:
+    """Return True for the WebP variant of an image.
+
+    >>> is_variant("_assets/logo.png.webp"), is_variant("_assets/logo.webp")
+    (True, False)
+
+    """
+    path = PurePosixPath(name)
+    return path.suffix == WEBP_SUFFIX and PurePosixPath(path.stem).suffix.lower() in PNG_SUFFIXES + JPEG_SUFFIXES
+
+
+def recompress_png(data: bytes) -> bytes:
+    """Return a PNG with its image data deflated at the highest level and without textual metadata.
+
+    Raises:
+        ValueError: If the data is not a well-formed PNG
+
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("Not a PNG image")
+
+    chunks: list[tuple[bytes, bytes]] = []
+    idat = bytearray()
+    position = len(PNG_SIGNATURE)
+    while position < len(data):
+        if position + 8 > len(data):
+            raise ValueError("Truncated PNG chunk")
+        (length,) = struct.unpack(">I", data[position : position + 4])
+        kind = data[position + 4 : position + 8]
+        body = data[position + 8 : position + 8 + length]
+        if len(body) != length:
+            raise ValueError("Truncated PNG chunk")
+        position += 12 + length
+        if kind == b"IDAT":
+            if not idat:
+                chunks.append((kind, b""))
+            idat += body
+        elif kind not in PNG_TEXT_CHUNKS:
+            chunks.append((kind, body))
+        if kind == b"IEND":
+            break
+
+    try:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9)
+        deflated = compressor.compress(zlib.decompress(idat)) + compressor.flush()
+    except zlib.error as e:
+        raise ValueError(f"Corrupt PNG image data: {e}") from e
+
+    out = bytearray(PNG_SIGNATURE)
+    for kind, body in chunks:
+        if kind == b"IDAT":
+            body = deflated
+        out += struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+    return bytes(out)
+
+
+def available_tools() -> dict[str, str]:
+    """Return the paths of the image tools found on the PATH (jpegtran, cwebp)."""
+    return {tool: path for tool in ("jpegtran", "cwebp") if (path := shutil.which(tool))}
+
+
+def _run(command: list[str], data: bytes, suffix: str) -> bytes | None:
+    """Run an image tool from an input to an output file and return the output, or None if it failed."""
+    with tempfile.TemporaryDirectory(prefix="marimushka-image-") as tmp:
+        source, target = Path(tmp) / f"in{suffix}", Path(tmp) / "out"
+        source.write_bytes(data)
+        args = [part.format(input=source, output=target) for part in command]
+        try:
+            subprocess.run(args, capture_output=True, check=True)
+            return target.read_bytes()
+        except (subprocess.CalledProcessError, OSError) as e:
+            logger.debug(f"{Path(command[0]).name} failed: {e}")
+            return None
+
+
+def optimise(data: bytes, suffix: str, tools: dict[str, str]) -> tuple[bytes | None, bytes | None]:
+    """Optimise one image.
+
+    Args:
+        data (bytes): The image
+        suffix (str): Its file suffix, which tells the format
+        tools (dict[str, str]): Paths of the available image tools
+
+    Returns:
+        tuple[bytes | None, bytes | None]: The recompressed image and the WebP variant,
+            each None unless it is smaller than the image
+
+    """
+    image = None
+    suffix = suffix.lower()
+    try:
+        if suffix in PNG_SUFFIXES:
+            image = recompress_png(data)
+        elif "jpegtran" in tools:
+            options = ["-copy", "all", "-optimize", "-progressive"]
+            image = _run([tools["jpegtran"], *options, "-outfile", "{output}", "{input}"], data, suffix)
+    except ValueError as e:
+        logger.debug(f"Could not recompress an image: {e}")
+    if image is not None and len(image) >= len(data):
+        image = None
+
+    webp = None
+    if "cwebp" in tools:
+        quality = ["-lossless", "-m", "6"] if suffix in PNG_SUFFIXES else ["-q", str(WEBP_QUALITY), "-m", "6"]
+        webp = _run([tools["cwebp"], "-quiet", *quality, "-metadata", "icc", "{input}", "-o", "{output}"], data, suffix)
+        if webp is not None and len(webp) >= len(image or data):
+            webp = None
+    return image, webp
+
+
+def _optimise_file(path: str, tools: dict[str, str]) -> tuple[bytes | None, bytes | None]:
+    """Optimise the image in a file, in a worker process."""
+    return optimise(Path(path).read_bytes(), Path(path).suffix, tools)
+
+
+class ImageCache:
+    """Results of the image pass keyed by the content hash of the image.
+
+    An entry is a folder holding the recompressed image ("image") and the WebP
+    variant ("webp"), each only if it was smaller. An empty folder records that
+    the image could not be shrunk.
+
+    Attributes:
+        root (Path): Directory of the entries
+        tools (dict[str, str]): Paths of the image tools the results are made with
+
+    """
+
+    def __init__(self, root: str | Path | None = None, tools: dict[str, str] | None = None):
+        """Open a cache directory, by default in the marimushka cache."""
+        self.root = Path(root) if root else cache_dir("images")
+        self.tools = available_tools() if tools is None else tools
+
+    def key(self, data: bytes) -> str:
+        """Return the key of an image, covering the pass version and the tools that are available."""
+        digest = hashlib.sha256(f"{VERSION}:{','.join(sorted(self.tools))}:".encode())
+        digest.update(data)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> tuple[bytes | None, bytes | None] | None:
+        """Return the recompressed image and WebP variant recorded for a key, or None if unknown."""
+        entry = self.root / key[:2] / key
+        if not entry.is_dir():
+            return None
+        try:
+            return tuple((entry / name).read_bytes() if (entry / name).exists() else None for name in ("image", "webp"))
+        except OSError:
+            return None
+
+    def put(self, key: str, image: bytes | None, webp: bytes | None) -> None:
+        """Record the results for a key; the entry appears at once, complete."""
+        entry = self.root / key[:2] / key
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            tmp = Path(tempfile.mkdtemp(prefix=f".{key[:8]}-", dir=entry.parent))
+            for name, content in (("image", image), ("webp", webp)):
+                if content is not None:
+                    (tmp / name).write_bytes(content)
+            try:
+                tmp.rename(entry)
+            except OSError:
+                # Another build recorded the same image first
+                shutil.rmtree(tmp, ignore_errors=True)
+        except OSError as e:
+            logger.debug(f"Could not cache the optimised image {key}: {e}")
+
+
+def optimise_images(root: Path, jobs: int | None = None, cache: ImageCache | None = None) -> dict[str, int]:
+    """Recompress the PNG and JPEG images of a site and write their WebP variants.
+
+    Args:
+        root (Path): The site directory
+        jobs (int, optional): Worker processes. Defaults to the number of CPUs.
+        cache (ImageCache, optional): Cache of earlier results. Defaults to the marimushka cache.
+
+    Returns:
+        dict[str, int]: Bytes saved per site-relative image name, for the images that shrank
+
+    """
+    root = Path(root)
+    cache = cache or ImageCache()
+    images = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            if is_image(path.relative_to(root).as_posix()):
+                images.append(path)
+    if not images:
+        return {}
+
+    # Images seen in an earlier build are taken from the cache, the others are processed in the pool,
+    # each distinct image once
+    contents = {path: path.read_bytes() for path in sorted(images)}
+    keys = {path: cache.key(data) for path, data in contents.items()}
+    results = {key: cache.get(key) for key in set(keys.values())}
+    todo = {key: path for path, key in keys.items() if results[key] is None}
+    if todo:
+        workers = min(jobs or os.cpu_count() or 1, len(todo))
+        paths, tools = [str(path) for path in todo.values()], [cache.tools] * len(todo)
+        if workers == 1:
+            processed = list(map(_optimise_file, paths, tools))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                processed = list(pool.map(_optimise_file, paths, tools))
+        for key, result in zip(todo, processed, strict=True):
+            results[key] = result
+            cache.put(key, *result)
+
+    saved = {}
+    for path, key in keys.items():
+        image, webp = results[key]
+        if image is not None:
+            write_if_changed(path, image)
+            saved[path.relative_to(root).as_posix()] = len(contents[path]) - len(image)
+        if webp is not None:
+            write_if_changed(path.with_name(path.name + WEBP_SUFFIX), webp)
+
+    logger.info(
+        f"Optimised {len(images)} images ({len(todo)} processed, the others cached), saving {sum(saved.values())} bytes"
+    )
+    return saved
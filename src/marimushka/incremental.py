@@ -0,0 +1,162 @@
+"""Incremental module for skipping index pages whose inputs have not changed.
+
+Re-rendering an unchanged index still rewrites the file and bumps its mtime, which
+triggers re-uploads and CDN purges. This module hashes everything a page is rendered
+from (the notebooks it lists, its pagination, the template source and the build
+options) and records the hash per page in the marimushka cache directory, so the
+next build can leave pages with a matching hash untouched.
+"""
+
+import dataclasses
+import enum
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from loguru import logger
+
+from . import __version__
+from .cache import cache_dir
+from .notebook import Notebook
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
+
+
+def _canonical(value: object) -> object:
+    """Convert a template variable into JSON-serialisable data for hashing."""
+    if isinstance(value, Notebook):
+        return {
+            "path": value.path.as_posix(),
+            "kind": value.kind.value,
+            "display_name": value.display_name,
+            "html_path": value.html_path.as_posix(),
+            "title": value.title,
+        }
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        # Shallow on purpose, nested notebooks come back through this function
+        return {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, Path):
+        return value.as_posix()
+    return repr(value)
+
+
+def template_sources(template_file: Path, env: "Environment | None" = None) -> dict[str, str]:
+    """Return the source of a template and of every template it includes, extends or imports.
+
+    References are followed through the template directory. If a template picks a
+    name at render time, every template of the directory is returned instead.
+
+    Args:
+        template_file (Path): The template pages are rendered from
+        env (Environment, optional): The environment the templates are parsed with
+
+    Returns:
+        dict[str, str]: Sources keyed by template name, empty for a missing template
+
+    """
+    import jinja2
+    from jinja2 import meta
+
+    template_file = Path(template_file)
+    env = env or jinja2.Environment()
+    # Read the sources from the directory, as the environment may load bundled templates precompiled
+    loader = jinja2.FileSystemLoader(template_file.parent)
+
+    def source(name: str) -> str:
+        try:
+            return loader.get_source(env, name)[0]
+        except (jinja2.TemplateNotFound, UnicodeDecodeError):
+            return ""
+
+    sources: dict[str, str] = {}
+    pending = [template_file.name]
+    while pending:
+        name = pending.pop()
+        if name in sources:
+            continue
+        sources[name] = source(name)
+        references = list(meta.find_referenced_templates(env.parse(sources[name])))
+        if None in references:
+            # A name chosen at render time could be any template of the directory
+            return {name: source(name) for name in sorted({*sources, *loader.list_templates()})}
+        pending.extend(references)
+    return sources
+
+
+def render_digest(
+    template_file: Path, context: dict, options: dict | None = None, env: "Environment | None" = None
+) -> str:
+    """Hash the inputs of one rendered page.
+
+    Args:
+        template_file (Path): The template the page is rendered from, with the templates it references
+        context (dict): The variables passed to the template
+        options (dict, optional): Build options that post-process the rendered page
+        env (Environment, optional): The environment the templates are parsed with
+
+    Returns:
+        str: SHA-256 hex digest of the template sources, the context and the options
+
+    """
+    digest = hashlib.sha256()
+    inputs = {
+        "version": __version__,
+        "templates": template_sources(template_file, env),
+        "context": context,
+        "options": options or {},
+    }
+    digest.update(json.dumps(inputs, sort_keys=True, default=_canonical).encode())
+    return digest.hexdigest()
+
+
+class RenderState:
+    """The digests of the index pages last written to an output directory.
+
+    The state is kept in the marimushka cache directory, keyed by the resolved path
+    of the output directory, so it never becomes part of the published site.
+
+    Attributes:
+        output (Path): The output directory the pages are written to
+        path (Path): The JSON file the digests are stored in
+
+    """
+
+    def __init__(self, output: Path):
+        """Load the recorded digests for an output directory.
+
+        Args:
+            output (Path): The output directory the pages are written to
+
+        """
+        self.output = Path(output)
+        key = hashlib.sha256(str(self.output.resolve()).encode()).hexdigest()[:16]
+        self.path = cache_dir("index") / f"{key}.json"
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._digests: dict[str, str] = json.load(f)
+        except (OSError, ValueError):
+            self._digests = {}
+
+    def unchanged(self, name: str, digest: str) -> bool:
+        """Return True if a page was last written from the same inputs and still exists."""
+        return self._digests.get(name) == digest and (self.output / name).is_file()
+
+    def record(self, name: str, digest: str) -> None:
+        """Remember the digest of a page that has just been written."""
+        self._digests[name] = digest
+
+    def save(self) -> None:
+        """Write the digests atomically, logging instead of failing if the cache is not writable."""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.path.parent, delete=False) as f:
+                json.dump(self._digests, f, indent=2, sort_keys=True)
+            os.replace(f.name, self.path)
+        except OSError as e:
+            logger.debug(f"Could not record index digests in {self.path}: {e}")
@@ -0,0 +1,153 @@
+"""Linkcheck module for validating the internal references of a built site.
+
+Every HTML page of the site is parsed with the standard library's streaming
+html.parser, in a process pool for large sites, and each internal href, src,
+srcset and poster reference is resolved against the page. Existence is checked
+against a set of the site's files collected in one directory walk, so a reference
+shared by many pages costs a set lookup rather than a filesystem call.
+"""
+
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import unquote, urlsplit
+
+from loguru import logger
+
+# Attributes holding a single URL
+URL_ATTRIBUTES = ("href", "src", "poster")
+
+# Bytes read from a page per parser feed
+CHUNK_SIZE = 1 << 16
+
+# Pages per task sent to a worker process
+CHUNK_PAGES = 8
+
+
+class BrokenLink(NamedTuple):
+    """An internal reference that does not resolve to a file of the site.
+
+    Attributes:
+        page (str): The page containing the reference, relative to the site root
+        line (int): Line of the element in the page
+        ref (str): The reference as written in the page
+
+    """
+
+    page: str
+    line: int
+    ref: str
+
+    def __str__(self) -> str:
+        """Format the broken link like a compiler diagnostic."""
+        return f"{self.page}:{self.line}: {self.ref}"
+
+
+class _ReferenceParser(HTMLParser):
+    """Collect the URL attributes of all elements, with the line they are on."""
+
+    def __init__(self):
+        """Start with no references."""
+        super().__init__(convert_charrefs=True)
+        self.references: list[tuple[int, str]] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        """Record the URLs in the attributes of an element."""
+        line = self.getpos()[0]
+        for name, value in attrs:
+            if not value:
+                continue
+            if name in URL_ATTRIBUTES:
+                self.references.append((line, value.strip()))
+            elif name == "srcset":
+                # Candidates are separated by commas, each an URL optionally followed by a descriptor
+                for candidate in value.split(","):
+                    if candidate.strip():
+                        self.references.append((line, candidate.split()[0]))
+
+    handle_startendtag = handle_starttag
+
+
+def internal_path(ref: str) -> str | None:
+    """Return the path part of an internal reference, None for external or in-page references.
+
+    >>> internal_path("notebooks/penguins.html#plot"), internal_path("https://marimo.io"), internal_path("#top")
+    ('notebooks/penguins.html', None, None)
+
+    """
+    parts = urlsplit(ref)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    return unquote(parts.path)
+
+
+def _scan(path: str) -> list[tuple[int, str]]:
+    """Return the references of one page; runs in a worker process."""
+    parser = _ReferenceParser()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            parser.feed(chunk)
+    parser.close()
+    return parser.references
+
+
+def check_site(root: str | Path, workers: int | None = None) -> list[BrokenLink]:
+    """Find the internal references of all pages of a site that point to no file.
+
+    A reference to a directory is valid if the directory has an index.html.
+    References leaving the site root count as broken.
+
+    Args:
+        root (str | Path): The site directory
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs;
+            with 1, or a single page, the pages are parsed in this process.
+
+    Returns:
+        list[BrokenLink]: The broken references, ordered by page and line
+
+    Raises:
+        ValueError: If the site directory does not exist
+
+    """
+    root = Path(root)
+    if not root.is_dir():
+        raise ValueError(f"Site directory not found: {root}")
+
+    # One walk of the site answers every existence check
+    files: set[str] = set()
+    for dirpath, _, filenames in os.walk(root):
+        relative = Path(dirpath).relative_to(root).as_posix()
+        files.update(posixpath.normpath(posixpath.join(relative, name)) for name in filenames)
+    pages = sorted(name for name in files if name.endswith((".html", ".htm")))
+
+    workers = workers or os.cpu_count() or 1
+    paths = [str(root / page) for page in pages]
+    if workers == 1 or len(pages) < 2:
+        references = list(map(_scan, paths))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pages))) as pool:
+            references = list(pool.map(_scan, paths, chunksize=CHUNK_PAGES))
+
+    broken = []
+    checked = 0
+    for page, found in zip(pages, references, strict=True):
+        base = posixpath.dirname(page)
+        for line, ref in found:
+            path = internal_path(ref)
+            if path is None:
+                continue
+            checked += 1
+            if path.endswith("/"):
+                path += "index.html"
+            target = posixpath.normpath(path.lstrip("/") if path.startswith("/") else posixpath.join(base, path))
+            if target == ".":
+                target = "index.html"
+            outside = target == ".." or target.startswith("../")
+            if outside or (target not in files and f"{target}/index.html" not in files):
+                broken.append(BrokenLink(page, line, ref))
+
+    logger.info(f"Checked {checked} internal references in {len(pages)} pages, {len(broken)} broken")
+    return broken
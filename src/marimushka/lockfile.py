@@ -0,0 +1,168 @@
+"""Lockfile module for exporting notebooks from pinned, per-notebook dependencies.
+
+With --sandbox, marimo resolves the dependency ranges of a notebook's PEP 723
+header on every export, which is slow and can pick different versions from one
+day to the next. `marimushka lock` resolves each header once with
+`uv pip compile --universal` and stores the pinned requirements next to the
+notebook (penguins.py -> penguins.lock.txt). Exports of a notebook with a lock
+run marimo with exactly those requirements instead of the sandbox.
+
+The first line of a lock records a hash of the header block it was resolved
+from. A lock whose header has changed since is stale: it is ignored by exports
+(with a warning) until `marimushka lock` renews it.
+"""
+
+import hashlib
+import os
+import re
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from loguru import logger
+
+from .notebook import METADATA_BLOCK, Notebook
+
+# Suffix replacing ".py" in the name of a notebook's lock
+LOCKFILE_SUFFIX = ".lock.txt"
+
+# First line of a lock, recording the header it was resolved from
+HEADER_LINE = re.compile(r"\A# marimushka header sha256:([0-9a-f]{64})\n")
+
+# Lowest Python version allowed by requires-python, e.g. ">=3.12"
+MINIMUM_PYTHON = re.compile(r">=\s*(\d+\.\d+)")
+
+
+def header_digest(source: str) -> str:
+    """Return the SHA-256 of a notebook's PEP 723 script block, of "" if there is none.
+
+    >>> header_digest("x = 1") == header_digest("y = 2")
+    True
+
+    """
+    match = next((m for m in METADATA_BLOCK.finditer(source) if m["type"] == "script"), None)
+    return hashlib.sha256((match[0] if match else "").encode("utf-8")).hexdigest()
+
+
+def lock_path(notebook: Notebook) -> Path:
+    """Return where the lock of a notebook is stored."""
+    return notebook.path.with_name(notebook.path.stem + LOCKFILE_SUFFIX)
+
+
+def lock_status(notebook: Notebook) -> str:
+    """Return "fresh", "stale" or "missing" for the lock of a notebook."""
+    try:
+        lock = lock_path(notebook).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return "missing"
+    match = HEADER_LINE.match(lock)
+    fresh = match is not None and match[1] == header_digest(notebook.path.read_text(encoding="utf-8"))
+    return "fresh" if fresh else "stale"
+
+
+def fresh_lock(notebook: Notebook) -> Path | None:
+    """Return the lock of a notebook if it matches the notebook's header, warning if it does not."""
+    status = lock_status(notebook)
+    if status == "stale":
+        logger.warning(f"The lock of {notebook.path} is stale, resolving its header again. Run marimushka lock")
+    return lock_path(notebook) if status == "fresh" else None
+
+
+def locked_command(command: list[str], lock: Path) -> list[str]:
+    """Turn a sandboxed export command into one installing the pinned requirements of a lock.
+
+    >>> locked_command(["uvx", "marimo", "export", "html", "--sandbox"], Path("nb.lock.txt"))
+    ['uvx', '--with-requirements', 'nb.lock.txt', 'marimo', 'export', 'html']
+
+    """
+    return [command[0], "--with-requirements", str(lock), *(part for part in command[1:] if part != "--sandbox")]
+
+
+def compile_lock(notebook: Notebook, upgrade: bool = False) -> Path:
+    """Resolve the header of a notebook and write its lock.
+
+    The versions pinned by an existing lock are kept where the header still allows
+    them, unless upgrade is set. marimo is added to the requirements if the header
+    does not list it, as the export runs it from the same environment.
+
+    Args:
+        notebook (Notebook): The notebook to lock
+        upgrade (bool, optional): Resolve the newest allowed versions. Defaults to False.
+
+    Returns:
+        Path: The lock
+
+    Raises:
+        ValueError: If uv is not installed or cannot resolve the header
+
+    """
+    source = notebook.path.read_text(encoding="utf-8")
+    metadata = notebook.script_metadata
+    requirements = list(metadata.get("dependencies", []))
+    if "marimo" not in notebook.dependencies:
+        requirements.append("marimo")
+
+    lock = lock_path(notebook)
+    with tempfile.TemporaryDirectory(prefix="marimushka-lock-") as tmp:
+        tmp = Path(tmp)
+        (tmp / "requirements.in").write_text("\n".join(requirements) + "\n", encoding="utf-8")
+        if lock.is_file():
+            # uv prefers the versions already in its output file
+            (tmp / "requirements.txt").write_bytes(lock.read_bytes())
+        cmd = ["uv", "pip", "compile", "--universal", "--quiet", "--no-header", "--no-annotate"]
+        python = MINIMUM_PYTHON.search(metadata.get("requires-python", ""))
+        if python is not None:
+            cmd += ["--python-version", python[1]]
+        if upgrade:
+            cmd.append("--upgrade")
+        cmd += ["requirements.in", "--output-file", "requirements.txt"]
+
+        logger.debug(f"Running command: {cmd}")
+        try:
+            subprocess.run(cmd, cwd=tmp, capture_output=True, text=True, check=True)
+        except FileNotFoundError as e:
+            raise ValueError("uv is needed to lock notebooks but was not found") from e
+        except subprocess.CalledProcessError as e:
+            raise ValueError(f"Could not resolve the dependencies of {notebook.path}: {e.stderr.strip()}") from e
+        pinned = (tmp / "requirements.txt").read_text(encoding="utf-8")
+
+    header = f"# marimushka header sha256:{header_digest(source)}\n"
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=lock.parent, delete=False) as f:
+        f.write(header + pinned)
+    os.replace(f.name, lock)
+    return lock
+
+
+def lock_notebooks(notebooks: list[Notebook], workers: int | None = None, upgrade: bool = False) -> dict[Notebook, str]:
+    """Lock all notebooks whose lock is missing or stale, resolving several at once.
+
+    A notebook listed in more than one folder is locked once.
+
+    Args:
+        notebooks (list[Notebook]): The notebooks
+        workers (int, optional): Maximum number of concurrent resolutions. Defaults to the number of CPUs.
+        upgrade (bool, optional): Renew fresh locks too, resolving the newest allowed versions.
+            Defaults to False.
+
+    Returns:
+        dict[Notebook, str]: What happened to each notebook: "locked", "fresh" or the error
+
+    """
+    unique = list({lock_path(nb).resolve(): nb for nb in notebooks}.values())
+    todo = [nb for nb in unique if upgrade or lock_status(nb) != "fresh"]
+    results = dict.fromkeys(unique, "fresh")
+
+    def run(nb: Notebook) -> str:
+        try:
+            compile_lock(nb, upgrade=upgrade)
+        except ValueError as e:
+            logger.error(str(e))
+            return str(e)
+        logger.info(f"Locked {nb.path} in {lock_path(nb)}")
+        return "locked"
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            results.update(zip(todo, pool.map(run, todo), strict=True))
+    return results
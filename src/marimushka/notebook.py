@@ -3,12 +3,28 @@
 This module provides the Notebook class for representing and exporting marimo notebooks.
 """
 
+import ast
 import dataclasses
-import subprocess
+import re
 from enum import Enum
 from pathlib import Path
 
-from loguru import logger
+try:
+    import tomllib
+except ImportError:  # Python 3.10
+    tomllib = None
+
+# PEP 723 inline script metadata block (reference regular expression from the PEP)
+METADATA_BLOCK = re.compile(r"(?m)^# /// (?P<type>[a-zA-Z0-9-]+)$\s(?P<content>(^#(| .*)$\s)+)^# ///$")
+
+# Leading distribution name of a PEP 508 requirement
+REQUIREMENT_NAME = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+# Folder next to a notebook whose files marimo ships with the export
+PUBLIC = "public"
+
+# A path into the public folder inside a string, e.g. in markdown or a read_csv call
+PUBLIC_PATH = re.compile(r"(?:^|(?<=[\s\"'(=]))(?:\./)?(public/[^\s\"'<>()]+)")
 
 
 class Kind(Enum):
@@ -121,6 +137,9 @@ class Notebook:
         suitable for applications. Otherwise, it's exported in "edit" mode,
         suitable for interactive notebooks.
 
+        A notebook with a fresh lock (see lockfile.py) is exported with the pinned
+        requirements of its lock instead of resolving its header in a sandbox.
+
         Args:
             output_dir (Path): Directory where the exported HTML file will be saved
 
@@ -128,7 +147,16 @@ class Notebook:
             bool: True if export succeeded, False otherwise
 
         """
+        import subprocess
+
+        from loguru import logger
+
+        from .lockfile import fresh_lock, locked_command
+
         cmd = self.kind.command
+        lock = fresh_lock(self)
+        if lock is not None:
+            cmd = locked_command(cmd, lock)
 
         try:
             # Create the full output path and ensure the directory exists
@@ -162,6 +190,161 @@ class Notebook:
         """Return the path to the exported HTML file."""
         return self.kind.html_path / f"{self.path.stem}.html"
 
+    @property
+    def title(self) -> str:
+        """Return the title of the notebook.
+
+        The title is the first line of the module docstring without its trailing
+        period (e.g. "Palmer Penguins Analysis"). Notebooks without a docstring,
+        or whose source cannot be parsed, fall back to the display name.
+        """
+        try:
+            docstring = ast.get_docstring(ast.parse(self.path.read_text(encoding="utf-8")))
+        except (OSError, SyntaxError, UnicodeDecodeError, ValueError):
+            docstring = None
+
+        if not docstring or not docstring.strip():
+            return self.display_name
+        return docstring.strip().splitlines()[0].strip().rstrip(".")
+
+    @property
+    def script_metadata(self) -> dict:
+        """Return the PEP 723 script metadata of the notebook (empty if there is none)."""
+        return script_metadata(self.path.read_text(encoding="utf-8"))
+
+    @property
+    def data_files(self) -> list[Path]:
+        """Return the existing data files the notebook reads, as found by data_references."""
+        try:
+            references = data_references(self.path.read_text(encoding="utf-8"))
+        except (OSError, UnicodeDecodeError):
+            references = [PUBLIC]
+
+        files: set[Path] = set()
+        for reference in references:
+            path = self.path.parent / reference
+            if path.is_file():
+                files.add(path)
+            elif path.is_dir():
+                files.update(p for p in path.rglob("*") if p.is_file())
+        return sorted(files)
+
+    @property
+    def dependencies(self) -> list[str]:
+        """Return the canonical names of the distributions the notebook header requires."""
+        requirements = self.script_metadata.get("dependencies", [])
+        names = [match[1] for match in map(REQUIREMENT_NAME.match, requirements) if match]
+        return list(dict.fromkeys(canonical_name(name) for name in names))
+
+
+def canonical_name(name: str) -> str:
+    """Normalise a distribution name as described in PEP 503.
+
+    >>> canonical_name("Scikit_Learn")
+    'scikit-learn'
+
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def script_metadata(source: str) -> dict:
+    r"""Return the PEP 723 "script" metadata of a Python source file.
+
+    Args:
+        source (str): Content of the notebook
+
+    Returns:
+        dict: The parsed TOML table, empty if the notebook has no script block
+
+    >>> script_metadata('# /// script\n# dependencies = ["marimo", "polars>=1.0"]\n# ///\n')["dependencies"]
+    ['marimo', 'polars>=1.0']
+
+    """
+    match = next((m for m in METADATA_BLOCK.finditer(source) if m["type"] == "script"), None)
+    if match is None:
+        return {}
+
+    content = "".join(line[2:] if line.startswith("# ") else line[1:] for line in match["content"].splitlines(True))
+    if tomllib is None:
+        # Without a TOML parser only the dependencies array is extracted
+        array = re.search(r"(?ms)^dependencies\s*=\s*\[(.*?)\]", content)
+        return {"dependencies": re.findall(r"[\"']([^\"']+)[\"']", array[1])} if array else {}
+    return tomllib.loads(content)
+
+
+def data_references(source: str) -> list[str]:
+    """Return the data a notebook reads, as paths relative to the notebook.
+
+    References are found statically: a chain such as
+    `mo.notebook_location() / "public" / "penguins.csv"` yields that file, and a
+    string literal containing a path below public/ (e.g. "public/logo.png" in
+    markdown) yields that path. The references only narrow the data down if they
+    are complete: if the notebook names none, uses notebook_location() in any
+    other way, mentions public in a string that is not such a path (e.g. an
+    f-string building one), or cannot be parsed, the whole public folder is assumed.
+
+    Args:
+        source (str): Content of the notebook
+
+    Returns:
+        list[str]: Relative POSIX paths of files or folders, without duplicates
+
+    >>> data_references('file = mo.notebook_location() / "public" / "penguins.csv"')
+    ['public/penguins.csv']
+    >>> data_references("mo.md('![logo](public/logo.png)')"), data_references("x = 1")
+    (['public/logo.png'], ['public'])
+    >>> data_references("folder = mo.notebook_location() / name")
+    ['public']
+    >>> data_references('pl.read_csv(f"public/{name}.csv")')
+    ['public']
+
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return [PUBLIC]
+
+    references = []
+    chained = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Div) and id(node) not in chained:
+            # Flatten a / b / c, which parses as (a / b) / c
+            parts, left = [], node
+            while isinstance(left, ast.BinOp) and isinstance(left.op, ast.Div):
+                chained.add(id(left))
+                parts.insert(0, left.right)
+                left = left.left
+            if _is_notebook_location(left):
+                chained.update(id(part) for part in parts)
+                names = []
+                for part in parts:
+                    if not (isinstance(part, ast.Constant) and isinstance(part.value, str)):
+                        break
+                    names.append(part.value.strip("/"))
+                references.append("/".join(names) if names and names[0] == PUBLIC else PUBLIC)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in chained:
+            paths = PUBLIC_PATH.findall(node.value)
+            references.extend(paths)
+            if node.value.count(PUBLIC) > len(paths):
+                # A path built at run time, e.g. f"public/{name}.csv"
+                references.append(PUBLIC)
+
+    # Any other use of notebook_location() may read anything next to the notebook
+    calls = sum(1 for node in ast.walk(tree) if _is_notebook_location(node))
+    chains = sum(1 for node in ast.walk(tree) if isinstance(node, ast.BinOp) and _is_notebook_location(node.left))
+    if calls > chains or not references:
+        references.append(PUBLIC)
+    return list(dict.fromkeys(references))
+
+
+def _is_notebook_location(node: ast.AST) -> bool:
+    """Return True if a node is a call of notebook_location(), e.g. mo.notebook_location()."""
+    if not isinstance(node, ast.Call):
+        return False
+    func = node.func
+    name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+    return name == "notebook_location"
+
 
 def folder2notebooks(folder: Path | str | None, kind: Kind = Kind.NB) -> list[Notebook]:
     """Find all marimo notebooks in a directory."""
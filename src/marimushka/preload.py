@@ -0,0 +1,134 @@
+"""Preload module for hinting the Pyodide packages a WASM notebook needs.
+
+WASM exports only discover their packages once the Pyodide runtime has booted,
+which leaves a serial waterfall of downloads. This module maps the PEP 723
+dependencies of a notebook to packages of the Pyodide distribution via its
+pyodide-lock.json, and injects <link rel="preload"> and <link rel="modulepreload">
+hints into the exported page so the runtime and the packages download in parallel
+with start-up.
+"""
+
+import dataclasses
+import json
+import re
+from html import escape
+from pathlib import Path
+
+from .notebook import canonical_name
+
+# CDN the marimo WASM runtime loads Pyodide from
+PYODIDE_CDN = "https://cdn.jsdelivr.net/pyodide/v{version}/full/"
+
+# Runtime files every WASM page fetches while Pyodide boots, preloaded as fetch
+RUNTIME_FILES = ("pyodide.asm.wasm", "python_stdlib.zip", "pyodide-lock.json")
+
+# Marker placed before the injected hints, so a page is never hinted twice
+MARKER = "<!-- marimushka: preload hints -->"
+
+
+@dataclasses.dataclass(frozen=True)
+class PyodideLock:
+    """The package index of a Pyodide distribution (its pyodide-lock.json).
+
+    Attributes:
+        version (str): Version of Pyodide the lock belongs to
+        packages (dict[str, dict]): Lock entries keyed by canonical package name
+        base_url (str): URL the runtime and package files are served from
+
+    """
+
+    version: str
+    packages: dict[str, dict]
+    base_url: str
+
+    @classmethod
+    def from_file(cls, path: str | Path, base_url: str | None = None) -> "PyodideLock":
+        """Load a pyodide-lock.json.
+
+        Args:
+            path (str | Path): Path of the lock file
+            base_url (str, optional): Where the files are served from. Defaults to the
+                jsDelivr CDN for the version recorded in the lock.
+
+        Returns:
+            PyodideLock: The loaded lock
+
+        Raises:
+            ValueError: If the file is not a Pyodide lock
+
+        """
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        try:
+            version = data["info"]["version"]
+            packages = {canonical_name(name): entry for name, entry in data["packages"].items()}
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Not a pyodide-lock.json: {path}") from e
+        return cls(version=version, packages=packages, base_url=base_url or PYODIDE_CDN.format(version=version))
+
+    def resolve(self, names: list[str]) -> list[str]:
+        """Map distribution names to the Pyodide packages they need, including dependencies.
+
+        Names without a Pyodide package (pure Python wheels installed by micropip,
+        or marimo itself) are skipped.
+
+        Args:
+            names (list[str]): Canonical distribution names
+
+        Returns:
+            list[str]: Names of the lock entries to download, without duplicates
+
+        """
+        resolved: dict[str, None] = {}
+
+        def visit(name: str) -> None:
+            name = canonical_name(name)
+            if name in resolved or name not in self.packages:
+                return
+            resolved[name] = None
+            for dependency in self.packages[name].get("depends", []):
+                visit(dependency)
+
+        for name in names:
+            visit(name)
+        return list(resolved)
+
+    def hints(self, names: list[str]) -> str:
+        """Build the preload hints for the runtime and the packages of a notebook.
+
+        Args:
+            names (list[str]): Canonical distribution names from the notebook header
+
+        Returns:
+            str: The <link> elements, one per line
+
+        """
+        base = self.base_url
+        links = [f'<link rel="modulepreload" href="{escape(base)}pyodide.mjs" crossorigin>']
+        files = [*RUNTIME_FILES, *(self.packages[name]["file_name"] for name in self.resolve(names))]
+        links += [f'<link rel="preload" href="{escape(base + file)}" as="fetch" crossorigin>' for file in files]
+        return "\n".join(links)
+
+
+def inject_hints(html_file: Path, hints: str) -> bool:
+    """Insert preload hints at the start of the <head> of an exported page.
+
+    Args:
+        html_file (Path): The exported page
+        hints (str): The <link> elements to insert
+
+    Returns:
+        bool: True if the page was changed, False if it is missing, has no <head>
+            or already carries hints
+
+    """
+    html_file = Path(html_file)
+    if not html_file.is_file():
+        return False
+
+    html = html_file.read_text(encoding="utf-8")
+    head = re.search(r"<head(\s[^>]*)?>", html, flags=re.IGNORECASE)
+    if head is None or MARKER in html:
+        return False
+
+    html_file.write_text(f"{html[: head.end()]}\n{MARKER}\n{hints}\n{html[head.end() :]}", encoding="utf-8")
+    return True
@@ -0,0 +1,161 @@
+"""Progress module for a live view of a running build in the terminal.
+
+The view consumes the event stream of a build (see events.py) and shows a rich
+progress bar of the exports with the notebooks done out of those queued, the
+throughput in notebooks per minute, the estimated time remaining, the number of
+cache hits and failures, and the notebooks the workers are exporting right now.
+
+While the view is shown, log messages are printed through its console above the
+progress bar, instead of by the default loguru handler writing to standard error,
+which would tear the live display apart. Handlers added by the caller are left alone.
+"""
+
+import sys
+import threading
+import time
+
+from loguru import logger
+from rich.console import Console
+from rich.progress import (
+    BarColumn,
+    MofNCompleteColumn,
+    Progress,
+    SpinnerColumn,
+    TaskID,
+    TextColumn,
+    TimeElapsedColumn,
+    TimeRemainingColumn,
+)
+from rich.text import Text
+
+from .events import BuildEvent, EventType
+
+# Notebooks listed by name among the active workers, the rest are counted
+SHOWN_ACTIVE = 3
+
+# Id of the loguru handler writing to standard error with the default configuration;
+# loguru adds it as 0, a view that replaced it adds it again under a new id
+_stderr_handler: int | None = 0
+
+
+class ProgressView:
+    """Show the progress of a build live, as a callback for main(on_event=...).
+
+    Use it as a context manager around the build:
+
+        with ProgressView() as view:
+            main(on_event=view)
+
+    Entering the view replaces the default loguru handler, if it is still installed,
+    with one printing through the console; leaving restores the default handler.
+    Other handlers keep receiving every message.
+
+    Attributes:
+        discovered (int): Notebooks found
+        queued (int): Exports queued
+        done (int): Exports ended, by a cache hit, a finished or a failed export
+        cache_hits (int): Exports taken from the export cache
+        failed (int): Exports that failed
+        active (list[str]): Names of the notebooks being exported
+
+    """
+
+    def __init__(self, console: Console | None = None):
+        """Prepare a view writing to the given console, by default standard error."""
+        self.progress = Progress(
+            SpinnerColumn(),
+            TextColumn("[bold]{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            TextColumn("{task.fields[rate]}"),
+            TimeElapsedColumn(),
+            TextColumn("ETA"),
+            TimeRemainingColumn(),
+            TextColumn("{task.fields[status]}"),
+            console=console or Console(stderr=True),
+        )
+        self.discovered = self.queued = self.done = self.cache_hits = self.failed = 0
+        self.active: list[str] = []
+        self._task: TaskID | None = None
+        self._sink: int | None = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ProgressView":
+        """Start the live display."""
+        self._start = time.perf_counter()
+        self._task = self.progress.add_task("Exporting", total=None, rate="", status="")
+        global _stderr_handler
+        if _stderr_handler is not None:
+            try:
+                logger.remove(_stderr_handler)
+                self._sink = logger.add(self._log)
+            except ValueError:
+                # The caller removed the default handler and configured logging itself
+                pass
+            _stderr_handler = None
+        self.progress.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        """Stop the live display, leaving its last state on screen, and restore the default handler."""
+        global _stderr_handler
+        self._refresh()
+        self.progress.stop()
+        if self._sink is not None:
+            logger.remove(self._sink)
+            self._sink = None
+            _stderr_handler = logger.add(sys.stderr)
+
+    def _log(self, message: str) -> None:
+        """Print a log message above the live display."""
+        self.progress.console.print(Text(str(message).rstrip("\n")), soft_wrap=True)
+
+    def __call__(self, event: BuildEvent) -> None:
+        """Take in an event of the build."""
+        with self._lock:
+            name = event.notebook.html_path.as_posix()
+            if event.type is EventType.DISCOVERED:
+                self.discovered += 1
+            elif event.type is EventType.QUEUED:
+                self.queued += 1
+            elif event.type is EventType.STARTED:
+                self.active.append(name)
+            elif event.type.done:
+                self.done += 1
+                self.cache_hits += event.type is EventType.CACHE_HIT
+                self.failed += event.type is EventType.FAILED
+                if name in self.active:
+                    self.active.remove(name)
+            self._refresh()
+
+    @property
+    def throughput(self) -> float:
+        """Return the exports ended per minute so far."""
+        elapsed = time.perf_counter() - self._start
+        return 60 * self.done / elapsed if elapsed > 0 else 0.0
+
+    def status(self) -> str:
+        """Describe the cache hits, failures and active workers."""
+        parts = [f"{len(self.active)} active"]
+        if self.active:
+            shown = ", ".join(self.active[:SHOWN_ACTIVE])
+            more = len(self.active) - SHOWN_ACTIVE
+            parts[0] += f": {shown}" + (f" +{more}" if more > 0 else "")
+        if self.cache_hits:
+            parts.append(f"{self.cache_hits} cached")
+        if self.failed:
+            parts.append(f"[red]{self.failed} failed[/red]")
+        return " | ".join(parts)
+
+    def _refresh(self) -> None:
+        """Show the current counts."""
+        if self._task is None:
+            return
+        self.progress.update(
+            self._task,
+            total=self.queued or None,
+            completed=self.done,
+            rate=f"{self.throughput:.1f}/min",
+            status=self.status(),
+        )
@@ -0,0 +1,240 @@
+"""Scheduler module for running exports concurrently within the memory of the machine.
+
+Static notebooks execute their code while exporting and can need gigabytes, while
+WASM exports only bundle the notebook. A fixed number of workers either leaves cores
+idle or runs the machine out of memory, so exports are admitted by memory instead:
+each export is predicted to need the peak resident memory measured for it in an
+earlier build (or a default for its kind), and a new export starts only while the
+predictions of all running exports fit into the memory that was available when the
+build started (from /proc/meminfo or the cgroup limit, whichever is lower).
+
+The peak of each export is measured by sampling the resident memory of the
+processes whose command line names the notebook, on systems that have /proc.
+"""
+
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from loguru import logger
+
+from .history import BuildHistory
+from .notebook import Kind, Notebook
+
+# Sources of the available memory
+MEMINFO = Path("/proc/meminfo")
+CGROUP = Path("/sys/fs/cgroup")
+PROC = Path("/proc")
+
+# Predicted peak memory of notebooks without history: static exports run the notebook
+DEFAULT_PEAK = {Kind.NB: 1 << 30, Kind.NB_WASM: 384 << 20, Kind.APP: 384 << 20}
+
+# Share of the available memory kept free for everything else
+RESERVE = 0.1
+
+# Seconds between two samples of the memory of running exports
+SAMPLE_INTERVAL = 0.25
+
+# cgroup v1 reports "no limit" as a huge number
+UNLIMITED = 1 << 60
+
+
+def _read_int(path: Path) -> int | None:
+    """Return the integer in a cgroup file, None if it is missing or says "max"."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    return int(value) if value.isdigit() and int(value) < UNLIMITED else None
+
+
+def available_memory(meminfo: Path = MEMINFO, cgroup: Path = CGROUP) -> int | None:
+    """Return the memory in bytes that new processes can use, None if it is unknown.
+
+    The lower of MemAvailable in /proc/meminfo and the unused part of the cgroup
+    limit (v2 memory.max, or v1 memory.limit_in_bytes) is returned.
+
+    Args:
+        meminfo (Path, optional): The meminfo file. Defaults to /proc/meminfo.
+        cgroup (Path, optional): The cgroup filesystem. Defaults to /sys/fs/cgroup.
+
+    Returns:
+        int | None: Available bytes
+
+    """
+    candidates = []
+    try:
+        with open(meminfo, encoding="utf-8") as f:
+            candidates.extend(int(line.split()[1]) * 1024 for line in f if line.startswith("MemAvailable:"))
+    except (OSError, ValueError, IndexError):
+        pass
+
+    for limit, usage in (
+        (cgroup / "memory.max", cgroup / "memory.current"),
+        (cgroup / "memory" / "memory.limit_in_bytes", cgroup / "memory" / "memory.usage_in_bytes"),
+    ):
+        maximum = _read_int(limit)
+        if maximum is not None:
+            candidates.append(max(maximum - (_read_int(usage) or 0), 0))
+            break
+    return min(candidates) if candidates else None
+
+
+def predicted_peak(notebook: Notebook, history: BuildHistory) -> int:
+    """Return the peak memory an export is expected to need, as measured before or the default of its kind."""
+    measured = history.get(notebook, "peak_rss")
+    return int(measured) if measured else DEFAULT_PEAK.get(notebook.kind, DEFAULT_PEAK[Kind.NB])
+
+
+def _signature(notebook: Notebook) -> tuple[list[bytes], bytes]:
+    """Return the spellings of a notebook path and the export subcommand on a command line."""
+    paths = list(dict.fromkeys([str(notebook.path).encode(), str(notebook.path.resolve()).encode()]))
+    subcommand = notebook.kind.command[3].encode()
+    return paths, b"\0" + subcommand + b"\0"
+
+
+class PeakMonitor:
+    """Sample the resident memory of running exports and keep the peak of each.
+
+    The processes of an export (uvx, uv and marimo) are recognised by the notebook
+    path and the export subcommand on their command line. Without /proc nothing is
+    measured.
+
+    Attributes:
+        peaks (dict[Notebook, int]): Highest resident memory seen per watched notebook
+
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, proc: Path = PROC):
+        """Prepare a monitor sampling every interval seconds."""
+        self.interval = interval
+        self.proc = proc
+        self.peaks: dict[Notebook, int] = {}
+        self._watched: dict[Notebook, tuple[list[bytes], bytes]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="marimushka-peak-monitor", daemon=True)
+
+    def __enter__(self) -> "PeakMonitor":
+        """Start sampling if /proc is available."""
+        if self.proc.is_dir():
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        """Stop sampling."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def watch(self, notebook: Notebook) -> None:
+        """Start measuring the export of a notebook."""
+        with self._lock:
+            self._watched[notebook] = _signature(notebook)
+            self.peaks[notebook] = 0
+
+    def unwatch(self, notebook: Notebook) -> int | None:
+        """Stop measuring the export of a notebook and return its peak, None if nothing was seen."""
+        with self._lock:
+            self._watched.pop(notebook, None)
+            return self.peaks.pop(notebook, 0) or None
+
+    def _run(self) -> None:
+        """Sample until stopped."""
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        """Add up the resident memory of the processes of each watched export."""
+        with self._lock:
+            watched = dict(self._watched)
+        if not watched:
+            return
+
+        totals = dict.fromkeys(watched, 0)
+        for entry in os.scandir(self.proc):
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(os.path.join(entry.path, "cmdline"), "rb") as f:
+                    cmdline = b"\0" + f.read()
+                owners = [
+                    nb for nb, (paths, sub) in watched.items() if sub in cmdline and any(p in cmdline for p in paths)
+                ]
+                if not owners:
+                    continue
+                with open(os.path.join(entry.path, "status"), encoding="utf-8") as f:
+                    rss = next((int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:")), 0)
+            except (OSError, ValueError, IndexError):
+                continue
+            for nb in owners:
+                totals[nb] += rss
+
+        with self._lock:
+            for nb, total in totals.items():
+                if nb in self.peaks:
+                    self.peaks[nb] = max(self.peaks[nb], total)
+
+
+def run_within_memory(
+    tasks: list[tuple[Notebook, Callable[[], None]]],
+    estimate: Callable[[Notebook], int],
+    workers: int | None = None,
+    memory: int | None = None,
+) -> dict[Notebook, dict[str, float]]:
+    """Run export tasks in threads, starting each only while the predicted memory fits.
+
+    Tasks are started in order, except that a task that does not fit yet is passed
+    over in favour of a later, lighter one. With nothing running, the next task
+    starts even if it is predicted not to fit, so the build always progresses.
+
+    Args:
+        tasks (list[tuple[Notebook, Callable]]): Notebooks and the functions exporting them
+        estimate (Callable[[Notebook], int]): Predicted peak memory of an export in bytes
+        workers (int, optional): Maximum number of concurrent exports. Defaults to the number of CPUs.
+        memory (int, optional): Memory the exports may use. Defaults to the available memory,
+            less a reserve; if that is unknown only the number of workers limits concurrency.
+
+    Returns:
+        dict[Notebook, dict[str, float]]: Wall time ("seconds") and, where measured, peak
+            resident memory ("peak_rss") of each export
+
+    """
+    workers = workers or os.cpu_count() or 1
+    if memory is None:
+        available = available_memory()
+        memory = int(available * (1 - RESERVE)) if available is not None else None
+    if memory is not None and workers > 1:
+        logger.info(f"Running up to {workers} exports within {memory / (1 << 30):.1f} GiB of memory")
+
+    pending = [(nb, task, estimate(nb)) for nb, task in tasks]
+    running: dict[Future, tuple[Notebook, int, float]] = {}
+    metrics: dict[Notebook, dict[str, float]] = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool, PeakMonitor() as monitor:
+        while pending or running:
+            while pending and len(running) < workers:
+                used = sum(need for _, need, _ in running.values())
+                index = next(
+                    (i for i, (_, _, need) in enumerate(pending) if memory is None or used + need <= memory),
+                    None if running else 0,
+                )
+                if index is None:
+                    break
+                nb, task, need = pending.pop(index)
+                monitor.watch(nb)
+                running[pool.submit(task)] = (nb, need, time.perf_counter())
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                nb, _, start = running.pop(future)
+                peak = monitor.unwatch(nb)
+                future.result()
+                metrics[nb] = {"seconds": round(time.perf_counter() - start, 3)}
+                if peak:
+                    metrics[nb]["peak_rss"] = peak
+    return metrics
@@ -0,0 +1,285 @@
+"""Selfhost module for serving the CDN assets of a site from the site itself.
+
+The bundled template loads the Tailwind CDN script and the marimo logo from
+raw.githubusercontent.com, and marimo exports load the frontend runtime from
+jsDelivr. Such a site breaks on air-gapped hosts and depends on third parties
+for every page view. This module downloads the external scripts, stylesheets
+and images the pages of a site reference into _assets/, one folder per host:
+
+    https://cdn.tailwindcss.com                -> _assets/cdn.tailwindcss.com/index.js
+    https://cdn.jsdelivr.net/npm/x@1/index.css -> _assets/cdn.jsdelivr.net/npm/x@1/index.css
+
+and rewrites the pages to load the local copies. The relative imports of mirrored
+JavaScript modules and the url() references of mirrored stylesheets (fonts,
+images) are mirrored as well, keeping their relative layout.
+
+Downloads are kept in the marimushka cache directory. Builds without network
+access take the files from a mirror directory with the same layout instead, for
+example the _assets folder of an earlier build.
+
+Files the runtime requests while it runs, such as the Pyodide packages of WASM
+notebooks, cannot be found in the pages and still come from their CDNs; the
+service worker caches those.
+"""
+
+import hashlib
+import posixpath
+import re
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path, PurePosixPath
+from urllib.parse import urljoin, urlsplit
+
+from loguru import logger
+
+from .cache import cache_dir
+from .delta import write_if_changed
+
+# Folder of the site the assets are mirrored into
+ASSET_DIR = "_assets"
+
+# Seconds to wait for a CDN to answer
+TIMEOUT = 30
+
+# Concurrent downloads
+DOWNLOAD_JOBS = 8
+
+# Link relations whose target is loaded as part of the page
+LOADED_RELS = {"stylesheet", "icon", "shortcut", "apple-touch-icon", "manifest"}
+
+# Relative module specifiers of static and dynamic imports and re-exports
+JS_IMPORT = re.compile(r"""(?:\bfrom\s*|\bimport\s*\(\s*|\bimport\s+)(["'])(\.{1,2}/[^"'\s]+)\1""")
+
+# url() and @import references of a stylesheet
+CSS_REFERENCE = re.compile(r"""(url\(\s*(["']?))([^"')\s]+)(\2\s*\))|(@import\s+(["']))([^"']+)(\6)""")
+
+# Suffix of a mirrored file without one, by the element that loads it
+DEFAULT_SUFFIX = {"script": ".js", "stylesheet": ".css"}
+
+
+def local_name(url: str, suffix: str = "") -> str:
+    """Return the path of a mirrored URL below the asset folder.
+
+    The path starts with the host. A URL ending in a folder gets the name index,
+    a query string is folded into the name as a short hash, and the given suffix
+    is added to names without one.
+
+    Raises:
+        ValueError: If the host is missing or the host or a path segment is or contains
+            "..", which could place the file outside the asset folder
+
+    >>> local_name("https://cdn.tailwindcss.com", ".js")
+    'cdn.tailwindcss.com/index.js'
+    >>> local_name("https://fonts.example.org/font.woff2?v=2")
+    'fonts.example.org/font-269fc203.woff2'
+    >>> local_name("https://example.org/a/../../etc/passwd")
+    Traceback (most recent call last):
+    ...
+    ValueError: Cannot mirror https://example.org/a/../../etc/passwd: it leaves the asset folder
+
+    """
+    parts = urlsplit(url)
+    segments = [segment for segment in parts.path.split("/") if segment not in ("", ".")]
+    if not parts.netloc or any(".." in part or "\\" in part for part in (parts.netloc, *segments)):
+        raise ValueError(f"Cannot mirror {url}: it leaves the asset folder")
+    if not segments or parts.path.endswith("/"):
+        segments.append("index")
+    name = PurePosixPath(parts.netloc, *segments)
+    if parts.query:
+        name = name.with_name(f"{name.stem}-{hashlib.sha256(parts.query.encode()).hexdigest()[:8]}{name.suffix}")
+    if not name.suffix and suffix:
+        name = name.with_name(name.name + suffix)
+    return name.as_posix()
+
+
+def _is_remote(url: str) -> bool:
+    """Return True for an absolute http(s) URL, including protocol-relative ones."""
+    return url.startswith(("http://", "https://", "//"))
+
+
+def _absolute(url: str) -> str:
+    """Return an http(s) URL for a protocol-relative one."""
+    return f"https:{url}" if url.startswith("//") else url
+
+
+class _AssetParser(HTMLParser):
+    """Collect the external URLs a page loads, with the suffix to give a mirrored copy."""
+
+    def __init__(self) -> None:
+        """Start with no URLs."""
+        super().__init__(convert_charrefs=True)
+        self.urls: dict[str, str] = {}
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        """Record the external URL an element loads, if any."""
+        values = {name: value or "" for name, value in attrs}
+        if tag == "script" and _is_remote(values.get("src", "")):
+            self.urls.setdefault(values["src"], DEFAULT_SUFFIX["script"])
+        elif tag == "link" and _is_remote(values.get("href", "")):
+            rels = set(values.get("rel", "").lower().split())
+            if rels & LOADED_RELS:
+                suffix = DEFAULT_SUFFIX["stylesheet"] if "stylesheet" in rels else ""
+                self.urls.setdefault(values["href"], suffix)
+        elif tag in ("img", "source", "audio", "video") and _is_remote(values.get("src", "")):
+            self.urls.setdefault(values["src"], "")
+
+
+class AssetMirror:
+    """Fetch external assets from a mirror directory, the download cache or the network.
+
+    Attributes:
+        mirror (Path | None): Directory with the files in the layout of local_name. If
+            given, nothing is downloaded.
+        cache (Path): Directory downloaded files are kept in
+
+    """
+
+    def __init__(self, mirror: str | Path | None = None):
+        """Prepare fetching from a mirror directory, or from the network if None."""
+        self.mirror = Path(mirror) if mirror else None
+        if self.mirror is not None and not self.mirror.is_dir():
+            raise ValueError(f"Asset mirror {self.mirror} is not a directory")
+        self.cache = cache_dir("assets")
+
+    def fetch(self, url: str, name: str) -> bytes | None:
+        """Return the content of a URL stored under the given local name, or None if unavailable."""
+        if self.mirror is not None:
+            try:
+                return (self.mirror / name).read_bytes()
+            except OSError:
+                logger.warning(f"Not in the asset mirror {self.mirror}: {name} ({url})")
+                return None
+
+        cached = self.cache / name
+        try:
+            return cached.read_bytes()
+        except OSError:
+            pass
+        try:
+            request = urllib.request.Request(url, headers={"User-Agent": "marimushka"})
+            with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+                data = response.read()
+        except OSError as e:
+            logger.warning(f"Could not download {url}: {e}")
+            return None
+        try:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cached.with_name(f".{cached.name}.tmp")
+            tmp.write_bytes(data)
+            tmp.replace(cached)
+        except OSError as e:
+            logger.debug(f"Could not cache {url} in {cached}: {e}")
+        return data
+
+
+def self_host_assets(root: Path, mirror: str | Path | None = None) -> dict[str, str]:
+    """Mirror the external assets of the pages of a site into _assets/ and load them from there.
+
+    Args:
+        root (Path): The site directory
+        mirror (str | Path, optional): Directory to take the files from instead of the network
+
+    Returns:
+        dict[str, str]: Site-relative names of the mirrored files keyed by their URLs. Assets
+            that could not be fetched are left out, and the pages keep loading them remotely.
+
+    """
+    root = Path(root)
+    source = AssetMirror(mirror)
+    pages = sorted(p for p in root.rglob("*.html") if p.is_file())
+
+    # The URLs of every page, with the suffix their element implies
+    wanted: dict[str, str] = {}
+    for page in pages:
+        parser = _AssetParser()
+        parser.feed(page.read_text(encoding="utf-8", errors="surrogateescape"))
+        for url, suffix in parser.urls.items():
+            wanted.setdefault(url, suffix)
+    if not wanted:
+        return {}
+
+    # Fetch in waves, each adding the imports and url() references of the files it fetched
+    names: dict[str, str] = {}
+    contents: dict[str, bytes] = {}
+    rejected: set[str] = set()
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_JOBS) as pool:
+        while wanted:
+            pending = {}
+            for url, suffix in wanted.items():
+                if url in names or url in rejected:
+                    continue
+                try:
+                    pending[url] = local_name(_absolute(url), suffix)
+                except ValueError as e:
+                    logger.warning(f"{e}, it is loaded remotely")
+                    rejected.add(url)
+            wanted = {}
+            fetched = pool.map(lambda item: (item, source.fetch(_absolute(item[0]), item[1])), pending.items())
+            for (url, name), data in fetched:
+                names[url] = name
+                if data is None:
+                    continue
+                contents[url] = data
+                for reference, suffix in _references(name, data):
+                    target = urljoin(_absolute(url), reference)
+                    if _is_remote(target) and target not in names and target not in rejected:
+                        wanted.setdefault(target, suffix)
+
+    mirrored = {url: f"{ASSET_DIR}/{name}" for url, name in names.items() if url in contents}
+    for url, data in contents.items():
+        name = names[url]
+        if name.endswith(".css"):
+            data = _rewrite_stylesheet(data, url, name, names, mirrored)
+        write_if_changed(root / ASSET_DIR / name, data)
+
+    if mirrored:
+        for page in pages:
+            _rewrite_page(page, root, mirrored)
+
+    logger.info(f"Self-hosted {len(mirrored)} of {len(names)} external assets in {root / ASSET_DIR}")
+    return mirrored
+
+
+def _references(name: str, data: bytes) -> list[tuple[str, str]]:
+    """Return the references of a mirrored stylesheet or module, with the suffix to give their copies."""
+    if name.endswith(".css"):
+        text = data.decode("utf-8", errors="surrogateescape")
+        return [
+            (m[3], "") if m[3] else (m[7], DEFAULT_SUFFIX["stylesheet"])
+            for m in CSS_REFERENCE.finditer(text)
+            if not (m[3] or m[7]).startswith(("data:", "#"))
+        ]
+    if name.endswith((".js", ".mjs")):
+        text = data.decode("utf-8", errors="surrogateescape")
+        return [(m[2], "") for m in JS_IMPORT.finditer(text)]
+    return []
+
+
+def _rewrite_stylesheet(data: bytes, url: str, name: str, names: dict[str, str], mirrored: dict[str, str]) -> bytes:
+    """Point the url() and @import references of a mirrored stylesheet at the mirrored files."""
+    folder = posixpath.dirname(name)
+
+    def replace(m: re.Match) -> str:
+        start, reference, end = (m[1], m[3], m[4]) if m[3] else (m[5], m[7], m[8])
+        target = urljoin(_absolute(url), reference)
+        if target not in mirrored:
+            return m[0]
+        return start + posixpath.relpath(names[target], folder) + end
+
+    text = data.decode("utf-8", errors="surrogateescape")
+    return CSS_REFERENCE.sub(replace, text).encode("utf-8", errors="surrogateescape")
+
+
+def _rewrite_page(path: Path, root: Path, mirrored: dict[str, str]) -> None:
+    """Rewrite the src and href attributes of a page that load mirrored URLs, relative to the page."""
+    folder = path.parent.relative_to(root).as_posix()
+    pattern = re.compile(
+        r"(\b(?:src|href)\s*=\s*)([\"'])("
+        + "|".join(re.escape(url) for url in sorted(mirrored, key=len, reverse=True))
+        + r")\2"
+    )
+    text = path.read_text(encoding="utf-8", errors="surrogateescape")
+    rewritten = pattern.sub(lambda m: m[1] + m[2] + posixpath.relpath(mirrored[m[3]], folder) + m[2], text)
+    if rewritten != text:
+        path.write_text(rewritten, encoding="utf-8", errors="surrogateescape")
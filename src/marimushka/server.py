@@ -0,0 +1,341 @@
+"""Server module for previewing a site while exporting notebooks on demand.
+
+The preview server renders the index from notebook discovery alone and exports a
+notebook the first time its page is requested, so the first page is viewable in
+seconds instead of after a full build. Exports are kept in the output directory
+and redone when the notebook source is newer than its export. Files are served
+with ETags (answering If-None-Match with 304), byte ranges for large public/ data,
+and gzip or brotli variants when the client accepts them.
+"""
+
+import functools
+import gzip
+import mimetypes
+import re
+import shutil
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from loguru import logger
+
+from .notebook import Kind, Notebook, folder2notebooks
+
+# Suffixes of text formats worth compressing
+COMPRESSIBLE = (".html", ".js", ".mjs", ".css", ".json", ".csv", ".svg", ".txt", ".map", ".wasm")
+
+# Files smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+# Precompressed sidecar files by Content-Encoding, in order of preference
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+# A single byte range, e.g. "bytes=0-1023", "bytes=1024-" or "bytes=-512"
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+mimetypes.add_type("application/wasm", ".wasm")
+mimetypes.add_type("text/javascript", ".mjs")
+
+
+class PreviewSite:
+    """The notebooks of a project and the directory their exports are kept in.
+
+    Attributes:
+        output (Path): Directory holding the index and the exports
+        template (Path): Template the index is rendered from
+        folders (dict[Kind, Path]): Source folder of each kind of notebook
+
+    """
+
+    def __init__(
+        self,
+        output: str | Path,
+        template: str | Path,
+        notebooks: str | Path | None = "notebooks",
+        apps: str | Path | None = "apps",
+        notebooks_wasm: str | Path | None = "notebooks_wasm",
+    ):
+        """Prepare a preview of the notebooks in the given folders.
+
+        Args:
+            output (str | Path): Directory holding the index and the exports
+            template (str | Path): Template the index is rendered from
+            notebooks (str | Path, optional): Folder of notebooks exported as static HTML
+            apps (str | Path, optional): Folder of notebooks exported as WASM apps
+            notebooks_wasm (str | Path, optional): Folder of notebooks exported as editable WASM
+
+        """
+        self.output = Path(output)
+        self.template = Path(template)
+        self.folders = {
+            kind: Path(folder)
+            for kind, folder in ((Kind.NB, notebooks), (Kind.APP, apps), (Kind.NB_WASM, notebooks_wasm))
+            if folder
+        }
+        self._locks: dict[Path, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def discover(self) -> dict[Kind, list[Notebook]]:
+        """Find the notebooks currently present in the source folders."""
+        return {kind: folder2notebooks(folder, kind=kind) for kind, folder in self.folders.items()}
+
+    def render_index(self) -> Path:
+        """Render the index pages for the notebooks found right now, without exporting any.
+
+        Returns:
+            Path: The index.html file
+
+        """
+        from .export import _generate_index
+
+        found = self.discover()
+        _generate_index(
+            output=self.output,
+            template_file=self.template,
+            notebooks=found.get(Kind.NB, []),
+            apps=found.get(Kind.APP, []),
+            notebooks_wasm=found.get(Kind.NB_WASM, []),
+            export_notebooks=False,
+            return_html=False,
+        )
+        return self.output / "index.html"
+
+    def ensure_exported(self, notebook: Notebook) -> bool:
+        """Export a notebook unless its export exists and is newer than the source.
+
+        Concurrent requests for the same notebook wait for a single export.
+
+        Args:
+            notebook (Notebook): The notebook to export
+
+        Returns:
+            bool: True if an up-to-date export exists
+
+        """
+        with self._guard:
+            lock = self._locks.setdefault(notebook.path, threading.Lock())
+
+        target = self.output / notebook.html_path
+        with lock:
+            if target.is_file() and target.stat().st_mtime_ns >= notebook.path.stat().st_mtime_ns:
+                return True
+            logger.info(f"Exporting {notebook.path} on first request")
+            return notebook.export(output_dir=self.output / notebook.kind.html_path) and target.is_file()
+
+    def locate(self, name: str) -> Path | None:
+        """Map a site-relative path to the file that answers it, exporting notebooks on demand.
+
+        Data next to a notebook (e.g. its public/ folder) is served from the source
+        folder until the notebook has been exported.
+
+        Args:
+            name (str): The requested path relative to the site root
+
+        Returns:
+            Path | None: The file to serve, None if there is none
+
+        Raises:
+            RuntimeError: If the requested notebook fails to export
+
+        """
+        name = name.strip("/")
+        if name in ("", "index.html"):
+            return self.render_index()
+
+        pages = {nb.html_path.as_posix(): nb for found in self.discover().values() for nb in found}
+        if name in pages and not self.ensure_exported(pages[name]):
+            raise RuntimeError(f"Export of {pages[name].path} failed")
+
+        candidates = [(self.output / name, self.output)]
+        for kind, folder in self.folders.items():
+            prefix = f"{kind.html_path.as_posix()}/"
+            if name.startswith(prefix):
+                candidates.append((folder / name.removeprefix(prefix), folder))
+
+        for path, root in candidates:
+            if _inside(path, root) and path.is_file():
+                return path
+        return None
+
+
+def _inside(path: Path, root: Path) -> bool:
+    """Return True if a path resolves to a location below root."""
+    return path.resolve().is_relative_to(root.resolve())
+
+
+def _etag(path: Path, encoding: str | None = None) -> str:
+    """Return a strong ETag for a file from its size and modification time."""
+    stat = path.stat()
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}{f"-{encoding}" if encoding else ""}"'
+
+
+def _gzip_variant(path: Path) -> Path | None:
+    """Return a gzip variant of a compressible file, creating or refreshing it next to the file."""
+    if path.suffix not in COMPRESSIBLE or path.stat().st_size < MIN_COMPRESS_SIZE:
+        return None
+
+    variant = path.with_name(path.name + ENCODINGS["gzip"])
+    if variant.is_file() and variant.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+        return variant
+    tmp = variant.with_name(f".{variant.name}.{threading.get_ident()}.tmp")
+    with path.open("rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst)
+    tmp.replace(variant)
+    return variant
+
+
+def _byte_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse a single-range Range header into an inclusive (start, end) pair.
+
+    Returns None if the header is not a single byte range; raises ValueError if the
+    range cannot be satisfied for a file of the given size.
+
+    >>> _byte_range("bytes=0-99", 1000), _byte_range("bytes=900-", 1000), _byte_range("bytes=-100", 1000)
+    ((0, 99), (900, 999), (900, 999))
+
+    """
+    match = BYTE_RANGE.match(header.strip())
+    if match is None or match[1] == match[2] == "":
+        return None
+    if match[1] == "":
+        start, end = max(size - int(match[2]), 0), size - 1
+    else:
+        start = int(match[1])
+        end = min(int(match[2]), size - 1) if match[2] else size - 1
+    if start > end or start >= size:
+        raise ValueError(f"Unsatisfiable range {header!r} for {size} bytes")
+    return start, end
+
+
+class PreviewHandler(BaseHTTPRequestHandler):
+    """Answer GET and HEAD requests for a PreviewSite."""
+
+    server_version = "marimushka-preview"
+
+    def __init__(self, *args, site: PreviewSite, **kwargs):
+        """Bind the handler to the site it serves."""
+        self.site = site
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format: str, *args) -> None:
+        """Log requests through loguru instead of stderr."""
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def do_HEAD(self) -> None:  # noqa: N802 - name required by BaseHTTPRequestHandler
+        """Answer a HEAD request."""
+        self._respond(body=False)
+
+    def do_GET(self) -> None:  # noqa: N802 - name required by BaseHTTPRequestHandler
+        """Answer a GET request."""
+        self._respond(body=True)
+
+    def _respond(self, body: bool) -> None:
+        """Send the file for the requested path with caching, compression and range support."""
+        name = unquote(urlsplit(self.path).path)
+        if name.endswith("/"):
+            name += "index.html"
+        try:
+            path = self.site.locate(name)
+        except RuntimeError as e:
+            self.send_error(HTTPStatus.BAD_GATEWAY, str(e))
+            return
+        if path is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        range_header = self.headers.get("Range")
+
+        # Compressed variants are only sent for whole files
+        encoding, served = None, path
+        if range_header is None:
+            accepted = {token.split(";")[0].strip() for token in self.headers.get("Accept-Encoding", "").split(",")}
+            for candidate, suffix in ENCODINGS.items():
+                if candidate not in accepted:
+                    continue
+                variant = path.with_name(path.name + suffix)
+                if not variant.is_file() and candidate == "gzip" and _inside(path, self.site.output):
+                    # Exports are compressed on first request, source folders are never written to
+                    variant = _gzip_variant(path)
+                if variant is not None and variant.is_file() and variant.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+                    encoding, served = candidate, variant
+                    break
+
+        etag = _etag(served, encoding)
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        size = served.stat().st_size
+        start, end, status = 0, size - 1, HTTPStatus.OK
+        if range_header is not None and self.headers.get("If-Range", etag) == etag:
+            try:
+                byte_range = _byte_range(range_header, size)
+            except ValueError:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+            if byte_range is not None:
+                (start, end), status = byte_range, HTTPStatus.PARTIAL_CONTENT
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if status == HTTPStatus.PARTIAL_CONTENT:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+
+        if body:
+            with served.open("rb") as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = f.read(min(remaining, 1 << 16))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+
+
+def make_server(site: PreviewSite, host: str = "127.0.0.1", port: int = 8000) -> ThreadingHTTPServer:
+    """Create a threaded HTTP server for a preview site without starting it.
+
+    Args:
+        site (PreviewSite): The site to serve
+        host (str, optional): Interface to bind to. Defaults to localhost.
+        port (int, optional): Port to listen on, 0 picks a free one. Defaults to 8000.
+
+    Returns:
+        ThreadingHTTPServer: The bound server
+
+    """
+    site.output.mkdir(parents=True, exist_ok=True)
+    return ThreadingHTTPServer((host, port), functools.partial(PreviewHandler, site=site))
+
+
+def serve(site: PreviewSite, host: str = "127.0.0.1", port: int = 8000) -> None:
+    """Serve a preview site until interrupted.
+
+    Args:
+        site (PreviewSite): The site to serve
+        host (str, optional): Interface to bind to. Defaults to localhost.
+        port (int, optional): Port to listen on. Defaults to 8000.
+
+    """
+    with make_server(site, host, port) as server:
+        logger.info(f"Serving a preview of {site.output} at http://{host}:{server.server_address[1]}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("Preview server stopped")
@@ -0,0 +1,165 @@
+"""Service worker module for caching the site and the WASM runtime in the browser.
+
+This module generates a sw.js and a precache manifest for a built site. The worker
+keys every cached file by its content hash, so a rebuild that changes a file
+invalidates exactly that entry, and it keeps the versioned Pyodide/marimo runtime
+downloaded from public CDNs in a separate runtime cache.
+"""
+
+import json
+from pathlib import Path, PurePosixPath
+
+from .archive import file_digest
+
+# Names of the generated files inside the site
+SERVICE_WORKER = "sw.js"
+PRECACHE_MANIFEST = "precache-manifest.json"
+
+# Hosts serving immutable, versioned runtime files (Pyodide, marimo frontend, wheels)
+RUNTIME_HOSTS = ("cdn.jsdelivr.net", "files.pythonhosted.org", "unpkg.com")
+
+# Directories holding hashed runtime assets, precached when the worker is installed
+ASSET_DIRS = ("assets", "_assets")
+
+# Length of the content hash used as the revision of a file
+REVISION_LENGTH = 16
+
+TEMPLATE = """\
+// Generated by marimushka. Do not edit.
+const MANIFEST = __MANIFEST__;
+const RUNTIME_HOSTS = __RUNTIME_HOSTS__;
+const CACHE = "marimushka-precache";
+const RUNTIME_CACHE = "marimushka-runtime";
+
+const scope = new URL(self.registration.scope);
+const revisions = new Map(MANIFEST.map((entry) => [new URL(entry.url, scope).href, entry.revision]));
+const cacheKey = (href) => `${href}${href.includes("?") ? "&" : "?"}__rev=${revisions.get(href)}`;
+
+async function cacheFirst(cacheName, key, request) {
+  const cache = await caches.open(cacheName);
+  const cached = await cache.match(key);
+  if (cached) return cached;
+  const response = await fetch(request);
+  // Partial (206) responses cannot be cached; opaque ones come from no-cors CDN requests
+  if (response.status === 200 || response.type === "opaque") await cache.put(key, response.clone());
+  return response;
+}
+
+self.addEventListener("install", (event) => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(CACHE);
+    for (const entry of MANIFEST.filter((entry) => entry.precache)) {
+      const href = new URL(entry.url, scope).href;
+      if (await cache.match(cacheKey(href))) continue;
+      const response = await fetch(href, { cache: "reload" });
+      if (response.ok) await cache.put(cacheKey(href), response);
+    }
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil((async () => {
+    // Drop every entry whose content hash is no longer part of the site
+    const current = new Set([...revisions.keys()].map(cacheKey));
+    const cache = await caches.open(CACHE);
+    for (const request of await cache.keys()) {
+      if (!current.has(request.url)) await cache.delete(request);
+    }
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  if (request.method !== "GET" || request.headers.has("range")) return;
+
+  const url = new URL(request.url);
+  url.hash = "";
+  url.search = "";
+  if (url.pathname.endsWith("/")) url.pathname += "index.html";
+
+  if (revisions.has(url.href)) {
+    event.respondWith(cacheFirst(CACHE, cacheKey(url.href), request));
+  } else if (RUNTIME_HOSTS.includes(url.hostname)) {
+    event.respondWith(cacheFirst(RUNTIME_CACHE, request.url, request));
+  }
+});
+"""
+
+
+def digest_tree(root: Path) -> dict[str, str]:
+    """Return the SHA-256 hex digest of every file below a directory.
+
+    Hidden files (e.g. .nojekyll) are skipped.
+
+    Args:
+        root (Path): The site directory
+
+    Returns:
+        dict[str, str]: Digests keyed by the POSIX path relative to root
+
+    """
+    root = Path(root)
+    digests = {}
+    for path in sorted(p for p in root.rglob("*") if p.is_file()):
+        name = path.relative_to(root).as_posix()
+        if any(part.startswith(".") for part in PurePosixPath(name).parts):
+            continue
+        digests[name] = file_digest(path)
+    return digests
+
+
+def _precached(name: str) -> bool:
+    """Return True if a file is downloaded when the worker is installed.
+
+    Index pages and hashed runtime assets are precached. Exported notebooks and
+    their data are cached on first visit, so large catalogs are not downloaded
+    up front.
+
+    >>> _precached("index-2.html"), _precached("apps/assets/index-4f2a.js"), _precached("apps/charts.html")
+    (True, True, False)
+
+    """
+    path = PurePosixPath(name)
+    if len(path.parts) == 1 and path.name.startswith("index") and path.suffix == ".html":
+        return True
+    return any(part in ASSET_DIRS for part in path.parts[:-1])
+
+
+def precache_manifest(digests: dict[str, str]) -> list[dict[str, str | bool]]:
+    """Build the precache manifest from the digests of the site's files.
+
+    Args:
+        digests (dict[str, str]): SHA-256 digests keyed by site-relative path
+
+    Returns:
+        list[dict]: One entry per file with its url, revision and precache flag
+
+    >>> precache_manifest({"index.html": "ab" * 32, "sw.js": "cd" * 32})
+    [{'url': 'index.html', 'revision': 'abababababababab', 'precache': True}]
+
+    """
+    return [
+        {"url": name, "revision": digest[:REVISION_LENGTH], "precache": _precached(name)}
+        for name, digest in sorted(digests.items())
+        if name not in (SERVICE_WORKER, PRECACHE_MANIFEST)
+    ]
+
+
+def build_service_worker(manifest: list[dict[str, str | bool]]) -> str:
+    """Generate the source of the service worker for a precache manifest.
+
+    The manifest is embedded in the worker, so every rebuild that changes a file
+    also changes sw.js and makes browsers install the new worker.
+
+    Args:
+        manifest (list[dict]): The precache manifest
+
+    Returns:
+        str: JavaScript source of sw.js
+
+    """
+    return TEMPLATE.replace("__MANIFEST__", json.dumps(manifest, separators=(",", ":"))).replace(
+        "__RUNTIME_HOSTS__", json.dumps(list(RUNTIME_HOSTS))
+    )
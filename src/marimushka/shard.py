@@ -0,0 +1,184 @@
+"""Shard module for splitting an export over several CI runners and merging the results.
+
+Each runner exports one shard of the combined notebook list. The partition is
+deterministic: every runner computes the same split from the same notebooks and
+the same build history, balancing the shards by the export time measured in
+earlier builds. The merge step combines the shard directories, refuses
+conflicting files, and renders the index once.
+"""
+
+import hashlib
+import json
+import re
+import shutil
+from collections.abc import Callable
+from pathlib import Path
+
+from loguru import logger
+
+from .archive import file_digest
+from .history import BuildHistory
+from .notebook import Notebook
+
+# Manifest each shard writes next to its exports, read by merge and not copied into the site
+SHARD_MANIFEST = ".marimushka-shard.json"
+
+# Shard selector as given on the command line, e.g. "2/4"
+SHARD_SPEC = re.compile(r"^\s*(\d+)\s*/\s*(\d+)\s*$")
+
+# Cost assumed for notebooks without history when nothing at all is known
+DEFAULT_COST = 1.0
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """Parse a shard selector of the form "i/n" with 1 <= i <= n.
+
+    Args:
+        spec (str): The selector, e.g. "2/4"
+
+    Returns:
+        tuple[int, int]: The 1-based shard index and the number of shards
+
+    Raises:
+        ValueError: If the selector is malformed or out of range
+
+    >>> parse_shard("2/4")
+    (2, 4)
+
+    """
+    match = SHARD_SPEC.match(spec)
+    if match is None or not 1 <= int(match[1]) <= int(match[2]):
+        raise ValueError(f"Invalid shard: {spec!r}. Must be i/n with 1 <= i <= n, e.g. '1/4'")
+    return int(match[1]), int(match[2])
+
+
+def partition(
+    notebooks: list[Notebook], count: int, cost: Callable[[Notebook], float | None] | None = None
+) -> list[list[Notebook]]:
+    """Split notebooks into shards of roughly equal total cost.
+
+    Notebooks are assigned greedily, most expensive first, to the shard with the
+    smallest total so far. Notebooks without a known cost count as the median of
+    the known costs. Ties are broken by notebook path and shard index, so the
+    result does not depend on discovery order.
+
+    Args:
+        notebooks (list[Notebook]): All notebooks of the build
+        count (int): Number of shards
+        cost (Callable, optional): Returns the measured cost of a notebook, or None
+
+    Returns:
+        list[list[Notebook]]: One list of notebooks per shard
+
+    """
+    costs = {BuildHistory.key(nb): cost(nb) if cost else None for nb in notebooks}
+    known = sorted(c for c in costs.values() if c is not None)
+    fallback = known[len(known) // 2] if known else DEFAULT_COST
+
+    def weight(nb: Notebook) -> float:
+        value = costs[BuildHistory.key(nb)]
+        return fallback if value is None else value
+
+    shards: list[list[Notebook]] = [[] for _ in range(count)]
+    totals = [0.0] * count
+    for nb in sorted(notebooks, key=lambda nb: (-weight(nb), BuildHistory.key(nb))):
+        target = min(range(count), key=lambda i: (totals[i], i))
+        shards[target].append(nb)
+        totals[target] += weight(nb)
+    return shards
+
+
+def layout_digest(shards: list[list[Notebook]]) -> str:
+    """Return a short digest of a partition, so merge can verify all shards split alike.
+
+    >>> layout_digest([[], []])
+    'a683096011db3975'
+
+    """
+    layout = [[BuildHistory.key(nb) for nb in shard] for shard in shards]
+    return hashlib.sha256(json.dumps(layout).encode()).hexdigest()[:16]
+
+
+def write_manifest(output: Path, spec: str, layout: str, metrics: dict[Notebook, dict[str, float]]) -> None:
+    """Record which notebooks a shard exported and what each export cost.
+
+    Args:
+        output (Path): The shard's output directory
+        spec (str): The shard selector
+        layout (str): Digest of the partition the shard was taken from
+        metrics (dict[Notebook, dict[str, float]]): Measurements of each export, as for the build history
+
+    """
+    manifest = {
+        "shard": spec,
+        "layout": layout,
+        "notebooks": {BuildHistory.key(nb): values for nb, values in metrics.items()},
+    }
+    (Path(output) / SHARD_MANIFEST).write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+
+
+def merge_shards(shards: list[Path], output: Path) -> dict[str, dict[str, float]]:
+    """Copy the files of several shard directories into one output directory.
+
+    A file present in more than one shard must have the same content everywhere
+    (e.g. a public/ folder copied next to each export); anything else is a
+    collision and nothing is copied.
+
+    Args:
+        shards (list[Path]): The shard output directories
+        output (Path): The directory to merge into
+
+    Returns:
+        dict[str, dict[str, float]]: The measurements of all shards, keyed like the build history
+
+    Raises:
+        ValueError: If a shard directory is missing, the shards were partitioned
+            differently or do not form a complete set, or two shards disagree on a file
+
+    """
+    if not shards:
+        raise ValueError("No shard directories to merge")
+
+    manifests = []
+    for shard in map(Path, shards):
+        if not shard.is_dir():
+            raise ValueError(f"Shard directory not found: {shard}")
+        manifest = shard / SHARD_MANIFEST
+        if not manifest.is_file():
+            raise ValueError(f"{shard} has no {SHARD_MANIFEST}, it was not written by 'export --shard'")
+        manifests.append(json.loads(manifest.read_text(encoding="utf-8")))
+
+    # All shards must come from the same partition, and together cover all of it
+    if len({m["layout"] for m in manifests}) > 1:
+        raise ValueError("Shards were partitioned differently, make sure all runners share the same build history")
+    specs = sorted(parse_shard(m["shard"]) for m in manifests)
+    expected = [(i, specs[0][1]) for i in range(1, specs[0][1] + 1)]
+    if specs != expected:
+        got = [f"{i}/{n}" for i, n in specs]
+        raise ValueError(f"Incomplete set of shards: got {got}, expected {[f'{i}/{n}' for i, n in expected]}")
+
+    sources: dict[str, Path] = {}
+    digests: dict[str, str] = {}
+    collisions: list[str] = []
+    measurements: dict[str, dict[str, float]] = {}
+
+    for shard, manifest in zip(map(Path, shards), manifests, strict=True):
+        measurements.update(manifest["notebooks"])
+        for path in sorted(p for p in shard.rglob("*") if p.is_file() and p.name != SHARD_MANIFEST):
+            name = path.relative_to(shard).as_posix()
+            digest = file_digest(path)
+            if name not in sources:
+                sources[name], digests[name] = path, digest
+            elif digests[name] != digest:
+                collisions.append(f"{name} ({sources[name].parent} / {path.parent})")
+
+    if collisions:
+        raise ValueError(f"Shards disagree on {len(collisions)} files: {', '.join(sorted(collisions))}")
+
+    for name, path in sources.items():
+        target = Path(output) / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, target)
+
+    logger.info(f"Merged {len(sources)} files from {len(shards)} shards into {output}")
+    return measurements
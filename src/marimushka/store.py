@@ -0,0 +1,339 @@
+"""Store module for sharing finished exports between builds, processes and machines.
+
+An export depends only on the notebook source, the data files it reads and how it
+is exported, so a build can reuse the export another build produced from the same
+inputs. The store is a
+directory of immutable entries named by a hash of those inputs and may be shared by
+many processes at once, also over a network filesystem:
+
+- a builder holds an exclusive lock on <key>.lock while it exports, so a second
+  builder waits for the running export instead of duplicating it;
+- <key>.inprogress records which builder is exporting, and is found again by the
+  next one if that builder died, so its leftovers are removed;
+- an export is written to a temporary directory and published with a single rename,
+  so readers see a complete entry or none and never need the lock;
+- every build that uses an entry sets its modification time, so entries no build
+  has used for a while can be pruned before the cache is saved.
+
+The public/ folder marimo copies next to an export is shared by all notebooks of a
+folder, so it is not kept in the entries but copied from the notebook folder each
+time an entry is used; a stale copy could otherwise replace newer shared files.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import time
+import uuid
+from pathlib import Path
+
+from loguru import logger
+
+from . import __version__
+from .archive import file_digest
+from .cache import cache_dir
+from .delta import copy_if_changed
+from .lockfile import fresh_lock
+from .notebook import PUBLIC, Notebook
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    import msvcrt
+
+    fcntl = None
+
+# How long a builder waits for another builder's export before exporting itself
+DEFAULT_WAIT = 1800.0
+
+# Interval between two attempts to take a lock held by another builder
+POLL_INTERVAL = 0.1
+
+# Suffixes of the lock and in-progress marker next to an entry
+LOCK_SUFFIX = ".lock"
+MARKER_SUFFIX = ".inprogress"
+
+# File inside an entry recording that the export came with the public/ folder of the notebook
+PUBLIC_MARKER = ".public"
+
+# Seconds after its last use an entry is pruned
+DEFAULT_MAX_AGE = 7 * 24 * 3600.0
+
+
+def _data_digest(path: Path) -> str:
+    """Return the digest of a data file, hashing files shared by several notebooks once."""
+    stat = path.stat()
+    return _digest(str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=4096)
+def _digest(path: str, size: int, mtime_ns: int) -> str:
+    """Return the digest of a file, cached by its path, size and modification time."""
+    return file_digest(Path(path))
+
+
+@functools.cache
+def _tool_version(*tool: str) -> str:
+    """Return the version the tool of an export command reports, resolved once per process.
+
+    `uvx marimo` runs the newest marimo uv knows of, so exports of an unchanged
+    notebook differ between builds when marimo was upgraded in between.
+    """
+    try:
+        result = subprocess.run([*tool, "--version"], capture_output=True, text=True, check=True, timeout=300)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug(f"Could not resolve the version of {' '.join(tool)}: {e}")
+        return "unknown"
+    return result.stdout.strip()
+
+
+class FileLock:
+    """An exclusive advisory lock on a file, held against all processes using the same path.
+
+    The lock file is never removed, removing it would let two processes hold
+    locks on different files of the same name.
+
+    Attributes:
+        path (Path): The lock file
+
+    """
+
+    def __init__(self, path: str | Path):
+        """Prepare a lock on the given file without taking it."""
+        self.path = Path(path)
+        self._file = None
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        """Take the lock, waiting for at most timeout seconds (forever if None).
+
+        Returns:
+            bool: True if the lock was taken
+
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        f = open(self.path, "a+b")
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            except OSError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    f.close()
+                    return False
+                time.sleep(POLL_INTERVAL)
+            else:
+                self._file = f
+                return True
+
+    def release(self) -> None:
+        """Release the lock if it is held."""
+        if self._file is None:
+            return
+        if fcntl is None:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self) -> "FileLock":
+        """Take the lock, waiting as long as it takes."""
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        """Release the lock."""
+        self.release()
+
+
+class ExportCache:
+    """Finished exports shared by all builders using the same directory.
+
+    Attributes:
+        root (Path): The directory holding the entries
+        wait (float): Seconds to wait for another builder's export of the same notebook
+
+    """
+
+    def __init__(self, root: str | Path | None = None, wait: float = DEFAULT_WAIT):
+        """Open the export cache.
+
+        Args:
+            root (str | Path, optional): The cache directory. Defaults to exports/ in the
+                marimushka cache directory.
+            wait (float, optional): Seconds to wait for an export running elsewhere before
+                exporting the notebook here. Defaults to 30 minutes.
+
+        """
+        self.root = Path(root) if root else cache_dir("exports")
+        self.wait = wait
+
+    def key(self, notebook: Notebook) -> str:
+        """Return the cache key of a notebook.
+
+        The key is a hash of how the notebook is exported, of its file name (the
+        export is named after it), of its source, of the content of the data files
+        it reads (see Notebook.data_files) and of its lock if it has a fresh one, so
+        changing a data file invalidates exactly the notebooks that read it. Without
+        a lock, which pins marimo, the version of marimo the export command runs is
+        part of the key as well.
+        """
+        command = notebook.kind.command
+        digest = hashlib.sha256()
+        for part in (__version__, notebook.kind.value, *command, notebook.path.name):
+            digest.update(part.encode("utf-8") + b"\0")
+        lock = fresh_lock(notebook)
+        if lock is not None:
+            digest.update(b"lock\0" + lock.read_bytes() + b"\0")
+        else:
+            tool = _tool_version(*command[: command.index("export")])
+            digest.update(b"tool\0" + tool.encode("utf-8") + b"\0")
+        for path in notebook.data_files:
+            name = path.relative_to(notebook.path.parent).as_posix()
+            digest.update(f"{name}\0{_data_digest(path)}\0".encode())
+        digest.update(notebook.path.read_bytes())
+        return digest.hexdigest()[:32]
+
+    def entry(self, key: str) -> Path:
+        """Return the directory of the entry with the given key."""
+        return self.root / key[:2] / key
+
+    def contains(self, notebook: Notebook) -> bool:
+        """Return True if the cache holds a finished export of the notebook as it is now."""
+        return self.entry(self.key(notebook)).is_dir()
+
+    def export(self, notebook: Notebook, output_dir: Path) -> bool:
+        """Copy the export of a notebook into output_dir, exporting it first if nobody has.
+
+        Args:
+            notebook (Notebook): The notebook to export
+            output_dir (Path): Directory the export is copied into, as for Notebook.export
+
+        Returns:
+            bool: True if the export exists in output_dir
+
+        """
+        entry = self.entry(self.key(notebook))
+        if entry.is_dir():
+            logger.debug(f"Reusing the cached export of {notebook.path}")
+        else:
+            lock = FileLock(entry.with_name(entry.name + LOCK_SUFFIX))
+            if not lock.acquire(timeout=0):
+                logger.info(f"Waiting for {self._owner(entry)} to finish exporting {notebook.path}")
+                if not lock.acquire(timeout=self.wait):
+                    logger.warning(f"Gave up waiting for the export of {notebook.path}, exporting it here")
+                    return notebook.export(output_dir=output_dir)
+            try:
+                # The builder that held the lock may have published the entry meanwhile
+                if not entry.is_dir() and not self._publish(notebook, entry):
+                    return False
+            finally:
+                lock.release()
+
+        # Record the use, prune() keeps the entries of recent builds
+        try:
+            os.utime(entry)
+        except OSError as e:
+            logger.debug(f"Could not record the use of {entry}: {e}")
+
+        for path in entry.rglob("*"):
+            if path.is_file() and path.name != PUBLIC_MARKER:
+                copy_if_changed(path, output_dir / path.relative_to(entry))
+        if (entry / PUBLIC_MARKER).exists():
+            # Shared data is copied from the notebook folder as it is now, never from the entry
+            public = notebook.path.parent / PUBLIC
+            for path in public.rglob("*"):
+                if path.is_file():
+                    copy_if_changed(path, output_dir / PUBLIC / path.relative_to(public))
+        page = output_dir / f"{notebook.path.stem}.html"
+        if not page.is_file():
+            logger.warning(f"The cached export of {notebook.path} in {entry} has no {page.name}")
+            return False
+        return True
+
+    def prune(self, max_age: float = DEFAULT_MAX_AGE) -> list[Path]:
+        """Remove the entries no build has used for max_age seconds.
+
+        An entry is renamed away before it is deleted, so a reader sees it complete
+        or not at all. Entries a builder holds the lock of are kept. Lock files stay,
+        see FileLock.
+
+        Args:
+            max_age (float, optional): Seconds since the last use. Defaults to 7 days.
+
+        Returns:
+            list[Path]: The removed entries
+
+        Raises:
+            ValueError: If max_age is negative
+
+        """
+        if max_age < 0:
+            raise ValueError(f"max_age must not be negative, got {max_age}")
+        cutoff = time.time() - max_age
+        removed = []
+        for entry in sorted(self.root.glob("??/*")):
+            try:
+                if entry.name.startswith(".") or not entry.is_dir() or entry.stat().st_mtime >= cutoff:
+                    continue
+            except OSError:
+                continue
+            lock = FileLock(entry.with_name(entry.name + LOCK_SUFFIX))
+            if not lock.acquire(timeout=0):
+                continue
+            try:
+                doomed = entry.with_name(f".{entry.name}.{uuid.uuid4().hex}.tmp")
+                os.rename(entry, doomed)
+                shutil.rmtree(doomed, ignore_errors=True)
+                removed.append(entry)
+            except OSError as e:
+                logger.debug(f"Could not prune {entry}: {e}")
+            finally:
+                lock.release()
+        logger.info(f"Pruned {len(removed)} exports unused for {max_age / 86400:g} days from {self.root}")
+        return removed
+
+    @staticmethod
+    def _owner(entry: Path) -> str:
+        """Describe the builder whose in-progress marker is next to an entry."""
+        try:
+            marker = json.loads(entry.with_name(entry.name + MARKER_SUFFIX).read_text(encoding="utf-8"))
+            return f"{marker['host']} (pid {marker['pid']})"
+        except (OSError, ValueError, KeyError):
+            return "another builder"
+
+    def _publish(self, notebook: Notebook, entry: Path) -> bool:
+        """Export a notebook into a temporary directory and rename it into place. Needs the lock."""
+        marker = entry.with_name(entry.name + MARKER_SUFFIX)
+        if marker.exists():
+            logger.warning(
+                f"Removing the leftovers of an interrupted export of {notebook.path} by {self._owner(entry)}"
+            )
+            try:
+                shutil.rmtree(entry.parent / json.loads(marker.read_text(encoding="utf-8"))["tmp"], ignore_errors=True)
+            except (OSError, ValueError, KeyError):
+                pass
+
+        tmp = entry.with_name(f".{entry.name}.{uuid.uuid4().hex}.tmp")
+        owner = {"host": socket.gethostname(), "pid": os.getpid(), "started": time.time(), "tmp": tmp.name}
+        marker.write_text(json.dumps(owner), encoding="utf-8")
+        try:
+            if not notebook.export(output_dir=tmp) or not (tmp / f"{notebook.path.stem}.html").is_file():
+                return False
+            # The public/ folder is shared by the notebooks of a folder, so it is not kept in the entry
+            if (tmp / PUBLIC).is_dir():
+                shutil.rmtree(tmp / PUBLIC)
+                (tmp / PUBLIC_MARKER).touch()
+            os.rename(tmp, entry)
+            logger.debug(f"Published the export of {notebook.path} to {entry}")
+            return True
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+            marker.unlink(missing_ok=True)
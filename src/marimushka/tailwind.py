@@ -0,0 +1,390 @@
+"""Tailwind module for compiling the index stylesheet at build time.
+
+The bundled template loads the Tailwind CDN script, which compiles CSS in the
+browser on every page view and fails on offline mirrors. This module scans the
+rendered index for the utility classes it uses and emits a small static stylesheet
+for them in pure Python, so no Node toolchain is needed at build time.
+"""
+
+import re
+from html.parser import HTMLParser
+
+from loguru import logger
+
+# Ways of delivering the stylesheet
+CDN = "cdn"
+INLINE = "inline"
+LINK = "link"
+MODES = (CDN, INLINE, LINK)
+
+# Location of the stylesheet inside the site when it is linked
+STYLESHEET_PATH = "_assets/tailwind.css"
+
+# The runtime JIT script that is replaced by the compiled stylesheet
+CDN_SCRIPT = re.compile(r"<script\s+src=[\"']https://cdn\.tailwindcss\.com[^\"']*[\"']\s*>\s*</script>")
+
+# Responsive breakpoints, in the order their media queries are emitted
+BREAKPOINTS = {"sm": "640px", "md": "768px", "lg": "1024px", "xl": "1280px", "2xl": "1536px"}
+
+# Pseudo-class variants
+PSEUDO_CLASSES = {"hover": ":hover", "focus": ":focus", "active": ":active"}
+
+# Subset of the Tailwind preflight reset that the utilities rely on
+PREFLIGHT = """\
+*,::before,::after{box-sizing:border-box;border-width:0;border-style:solid;border-color:#e5e7eb}
+html{line-height:1.5;-webkit-text-size-adjust:100%;tab-size:4;font-family:ui-sans-serif,system-ui,sans-serif,\
+"Apple Color Emoji","Segoe UI Emoji","Segoe UI Symbol","Noto Color Emoji"}
+body{margin:0;line-height:inherit}
+h1,h2,h3,h4,h5,h6{font-size:inherit;font-weight:inherit}
+a{color:inherit;text-decoration:inherit}
+b,strong{font-weight:bolder}
+blockquote,dl,dd,h1,h2,h3,h4,h5,h6,hr,figure,p,pre{margin:0}
+ol,ul,menu{list-style:none;margin:0;padding:0}
+button,input,optgroup,select,textarea{font-family:inherit;font-size:100%;font-weight:inherit;line-height:inherit;\
+color:inherit;margin:0;padding:0}
+img,svg,video,canvas,audio,iframe,embed,object{display:block;vertical-align:middle}
+img,video{max-width:100%;height:auto}
+"""
+
+# Default Tailwind v3 palette for the colours commonly used in templates
+PALETTE = {
+    "gray": "f9fafb f3f4f6 e5e7eb d1d5db 9ca3af 6b7280 4b5563 374151 1f2937 111827",
+    "red": "fef2f2 fee2e2 fecaca fca5a5 f87171 ef4444 dc2626 b91c1c 991b1b 7f1d1d",
+    "orange": "fff7ed ffedd5 fed7aa fdba74 fb923c f97316 ea580c c2410c 9a3412 7c2d12",
+    "amber": "fffbeb fef3c7 fde68a fcd34d fbbf24 f59e0b d97706 b45309 92400e 78350f",
+    "yellow": "fefce8 fef9c3 fef08a fde047 facc15 eab308 ca8a04 a16207 854d0e 713f12",
+    "green": "f0fdf4 dcfce7 bbf7d0 86efac 4ade80 22c55e 16a34a 15803d 166534 14532d",
+    "teal": "f0fdfa ccfbf1 99f6e4 5eead4 2dd4bf 14b8a6 0d9488 0f766e 115e59 134e4a",
+    "blue": "eff6ff dbeafe bfdbfe 93c5fd 60a5fa 3b82f6 2563eb 1d4ed8 1e40af 1e3a8a",
+    "indigo": "eef2ff e0e7ff c7d2fe a5b4fc 818cf8 6366f1 4f46e5 4338ca 3730a3 312e81",
+    "purple": "faf5ff f3e8ff e9d5ff d8b4fe c084fc a855f7 9333ea 7e22ce 6b21a8 581c87",
+    "pink": "fdf2f8 fce7f3 fbcfe8 f9a8d4 f472b6 ec4899 db2777 be185d 9d174d 831843",
+}
+SHADES = ("50", "100", "200", "300", "400", "500", "600", "700", "800", "900")
+COLORS = {
+    "white": "#fff",
+    "black": "#000",
+    "transparent": "transparent",
+    "current": "currentColor",
+    **{
+        f"{name}-{shade}": f"#{value}"
+        for name, values in PALETTE.items()
+        for shade, value in zip(SHADES, values.split(), strict=True)
+    },
+}
+
+FONT_SIZES = {
+    "xs": ("0.75rem", "1rem"),
+    "sm": ("0.875rem", "1.25rem"),
+    "base": ("1rem", "1.5rem"),
+    "lg": ("1.125rem", "1.75rem"),
+    "xl": ("1.25rem", "1.75rem"),
+    "2xl": ("1.5rem", "2rem"),
+    "3xl": ("1.875rem", "2.25rem"),
+    "4xl": ("2.25rem", "2.5rem"),
+    "5xl": ("3rem", "1"),
+}
+FONT_WEIGHTS = {
+    "thin": "100",
+    "light": "300",
+    "normal": "400",
+    "medium": "500",
+    "semibold": "600",
+    "bold": "700",
+    "extrabold": "800",
+    "black": "900",
+}
+FONT_FAMILIES = {
+    "sans": 'ui-sans-serif,system-ui,sans-serif,"Apple Color Emoji","Segoe UI Emoji","Segoe UI Symbol"',
+    "serif": 'ui-serif,Georgia,Cambria,"Times New Roman",Times,serif',
+    "mono": 'ui-monospace,SFMono-Regular,Menlo,Monaco,Consolas,"Liberation Mono","Courier New",monospace',
+}
+MAX_WIDTHS = {
+    "none": "none",
+    "xs": "20rem",
+    "sm": "24rem",
+    "md": "28rem",
+    "lg": "32rem",
+    "xl": "36rem",
+    "2xl": "42rem",
+    "3xl": "48rem",
+    "4xl": "56rem",
+    "5xl": "64rem",
+    "6xl": "72rem",
+    "7xl": "80rem",
+    "full": "100%",
+}
+RADII = {"none": "0px", "sm": "0.125rem", "": "0.25rem", "md": "0.375rem", "lg": "0.5rem", "xl": "0.75rem"}
+RADII |= {"2xl": "1rem", "full": "9999px"}
+SHADOWS = {
+    "sm": "0 1px 2px 0 rgb(0 0 0 / 0.05)",
+    "": "0 1px 3px 0 rgb(0 0 0 / 0.1), 0 1px 2px -1px rgb(0 0 0 / 0.1)",
+    "md": "0 4px 6px -1px rgb(0 0 0 / 0.1), 0 2px 4px -2px rgb(0 0 0 / 0.1)",
+    "lg": "0 10px 15px -3px rgb(0 0 0 / 0.1), 0 4px 6px -4px rgb(0 0 0 / 0.1)",
+    "none": "0 0 #0000",
+}
+
+# Utilities without a value, in the order Tailwind emits them
+STATIC = {
+    "container": "width:100%",
+    "block": "display:block",
+    "inline-block": "display:inline-block",
+    "inline": "display:inline",
+    "flex": "display:flex",
+    "inline-flex": "display:inline-flex",
+    "grid": "display:grid",
+    "hidden": "display:none",
+    "flex-row": "flex-direction:row",
+    "flex-col": "flex-direction:column",
+    "flex-wrap": "flex-wrap:wrap",
+    "flex-1": "flex:1 1 0%",
+    "items-start": "align-items:flex-start",
+    "items-center": "align-items:center",
+    "items-end": "align-items:flex-end",
+    "justify-start": "justify-content:flex-start",
+    "justify-center": "justify-content:center",
+    "justify-end": "justify-content:flex-end",
+    "justify-between": "justify-content:space-between",
+    "overflow-hidden": "overflow:hidden",
+    "overflow-auto": "overflow:auto",
+    "truncate": "overflow:hidden;text-overflow:ellipsis;white-space:nowrap",
+    "text-left": "text-align:left",
+    "text-center": "text-align:center",
+    "text-right": "text-align:right",
+    "italic": "font-style:italic",
+    "uppercase": "text-transform:uppercase",
+    "underline": "text-decoration-line:underline",
+    "no-underline": "text-decoration-line:none",
+    "transition": (
+        "transition-property:color,background-color,border-color,text-decoration-color,fill,stroke,opacity,"
+        "box-shadow,transform,filter,backdrop-filter;transition-timing-function:cubic-bezier(0.4,0,0.2,1);"
+        "transition-duration:150ms"
+    ),
+}
+
+# Spacing utilities and the properties they set, in Tailwind's order
+SPACING_PROPERTIES = {
+    "m": ("margin",),
+    "mx": ("margin-left", "margin-right"),
+    "my": ("margin-top", "margin-bottom"),
+    "mt": ("margin-top",),
+    "mr": ("margin-right",),
+    "mb": ("margin-bottom",),
+    "ml": ("margin-left",),
+    "w": ("width",),
+    "h": ("height",),
+    "gap": ("gap",),
+    "gap-x": ("column-gap",),
+    "gap-y": ("row-gap",),
+    "p": ("padding",),
+    "px": ("padding-left", "padding-right"),
+    "py": ("padding-top", "padding-bottom"),
+    "pt": ("padding-top",),
+    "pr": ("padding-right",),
+    "pb": ("padding-bottom",),
+    "pl": ("padding-left",),
+}
+SPACING_KEYWORDS = {"px": "1px", "auto": "auto", "full": "100%", "screen": "100vw"}
+SPACING = re.compile(r"^(?P<prefix>gap-[xy]|[mp][xytrbl]?|[wh]|gap)-(?P<value>[\d.]+|px|auto|full|screen|\d+/\d+)$")
+
+# Emission order of the utility families; lower values come first
+ORDER = {"static": 0, "max-w": 1, "spacing": 2, "grid-cols": 3, "rounded": 4, "border": 5, "bg": 6, "text": 7}
+ORDER |= {"font": 8, "shadow": 9}
+
+
+class _ClassCollector(HTMLParser):
+    """Collect the names in every class attribute of an HTML document."""
+
+    def __init__(self):
+        """Initialise the parser with an empty set of class names."""
+        super().__init__(convert_charrefs=True)
+        self.classes: set[str] = set()
+
+    def handle_starttag(self, tag, attrs):
+        """Record the class names of a start tag."""
+        for name, value in attrs:
+            if name == "class" and value:
+                self.classes.update(value.split())
+
+
+def extract_classes(html: str) -> set[str]:
+    """Return every class name used in an HTML document.
+
+    >>> sorted(extract_classes('<div class="p-4 mx-auto"><a class="p-4 underline">x</a></div>'))
+    ['mx-auto', 'p-4', 'underline']
+
+    """
+    collector = _ClassCollector()
+    collector.feed(html)
+    collector.close()
+    return collector.classes
+
+
+def _spacing(value: str, prefix: str) -> str | None:
+    """Convert a spacing value such as '4', '0.5', 'px' or '1/2' to CSS."""
+    if value in SPACING_KEYWORDS:
+        if value == "screen":
+            return "100vh" if prefix == "h" else "100vw"
+        return SPACING_KEYWORDS[value]
+    if "/" in value:
+        numerator, denominator = value.split("/")
+        return f"{float(numerator) / float(denominator) * 100:g}%"
+    number = float(value)
+    return "0px" if number == 0 else f"{number * 0.25:g}rem"
+
+
+def utility(name: str) -> tuple[int, str] | None:
+    """Translate a single utility class (without variants) to its CSS declarations.
+
+    Args:
+        name (str): The utility, e.g. "px-3" or "bg-blue-500"
+
+    Returns:
+        tuple[int, str] | None: The emission order and the declarations, or None if
+            the class is not a supported Tailwind utility
+
+    >>> utility("px-3")
+    (2, 'padding-left:0.75rem;padding-right:0.75rem')
+    >>> utility("bg-blue-500")
+    (6, 'background-color:#3b82f6')
+    >>> utility("not-a-utility") is None
+    True
+
+    """
+    if name in STATIC:
+        return ORDER["static"], STATIC[name]
+    if name == "mx-auto":
+        return ORDER["spacing"], "margin-left:auto;margin-right:auto"
+
+    if match := SPACING.match(name):
+        prefix = match["prefix"]
+        value = _spacing(match["value"], prefix)
+        return ORDER["spacing"], ";".join(f"{prop}:{value}" for prop in SPACING_PROPERTIES[prefix])
+
+    family, _, value = name.partition("-")
+    if name.startswith("max-w-") and name[6:] in MAX_WIDTHS:
+        return ORDER["max-w"], f"max-width:{MAX_WIDTHS[name[6:]]}"
+    if name.startswith("grid-cols-") and name[10:].isdigit():
+        return ORDER["grid-cols"], f"grid-template-columns:repeat({name[10:]},minmax(0,1fr))"
+    if family == "rounded" and value in RADII:
+        return ORDER["rounded"], f"border-radius:{RADII[value]}"
+    if family == "shadow" and value in SHADOWS:
+        return ORDER["shadow"], f"box-shadow:{SHADOWS[value]}"
+    if family == "border":
+        if value in ("", "0", "2", "4", "8"):
+            return ORDER["border"], f"border-width:{value or 1}px"
+        if value in ("t", "b", "l", "r"):
+            side = {"t": "top", "b": "bottom", "l": "left", "r": "right"}[value]
+            return ORDER["border"], f"border-{side}-width:1px"
+        if value in COLORS:
+            return ORDER["border"], f"border-color:{COLORS[value]}"
+    if family == "bg" and value in COLORS:
+        return ORDER["bg"], f"background-color:{COLORS[value]}"
+    if family == "text":
+        if value in FONT_SIZES:
+            size, line_height = FONT_SIZES[value]
+            return ORDER["text"], f"font-size:{size};line-height:{line_height}"
+        if value in COLORS:
+            return ORDER["text"], f"color:{COLORS[value]}"
+    if family == "font":
+        if value in FONT_WEIGHTS:
+            return ORDER["font"], f"font-weight:{FONT_WEIGHTS[value]}"
+        if value in FONT_FAMILIES:
+            return ORDER["font"], f"font-family:{FONT_FAMILIES[value]}"
+    return None
+
+
+def _escape(name: str) -> str:
+    """Escape a class name for use in a CSS selector."""
+    return re.sub(r"([^a-zA-Z0-9_-])", r"\\\1", name)
+
+
+def build_stylesheet(classes: set[str]) -> tuple[str, set[str]]:
+    """Build a static stylesheet for a set of class names.
+
+    Variants are supported as prefixes: responsive breakpoints (sm:, md:, lg:, xl:, 2xl:)
+    and the pseudo classes hover:, focus: and active:.
+
+    Args:
+        classes (set[str]): Class names found in the rendered document
+
+    Returns:
+        tuple[str, set[str]]: The stylesheet and the class names it could not compile
+
+    """
+    # Rules per breakpoint (None for the base layer): (order, pseudo, class, declarations)
+    rules: dict[str | None, list[tuple[int, int, str, str]]] = {None: [], **{bp: [] for bp in BREAKPOINTS}}
+    unsupported: set[str] = set()
+
+    for cls in classes:
+        *variants, name = cls.split(":")
+        breakpoint = None
+        pseudo = ""
+        known = True
+        for variant in variants:
+            if variant in BREAKPOINTS and breakpoint is None:
+                breakpoint = variant
+            elif variant in PSEUDO_CLASSES and not pseudo:
+                pseudo = PSEUDO_CLASSES[variant]
+            else:
+                known = False
+
+        compiled = utility(name) if known else None
+        if compiled is None:
+            unsupported.add(cls)
+            continue
+
+        order, declarations = compiled
+        rules[breakpoint].append((order, int(bool(pseudo)), f".{_escape(cls)}{pseudo}", declarations))
+
+    lines = [PREFLIGHT.rstrip("\n")]
+    for breakpoint, layer in rules.items():
+        if not layer:
+            continue
+        body = [f"{selector}{{{declarations}}}" for _, _, selector, declarations in sorted(layer)]
+        if breakpoint is None:
+            lines.extend(body)
+        else:
+            lines.append(f"@media (min-width:{BREAKPOINTS[breakpoint]}){{{''.join(body)}}}")
+
+    return "\n".join(lines) + "\n", unsupported
+
+
+def compile_css(html: str, mode: str = INLINE) -> tuple[str, str | None]:
+    """Replace the Tailwind CDN script in a rendered page by a build-time stylesheet.
+
+    Args:
+        html (str): The rendered page
+        mode (str): "inline" embeds the stylesheet in a <style> element, "link" references
+            STYLESHEET_PATH, and "cdn" leaves the page untouched
+
+    Returns:
+        tuple[str, str | None]: The rewritten page, and the stylesheet that has to be
+            written to STYLESHEET_PATH (only in "link" mode, None otherwise)
+
+    Raises:
+        ValueError: If mode is not one of MODES
+
+    """
+    if mode not in MODES:
+        raise ValueError(f"Invalid Tailwind mode: {mode!r}. Must be one of {list(MODES)}")
+
+    if mode == CDN:
+        return html, None
+
+    if not CDN_SCRIPT.search(html):
+        logger.info("No Tailwind CDN script found in the rendered page, leaving it unchanged")
+        return html, None
+
+    stylesheet, unsupported = build_stylesheet(extract_classes(html))
+    if unsupported:
+        logger.warning(f"Classes without a build-time Tailwind rule: {', '.join(sorted(unsupported))}")
+
+    if mode == INLINE:
+        tag = f"<style>\n{stylesheet}</style>"
+        stylesheet = None
+    else:
+        tag = f'<link rel="stylesheet" href="{STYLESHEET_PATH}">'
+
+    # Use a function so backslashes in the stylesheet are not treated as group references
+    return CDN_SCRIPT.sub(lambda _: tag, html, count=1), stylesheet
@@ -0,0 +1,70 @@
+"""Templating module for reusing Jinja2 environments across builds.
+
+Creating a Jinja2 environment and compiling a template is repeated work when the
+index is rendered many times in one process (watch loops, tests, library callers).
+This module keeps one environment per template directory, backs it with a bytecode
+cache in the marimushka cache directory, and loads the bundled templates from the
+modules precompiled when the wheel was built (see hatch_build.py).
+"""
+
+from pathlib import Path
+
+import jinja2
+from loguru import logger
+
+from .cache import cache_dir
+
+# Templates shipped with the package and the modules precompiled from them at build time
+BUNDLED_TEMPLATES = Path(__file__).parent / "templates"
+COMPILED_TEMPLATES = BUNDLED_TEMPLATES / "_compiled"
+
+# File next to the precompiled modules recording the Jinja2 version that produced them
+COMPILED_VERSION = "JINJA_VERSION"
+
+# File extensions rendered with autoescaping (hatch_build.py uses the same setting)
+AUTOESCAPE = ["html", "xml"]
+
+_environments: dict[Path, jinja2.Environment] = {}
+
+
+def _bytecode_cache() -> jinja2.BytecodeCache | None:
+    """Return a bytecode cache in the marimushka cache directory, or None if it is not writable."""
+    directory = cache_dir("jinja")
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        logger.debug(f"Template bytecode cache disabled, cannot create {directory}: {e}")
+        return None
+    return jinja2.FileSystemBytecodeCache(str(directory))
+
+
+def _precompiled() -> bool:
+    """Return True if precompiled modules exist for the installed Jinja2 version."""
+    marker = COMPILED_TEMPLATES / COMPILED_VERSION
+    return marker.is_file() and marker.read_text().strip() == jinja2.__version__
+
+
+def get_environment(template_dir: Path) -> jinja2.Environment:
+    """Return the shared Jinja2 environment for a template directory.
+
+    Args:
+        template_dir (Path): Directory the templates are loaded from
+
+    Returns:
+        jinja2.Environment: The environment, created on first use
+
+    """
+    key = Path(template_dir).resolve()
+    if key not in _environments:
+        loader: jinja2.BaseLoader = jinja2.FileSystemLoader(key)
+        if key == BUNDLED_TEMPLATES.resolve() and _precompiled():
+            loader = jinja2.ChoiceLoader([jinja2.ModuleLoader(COMPILED_TEMPLATES), loader])
+        _environments[key] = jinja2.Environment(
+            loader=loader, autoescape=jinja2.select_autoescape(AUTOESCAPE), bytecode_cache=_bytecode_cache()
+        )
+    return _environments[key]
+
+
+def clear_environments() -> None:
+    """Drop all shared environments, e.g. after templates were replaced on disk."""
+    _environments.clear()
@@ -0,0 +1,209 @@
+"""Weight module for reporting the size of exported notebooks and enforcing size budgets.
+
+Exports embed their plots, data and the marimo frontend, so a notebook can grow to
+many megabytes without anyone noticing. After an export, each exported page is
+measured (total bytes, inline <script> and <style> bytes, base64 data URIs and the
+gzip-compressed size) and compared against its budget. Budgets are given per kind
+of notebook on the command line and per notebook in its PEP 723 header:
+
+    # /// script
+    # dependencies = ["marimo"]
+    #
+    # [tool.marimushka]
+    # budget = "4 MB"
+    # ///
+"""
+
+import dataclasses
+import gzip
+import re
+from pathlib import Path
+
+from loguru import logger
+
+from .notebook import Kind, Notebook
+
+# A size with an optional decimal or binary unit, e.g. "750 kB", "2MB" or "1.5 MiB"
+SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(B|kB|KB|MB|GB|KiB|MiB|GiB)?\s*$")
+UNITS = {"B": 1, "kB": 1000, "KB": 1000, "MB": 1000**2, "GB": 1000**3, "KiB": 1024, "MiB": 1024**2, "GiB": 1024**3}
+
+# Inline scripts and stylesheets (scripts with a src attribute are not inline)
+INLINE_SCRIPT = re.compile(rb"<script\b([^>]*)>(.*?)</script\s*>", re.IGNORECASE | re.DOTALL)
+INLINE_STYLE = re.compile(rb"<style\b[^>]*>(.*?)</style\s*>", re.IGNORECASE | re.DOTALL)
+SRC_ATTRIBUTE = re.compile(rb"\bsrc\s*=", re.IGNORECASE)
+
+# Base64 data URIs, wherever they appear (attributes, scripts, stylesheets)
+DATA_URI = re.compile(rb"data:[\w.+-]+/[\w.+-]+(?:;[\w.+-]+=[\w.+-]+)*;base64,[A-Za-z0-9+/=]+")
+
+
+def parse_size(value: str | int | float) -> int:
+    """Parse a size such as "2 MB" or "512KiB" into bytes.
+
+    Args:
+        value (str | int | float): The size, a plain number counts bytes
+
+    Returns:
+        int: The size in bytes
+
+    Raises:
+        ValueError: If the size cannot be parsed, e.g. a negative number or a TOML table
+
+    >>> parse_size("2 MB"), parse_size("1.5KiB"), parse_size(300), parse_size(2.5e6)
+    (2000000, 1536, 300, 2500000)
+
+    """
+    # Sizes in a notebook header are TOML values, so they are not always strings
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0:
+        return int(value)
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid size: {value!r}. Use bytes or a unit such as '750 kB', '2 MB' or '1 MiB'")
+    match = SIZE.match(value)
+    if match is None:
+        raise ValueError(f"Invalid size: {value!r}. Use bytes or a unit such as '750 kB', '2 MB' or '1 MiB'")
+    return int(float(match[1]) * UNITS[match[2] or "B"])
+
+
+def format_size(size: int) -> str:
+    """Format a size in bytes with a decimal unit.
+
+    >>> format_size(999), format_size(2_450_000)
+    ('999 B', '2.5 MB')
+
+    """
+    for unit in ("GB", "MB", "kB"):
+        if size >= UNITS[unit]:
+            return f"{size / UNITS[unit]:.1f} {unit}"
+    return f"{size} B"
+
+
+def parse_budgets(values: list[str] | None) -> dict[Kind, int]:
+    """Parse per-kind budgets given as KIND=SIZE, e.g. ["notebook=2MB", "app=5MB"].
+
+    Raises:
+        ValueError: If a budget is not of the form KIND=SIZE with a known kind
+
+    """
+    budgets = {}
+    for value in values or []:
+        kind, sep, size = value.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid budget: {value!r}. Must be KIND=SIZE, e.g. 'notebook=2MB'")
+        budgets[Kind.from_str(kind.strip())] = parse_size(size)
+    return budgets
+
+
+@dataclasses.dataclass(frozen=True)
+class PageWeight:
+    """The measured weight of one exported page.
+
+    Attributes:
+        notebook (Notebook): The notebook the page was exported from
+        total (int): Size of the page in bytes
+        scripts (int): Bytes of inline <script> content
+        styles (int): Bytes of inline <style> content
+        data_uris (int): Bytes of base64 data URIs
+        compressed (int): Size of the page compressed with gzip
+        budget (int | None): Maximum total size, None if there is no budget
+
+    """
+
+    notebook: Notebook
+    total: int
+    scripts: int
+    styles: int
+    data_uris: int
+    compressed: int
+    budget: int | None = None
+
+    @property
+    def over_budget(self) -> bool:
+        """Return True if the page is larger than its budget."""
+        return self.budget is not None and self.total > self.budget
+
+
+def measure(notebook: Notebook, page: Path, budget: int | None = None) -> PageWeight:
+    """Measure an exported page.
+
+    Args:
+        notebook (Notebook): The notebook the page was exported from
+        page (Path): The exported HTML file
+        budget (int, optional): Maximum total size of the page
+
+    Returns:
+        PageWeight: The measurements
+
+    """
+    data = page.read_bytes()
+    scripts = sum(len(m[2]) for m in INLINE_SCRIPT.finditer(data) if not SRC_ATTRIBUTE.search(m[1]))
+    return PageWeight(
+        notebook=notebook,
+        total=len(data),
+        scripts=scripts,
+        styles=sum(len(m[1]) for m in INLINE_STYLE.finditer(data)),
+        data_uris=sum(len(m[0]) for m in DATA_URI.finditer(data)),
+        compressed=len(gzip.compress(data, compresslevel=6)),
+        budget=budget,
+    )
+
+
+class WeightReport:
+    """Weights of the pages exported in one build, checked against their budgets.
+
+    Attributes:
+        budgets (dict[Kind, int]): Budget of each kind of notebook
+        weights (list[PageWeight]): The pages measured so far
+
+    """
+
+    def __init__(self, budgets: dict[Kind, int] | None = None):
+        """Start an empty report with budgets per kind of notebook."""
+        self.budgets = budgets or {}
+        self.weights: list[PageWeight] = []
+
+    def budget(self, notebook: Notebook) -> int | None:
+        """Return the budget of a notebook: its PEP 723 header first, then its kind."""
+        try:
+            header = notebook.script_metadata.get("tool", {}).get("marimushka", {}).get("budget")
+        except (OSError, ValueError):
+            header = None
+        if header is None:
+            return self.budgets.get(notebook.kind)
+        try:
+            return parse_size(header)
+        except ValueError as e:
+            raise ValueError(f"Invalid budget in the header of {notebook.path}: {e}") from e
+
+    def measure(self, notebook: Notebook, page: Path) -> None:
+        """Measure the exported page of a notebook, if the export produced one."""
+        if page.is_file():
+            self.weights.append(measure(notebook, page, self.budget(notebook)))
+
+    def log(self) -> None:
+        """Log a table of the measured pages, largest first."""
+        if not self.weights:
+            return
+        rows = [("page", "total", "scripts", "styles", "data URIs", "gzip", "budget")]
+        for w in sorted(self.weights, key=lambda w: -w.total):
+            sizes = (w.total, w.scripts, w.styles, w.data_uris, w.compressed)
+            budget = format_size(w.budget) if w.budget is not None else "-"
+            rows.append((w.notebook.html_path.as_posix(), *map(format_size, sizes), budget))
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        lines = [
+            "  ".join(cell.ljust(widths[i]) if i == 0 else cell.rjust(widths[i]) for i, cell in enumerate(row))
+            for row in rows
+        ]
+        logger.info("Page weight:\n" + "\n".join(lines))
+
+    def check(self) -> None:
+        """Fail if any page is larger than its budget.
+
+        Raises:
+            ValueError: Listing the pages over budget
+
+        """
+        over = [w for w in self.weights if w.over_budget]
+        if over:
+            details = ", ".join(
+                f"{w.notebook.html_path.as_posix()} ({format_size(w.total)} > {format_size(w.budget)})" for w in over
+            )
+            raise ValueError(f"{len(over)} exported pages exceed their size budget: {details}")
@@ -0,0 +1,184 @@
+"""Wheelhouse module for exporting notebooks on hosts without access to a package index.
+
+Sandboxed exports resolve and install the dependencies of every notebook from
+PyPI, so on a host without internet access they fail or stall on index timeouts.
+`marimushka fetch` downloads, on a host with access, the wheels the notebooks and
+marimo need into a directory (the wheelhouse). Exports with --wheelhouse then run
+with $UV_NO_INDEX and $UV_FIND_LINKS set, which also reach the uv calls marimo
+makes for its sandbox, so dependencies resolve from the local directory alone.
+
+A notebook with a fresh lock (see lockfile.py) needs exactly its pinned versions;
+other notebooks need their PEP 723 dependencies and marimo.
+"""
+
+import contextlib
+import os
+import re
+import subprocess
+import tempfile
+from collections.abc import Iterator
+from pathlib import Path
+
+from loguru import logger
+
+from .lockfile import fresh_lock
+from .notebook import Notebook, canonical_name
+
+# Environment variables pointing uv at the wheelhouse instead of an index
+UV_NO_INDEX_ENV = "UV_NO_INDEX"
+UV_FIND_LINKS_ENV = "UV_FIND_LINKS"
+
+# Wheel file names: name-version(-build)?-python-abi-platform.whl
+WHEEL_NAME = re.compile(r"^(?P<name>[^-]+)-(?P<version>[^-]+)(?:-\d[^-]*)?-[^-]+-[^-]+-[^-]+\.whl$")
+
+# The name and, if pinned with ==, the version of a requirement
+REQUIREMENT = re.compile(
+    r"^\s*(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*(?:==\s*(?P<version>[^\s;,]+))?"
+)
+
+
+def requirements(notebook: Notebook) -> list[str]:
+    """Return the requirements an export of a notebook installs.
+
+    These are the pinned lines of a fresh lock, or else the PEP 723 dependencies
+    plus marimo if the header does not list it.
+    """
+    lock = fresh_lock(notebook)
+    if lock is not None:
+        lines = (line.strip() for line in lock.read_text(encoding="utf-8").splitlines())
+        return [line for line in lines if line and not line.startswith(("#", "-"))]
+    needed = list(notebook.script_metadata.get("dependencies", []))
+    return needed if "marimo" in notebook.dependencies else [*needed, "marimo"]
+
+
+def wheels(wheelhouse: str | Path) -> dict[str, set[str]]:
+    """Return the versions of each distribution in a wheelhouse, keyed by canonical name."""
+    found: dict[str, set[str]] = {}
+    for path in Path(wheelhouse).glob("*.whl"):
+        match = WHEEL_NAME.match(path.name)
+        if match:
+            found.setdefault(canonical_name(match["name"]), set()).add(match["version"])
+    return found
+
+
+def missing_wheels(notebooks: list[Notebook], wheelhouse: str | Path) -> dict[Notebook, list[str]]:
+    """Return the requirements of each notebook that no wheel in the wheelhouse satisfies.
+
+    Only names and == pins are compared, and requirements with environment
+    markers are skipped, since they may not apply to the build host.
+
+    Args:
+        notebooks (list[Notebook]): The notebooks
+        wheelhouse (str | Path): The directory of wheels
+
+    Returns:
+        dict[Notebook, list[str]]: The unsatisfied requirements of the notebooks missing any
+
+    """
+    available = wheels(wheelhouse)
+    missing = {}
+    for notebook in notebooks:
+        unsatisfied = []
+        for requirement in requirements(notebook):
+            match = REQUIREMENT.match(requirement)
+            if match is None or ";" in requirement:
+                continue
+            versions = available.get(canonical_name(match["name"]), set())
+            if not versions or (match["version"] is not None and match["version"] not in versions):
+                unsatisfied.append(requirement)
+        if unsatisfied:
+            missing[notebook] = unsatisfied
+    return missing
+
+
+@contextlib.contextmanager
+def use_wheelhouse(path: str | Path) -> Iterator[Path]:
+    """Resolve all dependencies from a directory of wheels while the block runs.
+
+    Sets $UV_NO_INDEX and points $UV_FIND_LINKS at the directory; both variables
+    are restored afterwards.
+
+    Args:
+        path (str | Path): The wheelhouse
+
+    Yields:
+        Path: The absolute wheelhouse
+
+    Raises:
+        ValueError: If the wheelhouse does not exist
+
+    """
+    root = Path(path).resolve()
+    if not root.is_dir():
+        raise ValueError(f"Wheelhouse not found: {path}. Fill it with marimushka fetch")
+    saved = {name: os.environ.get(name) for name in (UV_NO_INDEX_ENV, UV_FIND_LINKS_ENV)}
+    os.environ[UV_NO_INDEX_ENV] = "1"
+    os.environ[UV_FIND_LINKS_ENV] = str(root)
+    try:
+        yield root
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def fetch_wheels(
+    notebooks: list[Notebook],
+    wheelhouse: str | Path,
+    python_version: str | None = None,
+    platforms: list[str] | None = None,
+) -> dict[Notebook, list[str]]:
+    """Download the wheels the exports of the notebooks need into a wheelhouse.
+
+    Wheels already in the wheelhouse are not downloaded again. Notebooks with the
+    same requirements are fetched once, and notebooks are fetched one after the
+    other so their downloads cannot collide.
+
+    Args:
+        notebooks (list[Notebook]): The notebooks
+        wheelhouse (str | Path): The directory the wheels are saved in
+        python_version (str, optional): Python version of the build host, e.g. "3.12".
+            Defaults to the version pip runs with.
+        platforms (list[str], optional): Platform tags of the build host, e.g.
+            "manylinux_2_17_x86_64". Defaults to the platform pip runs on.
+
+    Returns:
+        dict[Notebook, list[str]]: The requirements still not satisfied afterwards, see missing_wheels
+
+    Raises:
+        ValueError: If uvx is not installed
+
+    """
+    root = Path(wheelhouse)
+    root.mkdir(parents=True, exist_ok=True)
+
+    groups: dict[tuple[str, ...], list[Notebook]] = {}
+    for notebook in notebooks:
+        groups.setdefault(tuple(requirements(notebook)), []).append(notebook)
+
+    for needed, members in groups.items():
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write("\n".join(needed) + "\n")
+        cmd = ["uvx", "pip", "download", "--dest", str(root), "--find-links", str(root), "--only-binary", ":all:"]
+        if python_version:
+            cmd += ["--python-version", python_version]
+        for platform in platforms or []:
+            cmd += ["--platform", platform]
+        cmd += ["-r", f.name]
+
+        logger.debug(f"Running command: {cmd}")
+        try:
+            subprocess.run(cmd, capture_output=True, text=True, check=True)
+        except FileNotFoundError as e:
+            raise ValueError("uvx is needed to fetch wheels but was not found") from e
+        except subprocess.CalledProcessError as e:
+            names = ", ".join(str(nb.path) for nb in members)
+            logger.error(f"Could not fetch the wheels of {names}: {e.stderr.strip()}")
+        finally:
+            os.unlink(f.name)
+
+    missing = missing_wheels(notebooks, root)
+    logger.info(f"Wheelhouse {root} holds {sum(map(len, wheels(root).values()))} wheels")
+    return missing
@@ -3,11 +3,25 @@
 This file contains fixtures and configuration for pytest.
 """
 
+import os
+import time
 from pathlib import Path
 from unittest.mock import MagicMock
 
 import pytest
 
+from marimushka.cache import CACHE_ENV
+from marimushka.templating import clear_environments
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path_factory, monkeypatch):
+    """Keep the marimushka cache out of the home directory and start without shared environments."""
+    monkeypatch.setenv(CACHE_ENV, str(tmp_path_factory.getbasetemp() / "marimushka-cache"))
+    clear_environments()
+    yield
+    clear_environments()
+
 
 @pytest.fixture
 def mock_logger():
@@ -24,3 +38,40 @@ def resource_dir():
 
     """
     return Path(__file__).parent / "resources"
+
+
+@pytest.fixture
+def fake_export(monkeypatch):
+    """Return a function that replaces Notebook.export with a stub writing a page instead of running marimo.
+
+    The function takes the page body (by default <html>stem</html>), a string or a function
+    of the notebook that returns None to fail the export; files to write into the public/
+    folder next to the page; a file to log the pid and notebook of every export to, for
+    builds in other processes; and a delay per export. It returns the list the file names
+    of the exported notebooks are appended to.
+
+    """
+
+    def install(page=lambda nb: f"<html>{nb.path.stem}</html>", public=None, log=None, delay=0.0):
+        calls = []
+
+        def export(self, output_dir):
+            calls.append(self.path.name)
+            if log is not None:
+                with open(log, "a") as f:
+                    f.write(f"{os.getpid()} {self.path.name}\n")
+            time.sleep(delay)
+            body = page(self) if callable(page) else page
+            if body is None:
+                return False
+            output_dir.mkdir(parents=True, exist_ok=True)
+            (output_dir / f"{self.path.stem}.html").write_text(body)
+            for name, content in (public or {}).items():
+                (output_dir / "public").mkdir(exist_ok=True)
+                (output_dir / "public" / name).write_text(content)
+            return True
+
+        monkeypatch.setattr("marimushka.notebook.Notebook.export", export)
+        return calls
+
+    return install
@@ -0,0 +1,175 @@
+"""Tests for the archive.py module.
+
+This module contains tests for streaming a built site into tar and zip archives.
+"""
+
+import hashlib
+import io
+import sys
+import tarfile
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from marimushka.archive import MMAP_THRESHOLD, SiteArchive, archive_format, file_digest
+from marimushka.export import main
+
+
+class TestArchiveFormat:
+    """Tests for the archive_format function."""
+
+    @pytest.mark.parametrize(
+        ("target", "expected"),
+        [
+            ("site.tar", "tar"),
+            ("site.tar.gz", "tar.gz"),
+            ("site.tgz", "tar.gz"),
+            ("site.tar.bz2", "tar.bz2"),
+            ("site.tar.xz", "tar.xz"),
+            ("SITE.ZIP", "zip"),
+            ("-", "tar.gz"),
+        ],
+    )
+    def test_known_formats(self, target, expected):
+        """Test that supported suffixes map to their archive format."""
+        assert archive_format(target) == expected
+
+    def test_unknown_format(self):
+        """Test that an unsupported suffix raises a ValueError."""
+        with pytest.raises(ValueError, match="Unsupported archive format"):
+            archive_format("site.rar")
+
+
+class TestSiteArchive:
+    """Tests for the SiteArchive class."""
+
+    def test_tar_gz(self, tmp_path):
+        """Test writing files and bytes to a tar.gz archive."""
+        # Setup
+        source = tmp_path / "page.html"
+        source.write_text("<html>page</html>")
+        target = tmp_path / "site.tar.gz"
+
+        # Execute
+        with SiteArchive(target) as archive:
+            assert archive.add_file(source, "notebooks/page.html")
+            assert archive.add_bytes(b"<html>index</html>", "index.html")
+
+        # Assert
+        with tarfile.open(target, "r:gz") as tar:
+            assert sorted(tar.getnames()) == ["index.html", "notebooks/page.html"]
+            assert tar.extractfile("index.html").read() == b"<html>index</html>"
+
+    def test_zip(self, tmp_path):
+        """Test writing to a zip archive."""
+        # Setup
+        target = tmp_path / "site.zip"
+
+        # Execute
+        with SiteArchive(target) as archive:
+            archive.add_bytes(b"<html>index</html>", "index.html")
+
+        # Assert
+        with zipfile.ZipFile(target) as zf:
+            assert zf.read("index.html") == b"<html>index</html>"
+
+    def test_duplicate_names_are_written_once(self, tmp_path):
+        """Test that adding the same name twice keeps the first entry only."""
+        # Setup
+        target = tmp_path / "site.zip"
+
+        # Execute
+        with SiteArchive(target) as archive:
+            assert archive.add_bytes(b"first", "public/data.csv")
+            assert not archive.add_bytes(b"second", "public/data.csv")
+
+        # Assert
+        with zipfile.ZipFile(target) as zf:
+            assert zf.namelist() == ["public/data.csv"]
+            assert zf.read("public/data.csv") == b"first"
+
+    def test_digests(self, tmp_path):
+        """Test that the archive records the content hash of every entry."""
+        # Setup
+        source = tmp_path / "page.html"
+        source.write_bytes(b"page")
+
+        # Execute
+        with SiteArchive(tmp_path / "site.tar") as archive:
+            archive.add_file(source, "page.html")
+            archive.add_bytes(b"page", "copy.html")
+
+        # Assert
+        assert archive.digests["page.html"] == archive.digests["copy.html"]
+        assert archive.digests["page.html"] == hashlib.sha256(b"page").hexdigest()
+
+    def test_absorb_moves_files(self, tmp_path):
+        """Test that absorb archives the staging directory and empties it."""
+        # Setup
+        staging = tmp_path / "staging"
+        (staging / "apps" / "public").mkdir(parents=True)
+        (staging / "apps" / "charts.html").write_text("charts")
+        (staging / "apps" / "public" / "logo.png").write_bytes(b"png")
+        target = tmp_path / "site.tar"
+
+        # Execute
+        with SiteArchive(target) as archive:
+            added = archive.absorb(staging)
+
+        # Assert
+        assert added == 2
+        assert not [p for p in staging.rglob("*") if p.is_file()]
+        with tarfile.open(target) as tar:
+            assert sorted(tar.getnames()) == ["apps/charts.html", "apps/public/logo.png"]
+
+    def test_stdout(self, monkeypatch):
+        """Test streaming a tar.gz archive to stdout."""
+        # Setup
+        buffer = io.BytesIO()
+        monkeypatch.setattr(sys, "stdout", SimpleNamespace(buffer=buffer))
+
+        # Execute
+        with SiteArchive("-") as archive:
+            archive.add_bytes(b"<html>index</html>", "index.html")
+
+        # Assert
+        with tarfile.open(fileobj=io.BytesIO(buffer.getvalue()), mode="r:gz") as tar:
+            assert tar.getnames() == ["index.html"]
+
+
+def test_main_with_archive(resource_dir, tmp_path, fake_export):
+    """Test that main streams exports and the index into the archive without an output tree."""
+    # Setup
+    fake_export()
+    target = tmp_path / "site.zip"
+    output = tmp_path / "output"
+
+    # Execute
+    html = main(
+        output=output,
+        template=resource_dir / "templates" / "tailwind.html.j2",
+        notebooks=resource_dir / "notebooks",
+        apps=resource_dir / "apps",
+        notebooks_wasm="",
+        archive=target,
+    )
+
+    # Assert
+    assert not output.exists()
+    with zipfile.ZipFile(target) as zf:
+        assert sorted(zf.namelist()) == [
+            "apps/charts.html",
+            "index.html",
+            "notebooks/fibonacci.html",
+            "notebooks/penguins.html",
+        ]
+        assert zf.read("index.html").decode() == html
+
+
+def test_file_digest(tmp_path):
+    """Test that small files and memory-mapped large files hash to their SHA-256 digest."""
+    for size in (0, 10, MMAP_THRESHOLD + 1):
+        path = tmp_path / f"{size}.bin"
+        path.write_bytes(bytes(range(256)) * (size // 256) + b"x" * (size % 256))
+        assert file_digest(path) == hashlib.sha256(path.read_bytes()).hexdigest()
@@ -0,0 +1,103 @@
+"""Tests for the catalog.py module.
+
+This module contains tests for paginating the index and building the search index.
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from marimushka.catalog import SEARCH_INDEX, Page, paginate, search_index
+from marimushka.export import main
+from marimushka.notebook import Kind, folder2notebooks
+from marimushka.tailwind import build_stylesheet, extract_classes
+
+
+class TestPaginate:
+    """Tests for the paginate function."""
+
+    def test_sections_flow_across_pages(self):
+        """Test that the sections are laid out in index order and chunked."""
+        pages = paginate(3, notebooks=["n1", "n2"], apps=["a1", "a2"], notebooks_wasm=["w1"])
+
+        assert [p.page for p in pages] == [1, 2]
+        assert {p.pages for p in pages} == {2}
+        assert (pages[0].notebooks, pages[0].notebooks_wasm, pages[0].apps) == (["n1", "n2"], ["w1"], [])
+        assert (pages[1].notebooks, pages[1].notebooks_wasm, pages[1].apps) == ([], [], ["a1", "a2"])
+
+    def test_empty(self):
+        """Test that an empty catalog still has one page."""
+        assert paginate(10) == [Page(page=1, pages=1)]
+
+    def test_invalid_page_size(self):
+        """Test that a non-positive page size raises a ValueError."""
+        with pytest.raises(ValueError, match="Page size must be positive"):
+            paginate(0, notebooks=["n1"])
+
+
+class TestPage:
+    """Tests for the Page class."""
+
+    def test_navigation(self):
+        """Test the URLs of a page in the middle of the catalog."""
+        page = Page(page=2, pages=3)
+
+        assert page.url == "index-2.html"
+        assert page.urls == ["index.html", "index-2.html", "index-3.html"]
+        assert page.previous == "index.html"
+        assert page.next == "index-3.html"
+
+    def test_first_and_last(self):
+        """Test that the first page has no previous and the last no next page."""
+        assert Page(page=1, pages=2).previous is None
+        assert Page(page=2, pages=2).next is None
+
+
+def test_search_index(resource_dir):
+    """Test that the search index lists every notebook with its title and page."""
+    # Setup
+    notebooks = folder2notebooks(resource_dir / "notebooks", kind=Kind.NB)
+    apps = folder2notebooks(resource_dir / "apps", kind=Kind.APP)
+    pages = paginate(2, notebooks=notebooks, apps=apps)
+
+    # Execute
+    entries = json.loads(search_index(pages))
+
+    # Assert
+    assert len(entries) == 3
+    charts = next(entry for entry in entries if entry["name"] == "charts")
+    assert charts == {
+        "name": "charts",
+        "kind": "app",
+        "path": "apps/charts.html",
+        "title": "Interactive Data Visualization",
+        "page": "index-2.html",
+    }
+
+
+@patch("marimushka.notebook.Notebook.export")
+def test_main_paginated(mock_export, resource_dir, tmp_path):
+    """Test that main writes one page per chunk and the search index."""
+    # Execute
+    html = main(
+        output=tmp_path,
+        notebooks=resource_dir / "notebooks",
+        apps=resource_dir / "apps",
+        notebooks_wasm=resource_dir / "notebooks_wasm",
+        page_size=2,
+        tailwind="link",
+    )
+
+    # Assert
+    assert (tmp_path / "index.html").read_text() == html
+    assert (tmp_path / "index-2.html").exists()
+    assert (tmp_path / "index-3.html").exists()
+    assert not (tmp_path / "index-4.html").exists()
+    assert len(json.loads((tmp_path / SEARCH_INDEX).read_text())) == 5
+    assert f'data-index="{SEARCH_INDEX}"' in html
+    assert 'href="index-2.html"' in html
+
+    # The pagination and search elements only use classes with a build-time rule
+    _, unsupported = build_stylesheet(extract_classes(html))
+    assert not unsupported
@@ -0,0 +1,81 @@
+"""Tests for the changes.py module.
+
+This module contains tests for selecting the notebooks touched since a git reference.
+"""
+
+import shutil
+import subprocess
+
+import pytest
+
+from marimushka.changes import changed_files, select_changed
+from marimushka.export import main
+from marimushka.notebook import Kind, folder2notebooks
+
+
+def _git(repo, *args):
+    """Run git in the repository with a fixed identity."""
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def repo(resource_dir, tmp_path, monkeypatch):
+    """Create a repository with the test notebooks committed on main and a feature branch checked out."""
+    if shutil.which("git") is None:
+        pytest.skip("git is not installed")
+    for folder in ("notebooks", "apps"):
+        shutil.copytree(resource_dir / folder, tmp_path / folder)
+    _git(tmp_path, "init", "-q", "-b", "main")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "notebooks")
+    _git(tmp_path, "checkout", "-q", "-b", "feature")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_data_and_new_notebooks_are_selected(repo):
+    """Test that a changed data file and an untracked notebook select exactly their notebooks.
+
+    fibonacci.py names no data, so it may read any file of its public/ folder.
+    """
+    (repo / "notebooks" / "public" / "penguins.csv").write_text("species\nGentoo\n")
+    (repo / "apps" / "new.py").write_text("import marimo\n")
+    notebooks = folder2notebooks(repo / "notebooks", Kind.NB) + folder2notebooks(repo / "apps", Kind.APP)
+
+    selected = select_changed(notebooks, changed_files("main"))
+
+    assert sorted(nb.path.name for nb in selected) == ["fibonacci.py", "new.py", "penguins.py"]
+
+
+def test_committed_and_deleted_changes(repo):
+    """Test that committed source changes and deleted data files count."""
+    (repo / "apps" / "charts.py").write_text((repo / "apps" / "charts.py").read_text() + "\n# tweak\n")
+    _git(repo, "commit", "-q", "-am", "tweak")
+    (repo / "notebooks" / "public" / "penguins.csv").unlink()
+    notebooks = folder2notebooks(repo / "notebooks", Kind.NB) + folder2notebooks(repo / "apps", Kind.APP)
+
+    selected = select_changed(notebooks, changed_files("main"))
+
+    assert sorted(nb.path.name for nb in selected) == ["charts.py", "fibonacci.py", "penguins.py"]
+
+
+def test_unknown_ref(repo):
+    """Test that an unknown reference is reported as a ValueError."""
+    with pytest.raises(ValueError, match="git merge-base"):
+        changed_files("no-such-branch")
+
+
+def test_main_exports_changed_and_lists_all(repo, fake_export):
+    """Test that only changed notebooks are exported while the index lists every notebook."""
+    exported = fake_export()
+    (repo / "notebooks" / "fibonacci.py").write_text("import marimo\n")
+    html = main(output="_site", notebooks="notebooks", apps="apps", notebooks_wasm=None, changed_since="main")
+
+    assert exported == ["fibonacci.py"]
+    for page in ("notebooks/fibonacci.html", "notebooks/penguins.html", "apps/charts.html"):
+        assert page in html
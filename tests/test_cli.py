@@ -3,6 +3,7 @@
 import subprocess
 from unittest.mock import patch
 
+from marimushka import __version__
 from marimushka.export import cli, version
 
 
@@ -16,14 +17,13 @@ def test_cli(mock_app):
     mock_app.assert_called_once()
 
 
-@patch("marimushka.export.rich_print")
-def test_version(mock_rich_print):
+def test_version(capsys):
     """Test the version command."""
     # Execute
     version()
 
     # Assert
-    mock_rich_print.assert_called_once()
+    assert f"Marimushka version: {__version__}" in capsys.readouterr().out
 
 
 def test_export_run():
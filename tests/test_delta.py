@@ -0,0 +1,159 @@
+"""Tests for the delta.py module.
+
+This module contains tests for keeping unchanged output files untouched and for
+listing the files a build changed and deleted.
+"""
+
+import os
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+from marimushka.delta import CHANGED_FILES, DELETED_FILES, SiteDelta, copy_if_changed, write_if_changed
+from marimushka.export import main
+
+# A modification time far in the past, to tell rewritten files from untouched ones
+PAST = 1_000_000_000 * 10**9
+
+
+def _pages(content: dict[str, str]):
+    """Return the page body for fake_export, the given content per notebook stem and the stem otherwise."""
+    return lambda nb: content.get(nb.path.stem, nb.path.stem)
+
+
+def _age(root):
+    """Set the modification time of every file below a directory to PAST."""
+    for path in root.rglob("*"):
+        if path.is_file():
+            os.utime(path, ns=(PAST, PAST))
+
+
+def test_write_if_changed(tmp_path):
+    """Test that a file with the same bytes is left alone and other content is written."""
+    path = tmp_path / "a" / "b.txt"
+    assert write_if_changed(path, b"one")
+    os.utime(path, ns=(PAST, PAST))
+
+    assert not write_if_changed(path, b"one")
+    assert path.stat().st_mtime_ns == PAST
+    assert write_if_changed(path, b"two")
+    assert path.read_bytes() == b"two"
+
+
+def test_copy_if_changed(tmp_path):
+    """Test that a copy is skipped if the target has the same content."""
+    source, target = tmp_path / "source", tmp_path / "target"
+    source.write_bytes(b"data")
+    assert copy_if_changed(source, target)
+    os.utime(target, ns=(PAST, PAST))
+
+    assert not copy_if_changed(source, target)
+    assert target.stat().st_mtime_ns == PAST
+
+
+def test_site_delta(tmp_path):
+    """Test that the delta is listed by content, also for identical files that were rewritten."""
+    site = tmp_path / "site"
+    (site / "sub").mkdir(parents=True)
+    for name in ("same.html", "edited.html", "sub/removed.css"):
+        (site / name).write_text(name)
+    _age(site)
+
+    delta = SiteDelta(site)
+    (site / "same.html").write_text("same.html")
+    (site / "edited.html").write_text("new content")
+    (site / "sub" / "removed.css").unlink()
+    (site / "new.js").write_text("new")
+    changed, deleted = delta.finish()
+
+    assert changed == ["edited.html", "new.js"]
+    assert deleted == ["sub/removed.css"]
+
+
+def test_site_delta_reuses_recorded_digests(tmp_path):
+    """Test that files whose size and modification time are as recorded are not hashed again."""
+    site = tmp_path / "site"
+    site.mkdir()
+    (site / "page.html").write_text("page")
+    SiteDelta(site).finish()
+
+    with patch("marimushka.delta.file_digest") as digest:
+        SiteDelta(site).finish()
+
+    digest.assert_not_called()
+
+
+def test_main_keeps_unchanged_exports_and_lists_the_delta(resource_dir, tmp_path, fake_export):
+    """Test that a rebuild leaves identical files untouched and lists only what changed."""
+    site, delta = tmp_path / "site", tmp_path / "delta"
+    folders = {"notebooks": resource_dir / "notebooks", "apps": resource_dir / "apps", "notebooks_wasm": None}
+
+    fake_export(_pages({}))
+    main(output=site, delta_dir=delta, **folders)
+    assert "notebooks/fibonacci.html" in (delta / CHANGED_FILES).read_text().splitlines()
+    _age(site)
+
+    fake_export(_pages({"penguins": "new penguins"}))
+    main(output=site, delta_dir=delta, **folders)
+
+    assert (delta / CHANGED_FILES).read_text().splitlines() == ["notebooks/penguins.html"]
+    assert (delta / DELETED_FILES).read_text() == ""
+    assert (site / "notebooks" / "fibonacci.html").stat().st_mtime_ns == PAST
+    assert (site / "index.html").stat().st_mtime_ns == PAST
+
+
+def test_build_without_delta_dir_leaves_other_pages(tmp_path, fake_export):
+    """Test that a build without a delta directory neither hashes the site nor removes pages it did not write."""
+    notebooks, site = tmp_path / "nb", tmp_path / "site"
+    notebooks.mkdir()
+    (notebooks / "a.py").write_text("import marimo\n")
+    (site / "notebooks").mkdir(parents=True)
+    (site / "notebooks" / "other.html").write_text("kept")
+
+    fake_export(_pages({}))
+    with patch("marimushka.delta.SiteDelta") as delta:
+        main(output=site, notebooks=notebooks, apps=None, notebooks_wasm=None)
+
+    delta.assert_not_called()
+    assert (site / "notebooks" / "other.html").read_text() == "kept"
+    assert (site / "notebooks" / "a.html").exists()
+
+
+def test_delta_dir_needs_an_output_directory(resource_dir, tmp_path):
+    """Test that the delta cannot be listed for an archive."""
+    with pytest.raises(ValueError, match="output directory"):
+        main(archive=tmp_path / "site.zip", notebooks=resource_dir / "notebooks", delta_dir=tmp_path / "delta")
+
+
+def test_deleted_notebook_is_removed_and_listed(tmp_path, fake_export):
+    """Test that the page of a notebook deleted between two builds leaves the site and is listed as deleted."""
+    notebooks, site, delta = tmp_path / "nb", tmp_path / "site", tmp_path / "delta"
+    notebooks.mkdir()
+    for name in ("a.py", "b.py"):
+        (notebooks / name).write_text("import marimo\n")
+    folders = {"notebooks": notebooks, "apps": None, "notebooks_wasm": None}
+
+    fake_export(_pages({}))
+    main(output=site, delta_dir=delta, **folders)
+    (notebooks / "b.py").unlink()
+    main(output=site, delta_dir=delta, **folders)
+
+    assert not (site / "notebooks" / "b.html").exists()
+    assert (delta / DELETED_FILES).read_text().splitlines() == ["notebooks/b.html"]
+    assert (delta / CHANGED_FILES).read_text().splitlines() == ["index.html"]
+
+
+def test_fresh_output_is_compared_with_the_last_build(resource_dir, tmp_path, fake_export):
+    """Test that a build into an empty output directory lists only what changed since the recorded build."""
+    folders = {"notebooks": resource_dir / "notebooks", "apps": resource_dir / "apps", "notebooks_wasm": None}
+    site, delta = tmp_path / "site", tmp_path / "delta"
+
+    fake_export(_pages({}))
+    main(output=site, delta_dir=delta, **folders)
+    shutil.rmtree(site)
+    fake_export(_pages({"charts": "new charts"}))
+    main(output=site, delta_dir=delta, **folders)
+
+    assert (delta / CHANGED_FILES).read_text().splitlines() == ["apps/charts.html"]
+    assert (delta / DELETED_FILES).read_text() == ""
@@ -0,0 +1,121 @@
+"""Tests for the events.py and progress.py modules.
+
+This module contains tests for the event stream of a build, as a callback and as
+a generator, and for the live progress view consuming it.
+"""
+
+import io
+import json
+
+import pytest
+from loguru import logger
+from rich.console import Console
+
+from marimushka.events import BuildEvent, EventType, build_events
+from marimushka.export import main
+from marimushka.notebook import Kind, Notebook
+from marimushka.progress import ProgressView
+
+
+@pytest.fixture
+def folders(resource_dir, fake_export):
+    """Return the folders of the test notebooks, without WASM notebooks, whose export fails for penguins."""
+    fake_export(lambda nb: None if nb.path.stem == "penguins" else "<html></html>")
+    return {"notebooks": resource_dir / "notebooks", "apps": resource_dir / "apps", "notebooks_wasm": None}
+
+
+def test_main_reports_events(folders, tmp_path):
+    """Test that every notebook is discovered, queued, started and ended exactly once, with timings."""
+    events: list[BuildEvent] = []
+
+    main(output=tmp_path / "site", on_event=events.append, jobs=2, **folders)
+
+    by_page: dict[str, list[EventType]] = {}
+    for event in events:
+        by_page.setdefault(event.notebook.html_path.as_posix(), []).append(event.type)
+    assert by_page["notebooks/fibonacci.html"] == [
+        EventType.DISCOVERED,
+        EventType.QUEUED,
+        EventType.STARTED,
+        EventType.FINISHED,
+    ]
+    assert by_page["notebooks/penguins.html"][-1] is EventType.FAILED
+    assert len(by_page) == 3
+
+    ended = [event for event in events if event.type.done]
+    assert all(event.seconds is not None and event.seconds >= 0 for event in ended)
+    assert [event.error is not None for event in ended if event.type is EventType.FAILED] == [True]
+    assert all(event.elapsed >= 0 for event in events)
+
+
+def test_cache_hits(folders, tmp_path):
+    """Test that exports taken from the export cache end with a cache hit instead of finishing."""
+    main(output=tmp_path / "first", export_cache=tmp_path / "cache", **folders)
+    events = list(build_events(output=tmp_path / "second", export_cache=tmp_path / "cache", **folders))
+
+    ended = {event.notebook.path.stem: event.type for event in events if event.type.done}
+    assert ended == {"fibonacci": EventType.CACHE_HIT, "charts": EventType.CACHE_HIT, "penguins": EventType.FAILED}
+
+
+def test_build_events_raises_the_error_of_the_build(folders, tmp_path):
+    """Test that the generator yields the events so far and then raises what the build raised."""
+    with pytest.raises(ValueError, match="jobs"):
+        list(build_events(output=tmp_path / "site", jobs=0, **folders))
+
+
+def test_event_to_dict(resource_dir):
+    """Test that an event serialises to JSON for a dashboard."""
+    nb = Notebook(resource_dir / "apps" / "charts.py", Kind.APP)
+    event = BuildEvent(EventType.CACHE_HIT, nb, elapsed=1.23456, seconds=0.5)
+
+    data = json.loads(json.dumps(event.to_dict()))
+
+    assert data["type"] == "cache-hit"
+    assert data["page"] == "apps/charts.html"
+    assert data["elapsed"] == 1.235
+
+
+def test_progress_view(folders, tmp_path):
+    """Test that the progress view counts the exports and shows the active workers and failures."""
+    out = io.StringIO()
+    nb = Notebook(folders["notebooks"] / "fibonacci.py")
+
+    with ProgressView(console=Console(file=out, width=200)) as view:
+        view(BuildEvent(EventType.QUEUED, nb, elapsed=0.0))
+        view(BuildEvent(EventType.STARTED, nb, elapsed=0.1))
+        assert view.status() == "1 active: notebooks/fibonacci.html"
+        view(BuildEvent(EventType.FAILED, nb, elapsed=0.2, seconds=0.1, error="boom"))
+
+        main(output=tmp_path / "site", on_event=view, **folders)
+
+    assert (view.queued, view.done, view.failed) == (4, 4, 2)
+    assert view.active == []
+    assert view.throughput > 0
+    assert "4/4" in out.getvalue()
+
+
+def test_progress_view_prints_the_log():
+    """Test that log messages go through the console of the view while it is shown, and to stderr afterwards."""
+    out = io.StringIO()
+
+    with ProgressView(console=Console(file=out, width=200)):
+        logger.warning("shown above the progress bar")
+    logger.warning("written to stderr")
+
+    assert "WARNING  | tests.test_events:" in out.getvalue()
+    assert "shown above the progress bar" in out.getvalue()
+    assert "written to stderr" not in out.getvalue()
+
+
+def test_progress_view_keeps_the_handlers_of_the_caller():
+    """Test that a handler added by the caller receives the log while the view is shown and afterwards."""
+    received = []
+    sink = logger.add(received.append, format="{message}")
+    try:
+        with ProgressView(console=Console(file=io.StringIO(), width=200)):
+            logger.info("during")
+        logger.info("after")
+    finally:
+        logger.remove(sink)
+
+    assert received == ["during\n", "after\n"]
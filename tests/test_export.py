@@ -8,7 +8,7 @@ This module contains tests for the functions in the export.py module:
 """
 
 from pathlib import Path
-from unittest.mock import MagicMock, mock_open, patch
+from unittest.mock import ANY, MagicMock, mock_open, patch
 
 import jinja2
 
@@ -116,7 +116,14 @@ class TestGenerateIndex:
         # Check that the template was rendered and written to file
         mock_env.assert_called_once()
         mock_env.return_value.get_template.assert_called_once_with(template_file.name)
-        mock_template.render.assert_called_once_with(notebooks=notebooks, apps=apps, notebooks_wasm=notebooks_wasm)
+        mock_template.render.assert_called_once_with(
+            notebooks=notebooks,
+            apps=apps,
+            notebooks_wasm=notebooks_wasm,
+            pagination=None,
+            search_index=None,
+            service_worker=None,
+        )
         mock_file_open.assert_called_once_with(output_dir / "index.html", "w")
         mock_file_open().write.assert_called_once_with("<html>Rendered content</html>")
 
@@ -175,6 +182,35 @@ class TestGenerateIndex:
         # Check that the function returns an empty string when there's a template error
         assert result == ""
 
+    def test_generate_index_streamed(self, resource_dir, tmp_path):
+        """Test that the index is streamed to disk and not returned when return_html is False."""
+        # Setup
+        output_dir = tmp_path / "output"
+        template_file = resource_dir / "templates" / "tailwind.html.j2"
+        expected = _generate_index(output=tmp_path / "reference", template_file=template_file)
+
+        # Execute
+        result = _generate_index(output=output_dir, template_file=template_file, return_html=False)
+
+        # Assert
+        assert result is None
+        assert (output_dir / "index.html").read_text() == expected
+        assert [p.name for p in output_dir.iterdir()] == ["index.html"]
+
+    def test_generate_index_streamed_template_error(self, tmp_path):
+        """Test that a failing stream leaves neither a partial index nor a temporary file."""
+        # Setup
+        output_dir = tmp_path / "output"
+        template_file = tmp_path / "broken.html.j2"
+        template_file.write_text("<html>{{ 'x' * 10000 }}{{ undefined_section.title }}</html>")
+
+        # Execute
+        result = _generate_index(output=output_dir, template_file=template_file, return_html=False)
+
+        # Assert
+        assert result is None
+        assert list(output_dir.iterdir()) == []
+
 
 class TestMain:
     """Tests for the main function."""
@@ -253,4 +289,20 @@ class TestMain:
             notebooks=mock_notebooks,
             apps=mock_apps,
             notebooks_wasm=mock_notebooks_wasm,
+            archive=None,
+            tailwind="cdn",
+            page_size=None,
+            service_worker=False,
+            preload=None,
+            fingerprint=False,
+            self_host_assets=False,
+            asset_mirror=None,
+            optimise_images=False,
+            return_html=True,
+            export_cache=None,
+            weight_report=ANY,
+            export_only=None,
+            jobs=None,
+            events=None,
+            write_changed_only=False,
         )
@@ -0,0 +1,82 @@
+"""Tests for the fingerprint.py module.
+
+This module contains tests for content-hashed asset names and the generated cache policies.
+"""
+
+from marimushka.export import main
+from marimushka.fingerprint import HEADERS, IMMUTABLE, NGINX, fingerprint_assets, headers_policy, is_fingerprinted
+
+
+class TestFingerprintAssets:
+    """Tests for the fingerprint_assets function."""
+
+    def test_renames_and_rewrites_references(self, tmp_path):
+        """Test that assets get hashed names and pages in any folder point to them."""
+        # Setup
+        (tmp_path / "_assets").mkdir()
+        (tmp_path / "_assets" / "tailwind.css").write_text("body{}")
+        (tmp_path / "apps").mkdir()
+        (tmp_path / "index.html").write_text('<link href="_assets/tailwind.css"><a href="apps/charts.html">')
+        (tmp_path / "apps" / "charts.html").write_text("<link href='../_assets/tailwind.css'>")
+
+        # Execute
+        renamed = fingerprint_assets(tmp_path)
+
+        # Assert
+        new = renamed["_assets/tailwind.css"]
+        assert is_fingerprinted(new)
+        assert not (tmp_path / "_assets" / "tailwind.css").exists()
+        assert (tmp_path / new).read_text() == "body{}"
+        assert f'href="{new}"' in (tmp_path / "index.html").read_text()
+        assert 'href="apps/charts.html"' in (tmp_path / "index.html").read_text()
+        assert f"href='../{new}'" in (tmp_path / "apps" / "charts.html").read_text()
+
+    def test_keeps_hashed_assets_and_data(self, tmp_path):
+        """Test that already hashed assets and public data keep their names."""
+        # Setup
+        (tmp_path / "assets").mkdir()
+        (tmp_path / "assets" / "index-BPDp8tUL.js").write_text("js")
+        (tmp_path / "public").mkdir()
+        (tmp_path / "public" / "data.csv").write_text("a,b")
+
+        # Execute
+        renamed = fingerprint_assets(tmp_path)
+
+        # Assert
+        assert renamed == {}
+        assert (tmp_path / "assets" / "index-BPDp8tUL.js").exists()
+        assert (tmp_path / "public" / "data.csv").exists()
+
+
+def test_headers_policy_revalidates_service_worker():
+    """Test that the service worker is never cached as immutable."""
+    policy = headers_policy(["sw.js", "assets/index-BPDp8tUL.js"])
+    assert "/sw.js\n  Cache-Control: public, max-age=0, must-revalidate" in policy
+    assert f"/assets/index-BPDp8tUL.js\n  Cache-Control: {IMMUTABLE}" in policy
+
+
+def test_main_with_fingerprint(resource_dir, tmp_path, fake_export):
+    """Test that main fingerprints the compiled stylesheet and writes the cache policies."""
+    # Setup
+    fake_export()
+    output = tmp_path / "output"
+
+    # Execute
+    html = main(
+        output=output,
+        template=resource_dir / "templates" / "tailwind.html.j2",
+        notebooks=resource_dir / "notebooks",
+        apps="",
+        notebooks_wasm="",
+        tailwind="link",
+        fingerprint=True,
+    )
+
+    # Assert
+    (stylesheet,) = (output / "_assets").iterdir()
+    assert is_fingerprinted(stylesheet.name)
+    assert f"_assets/{stylesheet.name}" in html
+    assert html == (output / "index.html").read_text()
+    assert f"/_assets/{stylesheet.name}\n  Cache-Control: {IMMUTABLE}" in (output / HEADERS).read_text()
+    assert not (output / NGINX).exists()
+    assert (tmp_path / NGINX).read_text().startswith("# Generated by marimushka")
@@ -0,0 +1,195 @@
+"""Tests for the images.py module.
+
+This module contains tests for the lossless recompression of the PNG and JPEG
+images of a site, their WebP variants and the cache of the results.
+"""
+
+import hashlib
+import shutil
+import struct
+import zlib
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from marimushka.export import main
+from marimushka.fingerprint import is_fingerprinted
+from marimushka.images import ImageCache, optimise, optimise_images, recompress_png
+
+
+@pytest.fixture
+def logo(resource_dir) -> bytes:
+    """Return the logo of the test apps, a PNG saved with fast compression and textual metadata."""
+    return (resource_dir / "apps" / "public" / "logo.png").read_bytes()
+
+
+def _chunks(data: bytes) -> list[tuple[bytes, bytes]]:
+    """Return the chunks of a PNG, checking their CRCs."""
+    chunks, position = [], 8
+    while position < len(data):
+        (length,) = struct.unpack(">I", data[position : position + 4])
+        kind, body = data[position + 4 : position + 8], data[position + 8 : position + 8 + length]
+        assert struct.unpack(">I", data[position + 8 + length : position + 12 + length])[0] == zlib.crc32(kind + body)
+        chunks.append((kind, body))
+        position += 12 + length
+    return chunks
+
+
+def _pixels(data: bytes) -> bytes:
+    """Return the filtered scanlines of a PNG."""
+    return zlib.decompress(b"".join(body for kind, body in _chunks(data) if kind == b"IDAT"))
+
+
+def _png(size: int = 64) -> bytes:
+    """Return a grey PNG whose image data is stored without compression."""
+
+    def chunk(kind: bytes, body: bytes) -> bytes:
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 0, 0, 0, 0)
+    scanlines = b"".join(b"\x00" + bytes(range(size)) for _ in range(size))
+    data = chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(scanlines, 0)) + chunk(b"IEND", b"")
+    return b"\x89PNG\r\n\x1a\n" + data
+
+
+def _tool(output: bytes):
+    """Return a subprocess.run replacement for an image tool that writes the given output."""
+
+    def run(args, **kwargs):
+        target = args[args.index("-outfile") + 1] if "-outfile" in args else args[args.index("-o") + 1]
+        Path(target).write_bytes(output)
+
+    return run
+
+
+def test_recompress_png(logo):
+    """Test that a PNG shrinks without a change to its pixels and loses its textual metadata."""
+    smaller = recompress_png(logo)
+
+    assert len(smaller) < len(logo)
+    assert _pixels(smaller) == _pixels(logo)
+    kinds = [kind for kind, _ in _chunks(smaller)]
+    assert kinds == [b"IHDR", b"sRGB", b"eXIf", b"pHYs", b"IDAT", b"IEND"]
+
+
+def test_recompress_png_rejects_other_data():
+    """Test that data that is not a PNG is an error."""
+    with pytest.raises(ValueError, match="Not a PNG"):
+        recompress_png(b"GIF89a")
+    with pytest.raises(ValueError, match="Truncated"):
+        recompress_png(b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0dIHDR")
+
+
+def test_optimise_jpeg_with_tools():
+    """Test that JPEGs are recompressed with jpegtran and get a lossy WebP variant from cwebp."""
+    tools = {"jpegtran": "/usr/bin/jpegtran", "cwebp": "/usr/bin/cwebp"}
+
+    with patch("subprocess.run", side_effect=_tool(b"small")) as run:
+        image, webp = optimise(b"a large jpeg", ".JPG", tools)
+
+    assert image == b"small"
+    # The variant is no smaller than the recompressed image, so it is dropped
+    assert webp is None
+    jpegtran, cwebp = (call.args[0] for call in run.call_args_list)
+    assert jpegtran[:5] == ["/usr/bin/jpegtran", "-copy", "all", "-optimize", "-progressive"]
+    assert cwebp[2:4] == ["-q", "85"]
+
+
+def test_optimise_png_webp_variant(logo):
+    """Test that a PNG gets a lossless WebP variant if it is smaller."""
+    with patch("subprocess.run", side_effect=_tool(b"tiny")) as run:
+        image, webp = optimise(logo, ".png", {"cwebp": "cwebp"})
+
+    assert image == recompress_png(logo)
+    assert webp == b"tiny"
+    assert "-lossless" in run.call_args.args[0]
+
+
+def test_optimise_images(logo, tmp_path):
+    """Test that the images of public/ folders and asset directories shrink and are cached by content."""
+    site = tmp_path / "site"
+    images = {"apps/public/logo.png": logo, "_assets/grey.png": _png(), "apps/logo.png": logo}
+    for name, data in images.items():
+        (site / name).parent.mkdir(parents=True, exist_ok=True)
+        (site / name).write_bytes(data)
+    cache = ImageCache(tmp_path / "cache", tools={})
+
+    saved = optimise_images(site, jobs=2, cache=cache)
+
+    assert sorted(saved) == ["_assets/grey.png", "apps/public/logo.png"]
+    assert (site / "apps" / "public" / "logo.png").read_bytes() == recompress_png(logo)
+    assert (site / "apps" / "logo.png").read_bytes() == logo
+
+    # A rebuild copies the original images again, and they are taken from the cache
+    for name, data in images.items():
+        (site / name).write_bytes(data)
+    with patch("marimushka.images._optimise_file") as process:
+        assert optimise_images(site, cache=cache) == saved
+    process.assert_not_called()
+    assert (site / "apps" / "public" / "logo.png").read_bytes() == recompress_png(logo)
+
+
+def test_optimised_images_are_cached_too(logo, tmp_path):
+    """Test that an image that cannot shrink any more is recorded and not processed again."""
+    site = tmp_path / "site"
+    (site / "public").mkdir(parents=True)
+    (site / "public" / "logo.png").write_bytes(recompress_png(logo))
+    cache = ImageCache(tmp_path / "cache", tools={})
+
+    assert optimise_images(site, cache=cache) == {}
+    with patch("marimushka.images._optimise_file") as process:
+        optimise_images(site, cache=cache)
+    process.assert_not_called()
+
+
+def test_main_optimises_images(resource_dir, logo, tmp_path):
+    """Test that a build shrinks the images marimo copies from the public/ folder of a notebook."""
+
+    def export(self, output_dir):
+        output_dir.mkdir(parents=True, exist_ok=True)
+        (output_dir / f"{self.path.stem}.html").write_text("<html></html>")
+        shutil.copytree(self.path.parent / "public", output_dir / "public", dirs_exist_ok=True)
+        return True
+
+    site = tmp_path / "site"
+    with patch("marimushka.notebook.Notebook.export", export), patch("shutil.which", return_value=None):
+        main(output=site, apps=resource_dir / "apps", notebooks=None, notebooks_wasm=None, optimise_images=True)
+
+    assert (site / "apps" / "public" / "logo.png").read_bytes() == recompress_png(logo)
+
+
+def test_fingerprints_match_the_optimised_images(logo, tmp_path):
+    """Test that every content-hashed name matches the final bytes, and the WebP variant follows its image."""
+
+    def export(self, output_dir):
+        output_dir.mkdir(parents=True, exist_ok=True)
+        (output_dir / f"{self.path.stem}.html").write_text('<img src="assets/logo.png">')
+        (output_dir / "assets").mkdir(exist_ok=True)
+        (output_dir / "assets" / "logo.png").write_bytes(logo)
+        return True
+
+    (tmp_path / "apps").mkdir()
+    (tmp_path / "apps" / "charts.py").write_text("import marimo\n")
+    site = tmp_path / "site"
+    with (
+        patch("marimushka.notebook.Notebook.export", export),
+        patch("marimushka.images.available_tools", return_value={"cwebp": "cwebp"}),
+        patch("subprocess.run", side_effect=_tool(b"webp")),
+    ):
+        main(
+            output=site,
+            apps=tmp_path / "apps",
+            notebooks=None,
+            notebooks_wasm=None,
+            optimise_images=True,
+            fingerprint=True,
+        )
+
+    hashed = [path for path in (site / "apps" / "assets").iterdir() if is_fingerprinted(path.name)]
+    assert [path.suffix for path in hashed] == [".png"]
+    image = hashed[0]
+    assert image.name == f"logo.{hashlib.sha256(image.read_bytes()).hexdigest()[:10]}.png"
+    assert image.read_bytes() == recompress_png(logo)
+    assert image.with_name(image.name + ".webp").read_bytes() == b"webp"
+    assert f'src="assets/{image.name}"' in (site / "apps" / "charts.html").read_text()
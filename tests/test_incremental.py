@@ -0,0 +1,155 @@
+"""Tests for the incremental.py module.
+
+This module contains tests for skipping index pages whose render inputs are unchanged.
+"""
+
+import os
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+from marimushka.export import _generate_index
+from marimushka.incremental import RenderState, render_digest, template_sources
+from marimushka.notebook import Kind, folder2notebooks
+
+
+@pytest.fixture(autouse=True)
+def no_export():
+    """Skip the marimo exports, only the index is of interest here."""
+    with patch("marimushka.notebook.Notebook.export", return_value=True):
+        yield
+
+
+def _age(path):
+    """Move the mtime of a file into the past, so a rewrite is detectable."""
+    os.utime(path, (1_000_000, 1_000_000))
+
+
+class TestRenderDigest:
+    """Tests for the render_digest function."""
+
+    def test_depends_on_template_and_context(self, resource_dir, tmp_path):
+        """Test that the digest changes with the template source, the notebooks and the options."""
+        # Setup
+        template = tmp_path / "index.html.j2"
+        template.write_text("<html>{{ notebooks }}</html>")
+        notebooks = folder2notebooks(resource_dir / "notebooks", kind=Kind.NB)
+        digest = render_digest(template, {"notebooks": notebooks})
+
+        # Assert
+        assert render_digest(template, {"notebooks": notebooks}) == digest
+        assert render_digest(template, {"notebooks": notebooks[:1]}) != digest
+        assert render_digest(template, {"notebooks": notebooks}, {"tailwind": "link"}) != digest
+        template.write_text("<html>{{ apps }}</html>")
+        assert render_digest(template, {"notebooks": notebooks}) != digest
+
+    def test_depends_on_referenced_templates(self, tmp_path):
+        """Test that the digest changes with every template the page template includes, extends or imports."""
+        # Setup
+        template = tmp_path / "index.html.j2"
+        template.write_text('{% extends "base.html.j2" %}{% block body %}{% include "card.html.j2" %}{% endblock %}')
+        (tmp_path / "base.html.j2").write_text('{% import "macros.html.j2" as m %}<html>{% block body %}{% endblock %}')
+        (tmp_path / "card.html.j2").write_text("<div></div>")
+        (tmp_path / "macros.html.j2").write_text("{% macro link() %}<a></a>{% endmacro %}")
+        (tmp_path / "unused.html.j2").write_text("")
+        digest = render_digest(template, {})
+
+        # Assert
+        assert sorted(template_sources(template)) == ["base.html.j2", "card.html.j2", "index.html.j2", "macros.html.j2"]
+        (tmp_path / "unused.html.j2").write_text("<p></p>")
+        assert render_digest(template, {}) == digest
+        (tmp_path / "macros.html.j2").write_text("{% macro link() %}<a href></a>{% endmacro %}")
+        assert render_digest(template, {}) != digest
+
+    def test_dynamic_reference_covers_the_directory(self, tmp_path):
+        """Test that a template name chosen at render time makes every template of the directory an input."""
+        template = tmp_path / "index.html.j2"
+        template.write_text("{% include layout %}")
+        (tmp_path / "card.html.j2").write_text("<div></div>")
+
+        assert sorted(template_sources(template)) == ["card.html.j2", "index.html.j2"]
+
+
+class TestRenderState:
+    """Tests for the RenderState class."""
+
+    def test_round_trip(self, tmp_path):
+        """Test that recorded digests survive a reload and require the page to exist."""
+        # Setup
+        output = tmp_path / "site"
+        output.mkdir()
+        (output / "index.html").write_text("<html></html>")
+
+        # Execute
+        state = RenderState(output)
+        state.record("index.html", "abc")
+        state.record("index-2.html", "def")
+        state.save()
+        reloaded = RenderState(output)
+
+        # Assert
+        assert reloaded.unchanged("index.html", "abc")
+        assert not reloaded.unchanged("index.html", "xyz")
+        assert not reloaded.unchanged("index-2.html", "def")
+
+
+def test_unchanged_index_is_not_rewritten(resource_dir, tmp_path):
+    """Test that a second build with the same inputs leaves index.html untouched."""
+    # Setup
+    output = tmp_path / "output"
+    template = tmp_path / "tailwind.html.j2"
+    shutil.copy(resource_dir / "templates" / "tailwind.html.j2", template)
+    notebooks = folder2notebooks(resource_dir / "notebooks", kind=Kind.NB)
+    _generate_index(output=output, template_file=template, notebooks=notebooks, return_html=False)
+    _age(output / "index.html")
+
+    # Execute
+    html = _generate_index(output=output, template_file=template, notebooks=notebooks)
+
+    # Assert
+    assert (output / "index.html").stat().st_mtime == 1_000_000
+    assert html == (output / "index.html").read_text()
+
+    # A changed template renders again
+    template.write_text(template.read_text() + "\n")
+    _generate_index(output=output, template_file=template, notebooks=notebooks, return_html=False)
+    assert (output / "index.html").stat().st_mtime != 1_000_000
+
+
+def test_only_changed_pages_are_rewritten(resource_dir, tmp_path):
+    """Test that with pagination only the pages whose notebooks changed are written again."""
+    # Setup
+    output = tmp_path / "output"
+    template = resource_dir / "templates" / "tailwind.html.j2"
+    notebooks = folder2notebooks(resource_dir / "notebooks", kind=Kind.NB)
+    apps = folder2notebooks(resource_dir / "apps", kind=Kind.APP)
+    _generate_index(output=output, template_file=template, notebooks=notebooks, apps=apps, page_size=2)
+    for name in ("index.html", "index-2.html", "search-index.json"):
+        _age(output / name)
+
+    # Execute: the first page stays the same, the second lists the app as a WASM notebook instead
+    wasm = folder2notebooks(resource_dir / "apps", kind=Kind.NB_WASM)
+    _generate_index(output=output, template_file=template, notebooks=notebooks, notebooks_wasm=wasm, page_size=2)
+
+    # Assert
+    assert (output / "index.html").stat().st_mtime == 1_000_000
+    assert (output / "index-2.html").stat().st_mtime != 1_000_000
+    assert (output / "search-index.json").stat().st_mtime != 1_000_000
+
+
+def test_surplus_pages_are_removed(resource_dir, tmp_path):
+    """Test that a build with fewer pages removes the pages an earlier build wrote beyond them."""
+    # Setup
+    output = tmp_path / "output"
+    template = resource_dir / "templates" / "tailwind.html.j2"
+    notebooks = folder2notebooks(resource_dir / "notebooks", kind=Kind.NB)
+    apps = folder2notebooks(resource_dir / "apps", kind=Kind.APP)
+    _generate_index(output=output, template_file=template, notebooks=notebooks, apps=apps, page_size=1)
+    assert (output / "index-3.html").exists()
+
+    # Execute
+    _generate_index(output=output, template_file=template, notebooks=notebooks, apps=apps, page_size=2)
+
+    # Assert
+    assert sorted(path.name for path in output.glob("index*.html")) == ["index-2.html", "index.html"]
@@ -0,0 +1,81 @@
+"""Tests for the linkcheck.py module.
+
+This module contains tests for validating the internal references of a built site
+and for the check command.
+"""
+
+import pytest
+from typer.testing import CliRunner
+
+from marimushka.export import app, main
+from marimushka.linkcheck import BrokenLink, check_site
+
+
+@pytest.fixture
+def site(tmp_path):
+    """Write a small site with valid and broken references of every supported kind."""
+    root = tmp_path / "site"
+    (root / "notebooks" / "assets").mkdir(parents=True)
+    (root / "notebooks" / "assets" / "app.js").write_text("")
+    (root / "notebooks" / "assets" / "plot@2x.png").write_text("")
+    (root / "apps").mkdir()
+    (root / "apps" / "index.html").write_text("<html></html>")
+    (root / "index.html").write_text(
+        "<html>\n"
+        '<a href="notebooks/a.html#top">A</a>\n'
+        '<a href="https://marimo.io">marimo</a> <a href="mailto:x@y.z">mail</a> <a href="#search">skip</a>\n'
+        '<a href="apps/">Apps</a> <a href="/apps">Apps</a>\n'
+        '<img src="notebooks/missing.png">\n'
+        "<script>var s = '<img src=\"ignored.png\">';</script>\n"
+        "</html>"
+    )
+    (root / "notebooks" / "a.html").write_text(
+        "<html>\n"
+        '<script src="./assets/app.js"></script>\n'
+        '<img srcset="assets/plot@2x.png 2x, assets/plot@3x.png 3x" src="assets/plot%402x.png"/>\n'
+        '<a href="../index.html">Back</a> <a href="../../outside.html">Out</a>\n'
+        "</html>"
+    )
+    return root
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_check_site(site, workers):
+    """Test that exactly the broken internal references are reported, in process and in a pool."""
+    broken = check_site(site, workers=workers)
+
+    assert broken == [
+        BrokenLink("index.html", 5, "notebooks/missing.png"),
+        BrokenLink("notebooks/a.html", 3, "assets/plot@3x.png"),
+        BrokenLink("notebooks/a.html", 4, "../../outside.html"),
+    ]
+    assert str(broken[0]) == "index.html:5: notebooks/missing.png"
+
+
+def test_missing_site(tmp_path):
+    """Test that a missing site directory is an error."""
+    with pytest.raises(ValueError, match="Site directory not found"):
+        check_site(tmp_path / "missing")
+
+
+def test_check_command(site):
+    """Test that the check command lists broken links and fails, and passes on a clean site."""
+    runner = CliRunner()
+
+    result = runner.invoke(app, ["check", str(site), "--workers", "1"])
+    assert result.exit_code == 1
+    assert "notebooks/a.html:4: ../../outside.html" in result.output
+
+    for page in ("index.html", "notebooks/a.html"):
+        (site / page).write_text('<a href="notebooks/a.html">A</a>')
+    (site / "notebooks" / "notebooks").mkdir()
+    (site / "notebooks" / "notebooks" / "a.html").write_text("")
+    assert runner.invoke(app, ["check", str(site)]).exit_code == 0
+
+
+def test_exported_site_is_valid(resource_dir, tmp_path, fake_export):
+    """Test that the index of an export links only to files that exist."""
+    fake_export("<html></html>")
+    main(output=tmp_path / "site", notebooks=resource_dir / "notebooks", apps=resource_dir / "apps")
+
+    assert check_site(tmp_path / "site") == []
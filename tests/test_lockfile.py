@@ -0,0 +1,161 @@
+"""Tests for the lockfile.py module.
+
+This module contains tests for locking the dependencies of notebooks, detecting
+stale locks, exporting from a lock and the lock command. uv is replaced by a fake
+that pins every requirement to version 1.0.
+"""
+
+import shutil
+import subprocess
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from typer.testing import CliRunner
+
+from marimushka.changes import affected
+from marimushka.export import app
+from marimushka.lockfile import compile_lock, header_digest, lock_notebooks, lock_path, lock_status
+from marimushka.notebook import Kind, Notebook
+from marimushka.store import ExportCache
+
+
+@pytest.fixture
+def folder(resource_dir, tmp_path):
+    """Return a copy of the test notebooks."""
+    shutil.copytree(resource_dir / "notebooks", tmp_path / "notebooks")
+    return tmp_path / "notebooks"
+
+
+@pytest.fixture
+def uv():
+    """Replace uv pip compile by a fake pinning each requirement to 1.0, recording the commands."""
+    calls = []
+
+    def run(cmd, cwd=None, **kwargs):
+        calls.append(cmd)
+        names = [line.split("=")[0].split(">")[0].strip() for line in (Path(cwd) / "requirements.in").open()]
+        (Path(cwd) / "requirements.txt").write_text("".join(f"{name}==1.0\n" for name in names))
+        return MagicMock(returncode=0)
+
+    with patch("marimushka.lockfile.subprocess.run", side_effect=run):
+        yield calls
+
+
+def test_header_digest_only_depends_on_the_header(folder):
+    """Test that the digest changes with the script block, not with the code."""
+    source = (folder / "fibonacci.py").read_text()
+
+    assert header_digest(source + "\nx = 1\n") == header_digest(source)
+    assert header_digest(source.replace("marimo==0.13.15", "marimo==0.14.0")) != header_digest(source)
+
+
+def test_compile_lock(folder, uv):
+    """Test that a lock pins the header, records its digest and respects requires-python."""
+    nb = Notebook(folder / "fibonacci.py")
+    assert lock_status(nb) == "missing"
+
+    lock = compile_lock(nb)
+
+    assert lock == folder / "fibonacci.lock.txt"
+    assert lock.read_text().splitlines() == [
+        f"# marimushka header sha256:{header_digest(nb.path.read_text())}",
+        "marimo==1.0",
+    ]
+    assert lock_status(nb) == "fresh"
+    assert uv[0][:3] == ["uv", "pip", "compile"]
+    assert uv[0][uv[0].index("--python-version") + 1] == "3.12"
+
+
+def test_compile_lock_adds_marimo(tmp_path, uv):
+    """Test that marimo is locked even if the header does not list it."""
+    source = tmp_path / "nb.py"
+    source.write_text('# /// script\n# dependencies = ["polars"]\n# ///\nimport marimo\n')
+
+    lock = compile_lock(Notebook(source))
+
+    assert lock.read_text().splitlines()[1:] == ["polars==1.0", "marimo==1.0"]
+
+
+@pytest.mark.parametrize(
+    ("error", "message"),
+    [
+        (FileNotFoundError("uv"), "uv is needed"),
+        (subprocess.CalledProcessError(1, "uv", stderr="No solution found"), "No solution found"),
+    ],
+)
+def test_compile_lock_errors(folder, error, message):
+    """Test that a missing uv or an unresolvable header is a ValueError and leaves no lock."""
+    nb = Notebook(folder / "fibonacci.py")
+
+    with patch("marimushka.lockfile.subprocess.run", side_effect=error), pytest.raises(ValueError, match=message):
+        compile_lock(nb)
+
+    assert lock_status(nb) == "missing"
+
+
+def test_changed_header_makes_the_lock_stale(folder, uv):
+    """Test that editing the header, but not the code, makes a lock stale."""
+    nb = Notebook(folder / "fibonacci.py")
+    compile_lock(nb)
+
+    nb.path.write_text(nb.path.read_text() + "\n# more code\n")
+    assert lock_status(nb) == "fresh"
+    nb.path.write_text(nb.path.read_text().replace("marimo==0.13.15", "marimo>=0.13"))
+    assert lock_status(nb) == "stale"
+
+
+def test_lock_notebooks_only_renews_outdated_locks(folder, uv):
+    """Test that fresh locks are kept unless upgrading, and each notebook is locked once."""
+    notebooks = [Notebook(folder / "fibonacci.py"), Notebook(folder / "penguins.py")]
+    compile_lock(notebooks[0])
+    uv.clear()
+
+    results = lock_notebooks([*notebooks, Notebook(folder / "penguins.py", Kind.APP)], workers=2)
+
+    assert list(results.values()) == ["fresh", "locked"]
+    assert len(uv) == 1
+    assert list(lock_notebooks(notebooks, upgrade=True).values()) == ["locked", "locked"]
+    assert "--upgrade" in uv[-1]
+
+
+def test_export_installs_from_a_fresh_lock(folder, uv, tmp_path):
+    """Test that an export uses the pinned requirements of a fresh lock, and the sandbox otherwise."""
+    nb = Notebook(folder / "fibonacci.py")
+    compile_lock(nb)
+
+    with patch("subprocess.run") as mock_run:
+        assert nb.export(tmp_path / "site")
+        cmd = mock_run.call_args[0][0]
+        assert cmd[:4] == ["uvx", "--with-requirements", str(lock_path(nb)), "marimo"]
+        assert "--sandbox" not in cmd
+
+        nb.path.write_text(nb.path.read_text().replace("marimo==0.13.15", "marimo>=0.13"))
+        assert nb.export(tmp_path / "site")
+        assert mock_run.call_args[0][0][:5] == ["uvx", "marimo", "export", "html", "--sandbox"]
+
+
+def test_lock_invalidates_cached_exports_and_counts_as_a_change(folder, uv, tmp_path):
+    """Test that renewing a lock changes the export cache key and marks the notebook as changed."""
+    nb = Notebook(folder / "fibonacci.py")
+    cache = ExportCache(tmp_path / "cache")
+    key = cache.key(nb)
+
+    compile_lock(nb)
+
+    assert cache.key(nb) != key
+    assert affected(nb, {lock_path(nb).resolve()})
+
+
+def test_lock_command(folder, uv, tmp_path):
+    """Test that the lock command locks all notebooks, and that --check fails on missing locks."""
+    runner = CliRunner()
+    options = ["--notebooks", str(folder), "--apps", "", "--notebooks-wasm", ""]
+
+    result = runner.invoke(app, ["lock", "--check", *options])
+    assert result.exit_code == 1
+    assert "fibonacci.lock.txt: missing" in result.output
+
+    assert runner.invoke(app, ["lock", *options]).exit_code == 0
+    assert sorted(path.name for path in folder.glob("*.lock.txt")) == ["fibonacci.lock.txt", "penguins.lock.txt"]
+    assert runner.invoke(app, ["lock", "--check", *options]).exit_code == 0
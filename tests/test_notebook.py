@@ -245,3 +245,54 @@ class TestNotebook:
 
             # Assert
             assert result is False
+
+    def test_title_from_docstring(self, resource_dir):
+        """Test that the title is the first line of the module docstring."""
+        notebook = Notebook(resource_dir / "notebooks" / "penguins.py")
+
+        assert notebook.title == "Palmer Penguins Analysis"
+
+    def test_title_fallback(self, tmp_path):
+        """Test that notebooks without a docstring fall back to the display name."""
+        path = tmp_path / "my_notebook.py"
+        path.write_text("import marimo\n")
+
+        assert Notebook(path).title == "my notebook"
+
+    def test_dependencies(self, resource_dir):
+        """Test that the PEP 723 dependencies are returned as canonical names."""
+        notebook = Notebook(resource_dir / "apps" / "charts.py")
+
+        assert notebook.dependencies == ["marimo", "altair", "pandas", "numpy"]
+        assert notebook.script_metadata["requires-python"] == ">=3.12"
+
+    def test_dependencies_without_header(self, tmp_path):
+        """Test that notebooks without a script block have no dependencies."""
+        path = tmp_path / "plain.py"
+        path.write_text("import marimo\n")
+
+        assert Notebook(path).dependencies == []
+
+    def test_data_files(self, tmp_path):
+        """Test that data files are found from notebook_location() chains and public/ paths.
+
+        A notebook naming no data may read any of them.
+        """
+        (tmp_path / "public" / "images").mkdir(parents=True)
+        for name in ("penguins.csv", "other.csv", "images/logo.png", "images/icon.png"):
+            (tmp_path / "public" / name).write_text(name)
+        reader = tmp_path / "reader.py"
+        reader.write_text(
+            "import marimo as mo\n"
+            'df = mo.notebook_location() / "public" / "penguins.csv"\n'
+            'mo.md("![logo](public/images/logo.png)")\n'
+        )
+        dynamic = tmp_path / "dynamic.py"
+        dynamic.write_text("import marimo as mo\nroot = mo.notebook_location()\n")
+        plain = tmp_path / "plain.py"
+        plain.write_text("import marimo\n")
+
+        public = tmp_path / "public"
+        assert Notebook(reader).data_files == [public / "images" / "logo.png", public / "penguins.csv"]
+        assert len(Notebook(dynamic).data_files) == 4
+        assert len(Notebook(plain).data_files) == 4
@@ -0,0 +1,106 @@
+"""Tests for the preload.py module.
+
+This module contains tests for mapping notebook dependencies to Pyodide packages
+and injecting preload hints into exported WASM pages.
+"""
+
+import json
+
+import pytest
+
+from marimushka.export import main
+from marimushka.preload import MARKER, PyodideLock, inject_hints
+
+LOCK = {
+    "info": {"version": "0.27.7"},
+    "packages": {
+        "numpy": {"name": "numpy", "file_name": "numpy-2.0.2-cp312-cp312-pyodide_2024_0_wasm32.whl", "depends": []},
+        "pandas": {
+            "name": "pandas",
+            "file_name": "pandas-2.2.3-cp312-cp312-pyodide_2024_0_wasm32.whl",
+            "depends": ["numpy", "python-dateutil"],
+        },
+        "python-dateutil": {
+            "name": "python-dateutil",
+            "file_name": "python_dateutil-2.9.0-py2.py3-none-any.whl",
+            "depends": [],
+        },
+    },
+}
+
+
+@pytest.fixture
+def lock_file(tmp_path):
+    """Write a small pyodide-lock.json and return its path."""
+    path = tmp_path / "pyodide-lock.json"
+    path.write_text(json.dumps(LOCK))
+    return path
+
+
+class TestPyodideLock:
+    """Tests for the PyodideLock class."""
+
+    def test_from_file(self, lock_file):
+        """Test that the version and the CDN base URL are taken from the lock."""
+        lock = PyodideLock.from_file(lock_file)
+
+        assert lock.version == "0.27.7"
+        assert lock.base_url == "https://cdn.jsdelivr.net/pyodide/v0.27.7/full/"
+
+    def test_from_file_invalid(self, tmp_path):
+        """Test that a file without packages raises a ValueError."""
+        path = tmp_path / "lock.json"
+        path.write_text("{}")
+
+        with pytest.raises(ValueError, match="Not a pyodide-lock.json"):
+            PyodideLock.from_file(path)
+
+    def test_resolve(self, lock_file):
+        """Test that dependencies are resolved transitively and unknown names skipped."""
+        lock = PyodideLock.from_file(lock_file)
+
+        assert lock.resolve(["marimo", "pandas", "altair", "numpy"]) == ["pandas", "numpy", "python-dateutil"]
+
+    def test_hints(self, lock_file):
+        """Test that the runtime and every package get a hint."""
+        lock = PyodideLock.from_file(lock_file, base_url="https://mirror.example/pyodide/")
+
+        hints = lock.hints(["numpy"])
+
+        assert '<link rel="modulepreload" href="https://mirror.example/pyodide/pyodide.mjs" crossorigin>' in hints
+        assert 'href="https://mirror.example/pyodide/pyodide.asm.wasm" as="fetch"' in hints
+        assert "numpy-2.0.2-cp312-cp312-pyodide_2024_0_wasm32.whl" in hints
+        assert "pandas" not in hints
+
+
+def test_inject_hints(tmp_path):
+    """Test that hints go right after <head> and are only injected once."""
+    page = tmp_path / "page.html"
+    page.write_text('<html><head lang="en"><title>x</title></head></html>')
+
+    assert inject_hints(page, "<link>")
+    assert not inject_hints(page, "<link>")
+    assert page.read_text() == f'<html><head lang="en">\n{MARKER}\n<link>\n<title>x</title></head></html>'
+    assert not inject_hints(tmp_path / "missing.html", "<link>")
+
+
+def test_main_with_pyodide_lock(resource_dir, tmp_path, lock_file, fake_export):
+    """Test that WASM exports get hints and static notebooks do not."""
+    # Setup
+    fake_export("<html><head></head><body></body></html>")
+
+    # Execute
+    main(
+        output=tmp_path / "output",
+        notebooks=resource_dir / "notebooks",
+        apps=resource_dir / "apps",
+        notebooks_wasm="",
+        pyodide_lock=lock_file,
+    )
+
+    # Assert
+    charts = (tmp_path / "output" / "apps" / "charts.html").read_text()
+    assert MARKER in charts
+    assert "numpy-2.0.2" in charts
+    assert "pandas-2.2.3" in charts
+    assert MARKER not in (tmp_path / "output" / "notebooks" / "penguins.html").read_text()
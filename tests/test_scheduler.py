@@ -0,0 +1,212 @@
+"""Tests for the scheduler.py module.
+
+This module contains tests for reading the available memory, admitting exports by
+their predicted memory, and measuring the peak memory of running exports.
+"""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from marimushka.export import main
+from marimushka.history import BuildHistory
+from marimushka.notebook import Kind, Notebook
+from marimushka.scheduler import DEFAULT_PEAK, PeakMonitor, available_memory, predicted_peak, run_within_memory
+
+
+@pytest.fixture
+def meminfo(tmp_path):
+    """Return a meminfo file with 8 GiB available."""
+    path = tmp_path / "meminfo"
+    path.write_text("MemTotal:       16777216 kB\nMemFree:         1048576 kB\nMemAvailable:    8388608 kB\n")
+    return path
+
+
+def _notebook(folder, name: str, kind: Kind = Kind.NB) -> Notebook:
+    """Write an empty notebook into a folder and return it."""
+    path = folder / f"{name}.py"
+    path.write_text("import marimo\n")
+    return Notebook(path, kind)
+
+
+def _tracked(counter: dict, name: str, delay: float = 0.05):
+    """Return a task recording how many tasks run at once."""
+
+    def run():
+        with counter["lock"]:
+            counter["running"] += 1
+            counter["max"] = max(counter["max"], counter["running"])
+            counter["order"].append(name)
+        time.sleep(delay)
+        with counter["lock"]:
+            counter["running"] -= 1
+
+    return run
+
+
+@pytest.fixture
+def counter():
+    """Return the shared state of tracked tasks."""
+    return {"lock": threading.Lock(), "running": 0, "max": 0, "order": []}
+
+
+def test_available_memory_from_meminfo(meminfo, tmp_path):
+    """Test that MemAvailable is used when there is no cgroup limit."""
+    assert available_memory(meminfo, tmp_path / "no-cgroup") == 8 << 30
+
+
+def test_available_memory_cgroup_v2(meminfo, tmp_path):
+    """Test that the unused part of a cgroup v2 limit is used when it is lower."""
+    (tmp_path / "memory.max").write_text(f"{2 << 30}\n")
+    (tmp_path / "memory.current").write_text(f"{1 << 30}\n")
+
+    assert available_memory(meminfo, tmp_path) == 1 << 30
+
+
+def test_available_memory_cgroup_without_limit(meminfo, tmp_path):
+    """Test that cgroup files without a limit ("max" in v2, a huge number in v1) are ignored."""
+    (tmp_path / "memory.max").write_text("max\n")
+    (tmp_path / "memory").mkdir()
+    (tmp_path / "memory" / "memory.limit_in_bytes").write_text("9223372036854771712\n")
+
+    assert available_memory(meminfo, tmp_path) == 8 << 30
+
+
+def test_available_memory_cgroup_v1(tmp_path):
+    """Test that a cgroup v1 limit is used, and that a missing meminfo is not an error."""
+    (tmp_path / "memory").mkdir()
+    (tmp_path / "memory" / "memory.limit_in_bytes").write_text(f"{4 << 30}\n")
+    (tmp_path / "memory" / "memory.usage_in_bytes").write_text(f"{1 << 30}\n")
+
+    assert available_memory(tmp_path / "missing", tmp_path) == 3 << 30
+    assert available_memory(tmp_path / "missing", tmp_path / "missing") is None
+
+
+def test_predicted_peak(tmp_path):
+    """Test that a measured peak is preferred over the default of the notebook's kind."""
+    history = BuildHistory(tmp_path / "history.json")
+    nb, app = _notebook(tmp_path, "nb"), _notebook(tmp_path, "app", Kind.APP)
+    history.record(nb, peak_rss=123)
+
+    assert predicted_peak(nb, history) == 123
+    assert predicted_peak(app, history) == DEFAULT_PEAK[Kind.APP]
+
+
+def test_heavy_exports_do_not_overlap(tmp_path, counter):
+    """Test that exports predicted not to fit next to each other run one at a time."""
+    tasks = [(_notebook(tmp_path, str(i)), _tracked(counter, str(i))) for i in range(3)]
+
+    metrics = run_within_memory(tasks, estimate=lambda nb: 600, workers=4, memory=1000)
+
+    assert counter["max"] == 1
+    assert set(metrics) == {nb for nb, _ in tasks}
+    assert all(m["seconds"] > 0 for m in metrics.values())
+
+
+def test_light_exports_run_concurrently(tmp_path, counter):
+    """Test that exports fitting into memory together run at once, up to the number of workers."""
+    tasks = [(_notebook(tmp_path, str(i)), _tracked(counter, str(i), delay=0.2)) for i in range(6)]
+
+    run_within_memory(tasks, estimate=lambda nb: 100, workers=3, memory=1000)
+
+    assert counter["max"] == 3
+
+
+def test_lighter_exports_overtake_a_waiting_heavy_one(tmp_path, counter):
+    """Test that a task that does not fit yet is passed over for a later one that does."""
+    names = ["heavy-1", "heavy-2", "light"]
+    tasks = [(_notebook(tmp_path, name), _tracked(counter, name, delay=0.2)) for name in names]
+    need = {"heavy-1": 700, "heavy-2": 700, "light": 200}
+
+    run_within_memory(tasks, estimate=lambda nb: need[nb.path.stem], workers=4, memory=1000)
+
+    assert counter["order"][:2] == ["heavy-1", "light"]
+
+
+def test_export_larger_than_memory_still_runs(tmp_path, counter):
+    """Test that an export predicted to exceed all memory runs once nothing else is running."""
+    tasks = [(_notebook(tmp_path, str(i)), _tracked(counter, str(i))) for i in range(2)]
+
+    metrics = run_within_memory(tasks, estimate=lambda nb: 5000, workers=2, memory=1000)
+
+    assert len(metrics) == 2
+    assert counter["max"] == 1
+
+
+def test_failing_export_is_raised(tmp_path):
+    """Test that an exception in an export task is not swallowed."""
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        run_within_memory([(_notebook(tmp_path, "nb"), fail)], estimate=lambda nb: 1, memory=1000)
+
+
+def test_peak_monitor_sums_processes_of_an_export(tmp_path):
+    """Test that the resident memory of all processes exporting a notebook is added up."""
+    nb = _notebook(tmp_path, "nb")
+    proc = tmp_path / "proc"
+    for pid, cmdline, rss in [
+        ("10", ["uvx", "marimo", "export", "html", "--sandbox", str(nb.path)], 1000),
+        ("11", ["python", "-m", "marimo", "export", "html", str(nb.path)], 3000),
+        ("12", ["python", "unrelated.py"], 9000),
+    ]:
+        (proc / pid).mkdir(parents=True)
+        (proc / pid / "cmdline").write_bytes(b"\0".join(part.encode() for part in cmdline) + b"\0")
+        (proc / pid / "status").write_text(f"Name:\tpython\nVmRSS:\t{rss} kB\n")
+
+    monitor = PeakMonitor(proc=proc)
+    monitor.watch(nb)
+    monitor.sample()
+
+    assert monitor.unwatch(nb) == 4000 * 1024
+    assert monitor.unwatch(nb) is None
+
+
+def test_main_records_peak_memory(resource_dir, tmp_path):
+    """Test that a measured peak is stored in the build history for the next build."""
+
+    def unwatch(self, notebook):
+        return 256 << 20
+
+    with (
+        patch("marimushka.notebook.Notebook.export", return_value=True),
+        patch.object(PeakMonitor, "unwatch", unwatch),
+    ):
+        main(
+            output=tmp_path / "site",
+            notebooks=resource_dir / "notebooks",
+            apps=None,
+            notebooks_wasm=None,
+            cache_dir=tmp_path / "ci",
+            jobs=2,
+        )
+
+    history = BuildHistory(tmp_path / "ci" / "history.json")
+    nb = Notebook(resource_dir / "notebooks" / "fibonacci.py")
+    assert history.get(nb, "peak_rss") == 256 << 20
+    assert history.get(nb, "seconds") is not None
+
+
+def test_main_rejects_invalid_jobs(resource_dir, tmp_path):
+    """Test that fewer than one job is an error."""
+    with pytest.raises(ValueError, match="jobs"):
+        main(output=tmp_path / "site", notebooks=resource_dir / "notebooks", apps=None, notebooks_wasm=None, jobs=0)
+
+
+def test_main_exports_one_at_a_time_by_default(resource_dir, tmp_path, fake_export):
+    """Test that exports run sequentially unless jobs are given, and concurrent ones share public/ safely."""
+    folders = {"notebooks": resource_dir / "notebooks", "apps": None, "notebooks_wasm": None}
+    fake_export(public={"data.csv": "a,b\n"}, delay=0.05)
+
+    with patch("marimushka.scheduler.run_within_memory", wraps=run_within_memory) as run:
+        main(output=tmp_path / "one", **folders)
+        main(output=tmp_path / "many", jobs=4, **folders)
+
+    assert [c.kwargs["workers"] for c in run.call_args_list] == [1, 4]
+    for site in ("one", "many"):
+        assert (tmp_path / site / "notebooks" / "public" / "data.csv").read_text() == "a,b\n"
+        assert (tmp_path / site / "notebooks" / "fibonacci.html").is_file()
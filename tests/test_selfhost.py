@@ -0,0 +1,143 @@
+"""Tests for the selfhost.py module.
+
+This module contains tests for mirroring the external scripts, stylesheets and
+images of a site into _assets/ and loading them from there.
+"""
+
+import io
+from unittest.mock import patch
+
+import pytest
+
+from marimushka.export import main
+from marimushka.selfhost import AssetMirror, local_name, self_host_assets
+
+LOGO = "https://raw.githubusercontent.com/marimo-team/marimo/main/docs/_static/marimo-logotype-thick.svg"
+RUNTIME = "https://cdn.jsdelivr.net/npm/@marimo-team/frontend@0.1.0/dist/assets"
+
+# A page as marimo exports it: the runtime module and its stylesheet come from jsDelivr
+PAGE = f"""<html><head>
+<script type="module" crossorigin src="{RUNTIME}/index.js"></script>
+<link rel="stylesheet" href="{RUNTIME}/index.css">
+<link rel="preconnect" href="https://cdn.jsdelivr.net">
+</head><body><a href="https://marimo.io">marimo</a></body></html>
+"""
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    """Return a mirror directory with the Tailwind script, the logo and the marimo runtime."""
+    root = tmp_path / "mirror"
+    files = {
+        "cdn.tailwindcss.com/index.js": "/* tailwind */",
+        local_name(LOGO): "<svg></svg>",
+        local_name(f"{RUNTIME}/index.js"): 'import { a } from "./chunk.js";\nimport("../lazy/view.js");',
+        local_name(f"{RUNTIME}/chunk.js"): "export const a = 1;",
+        local_name(RUNTIME.rsplit("/", 1)[0] + "/lazy/view.js"): "export default 2;",
+        local_name(f"{RUNTIME}/index.css"): "@font-face{src:url(fonts/inter.woff2?v=4)}",
+        local_name(f"{RUNTIME}/fonts/inter.woff2?v=4"): "font",
+    }
+    for name, content in files.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_text(content)
+    return root
+
+
+def test_local_name():
+    """Test that URLs map to a path below their host that a static server serves with the right type."""
+    assert local_name(f"{RUNTIME}/index.js") == "cdn.jsdelivr.net/npm/@marimo-team/frontend@0.1.0/dist/assets/index.js"
+    assert local_name("https://example.org/css/", ".css") == "example.org/css/index.css"
+    for url in ("https://example.org/../../etc/passwd", "https://example.org/a/..%2f..", "https://../x", "file:///x"):
+        with pytest.raises(ValueError, match="leaves the asset folder"):
+            local_name(url)
+
+
+def test_self_host_assets(mirror, tmp_path):
+    """Test that the assets of a page, their imports and their fonts are mirrored and loaded locally."""
+    site = tmp_path / "site"
+    (site / "apps").mkdir(parents=True)
+    (site / "apps" / "charts.html").write_text(PAGE)
+
+    mirrored = self_host_assets(site, mirror)
+
+    assert len(mirrored) == 5
+    page = (site / "apps" / "charts.html").read_text()
+    assert 'src="../_assets/cdn.jsdelivr.net/npm/@marimo-team/frontend@0.1.0/dist/assets/index.js"' in page
+    assert 'href="../_assets/cdn.jsdelivr.net/npm/@marimo-team/frontend@0.1.0/dist/assets/index.css"' in page
+    # Links and connection hints are not assets
+    assert 'href="https://marimo.io"' in page
+    assert 'href="https://cdn.jsdelivr.net"' in page
+
+    assets = site / "_assets" / "cdn.jsdelivr.net" / "npm" / "@marimo-team" / "frontend@0.1.0" / "dist"
+    assert (assets / "assets" / "chunk.js").read_text() == "export const a = 1;"
+    assert (assets / "lazy" / "view.js").exists()
+    # The query string of the font is part of its file name, which the stylesheet now refers to
+    font = local_name(f"{RUNTIME}/fonts/inter.woff2?v=4").rsplit("/", 1)[-1]
+    assert (assets / "assets" / "index.css").read_text() == f"@font-face{{src:url(fonts/{font})}}"
+    assert (assets / "assets" / "fonts" / font).read_text() == "font"
+
+
+def test_missing_assets_stay_remote(mirror, tmp_path):
+    """Test that a page keeps loading an asset the mirror does not have from its CDN."""
+    site = tmp_path / "site"
+    site.mkdir()
+    (site / "index.html").write_text('<img src="https://example.org/missing.png">')
+
+    assert self_host_assets(site, mirror) == {}
+    assert (site / "index.html").read_text() == '<img src="https://example.org/missing.png">'
+
+
+def test_urls_leaving_the_asset_folder_stay_remote(mirror, tmp_path):
+    """Test that a URL with ".." segments is neither fetched nor written outside _assets/."""
+    site = tmp_path / "site"
+    site.mkdir()
+    page = '<script src="https://example.org/../../../escaped.js"></script>'
+    (site / "index.html").write_text(page)
+
+    with patch("marimushka.selfhost.AssetMirror.fetch") as fetch:
+        assert self_host_assets(site, mirror) == {}
+
+    fetch.assert_not_called()
+    assert (site / "index.html").read_text() == page
+
+
+def test_downloads_are_cached(tmp_path):
+    """Test that an asset is downloaded once and then taken from the marimushka cache."""
+    site = tmp_path / "site"
+    site.mkdir()
+    (site / "index.html").write_text('<script src="//cdn.example.org/lib.js"></script>')
+
+    with patch("urllib.request.urlopen", return_value=io.BytesIO(b"lib")) as urlopen:
+        self_host_assets(site)
+        (site / "index.html").write_text('<script src="//cdn.example.org/lib.js"></script>')
+        self_host_assets(site)
+
+    urlopen.assert_called_once()
+    assert urlopen.call_args.args[0].full_url == "https://cdn.example.org/lib.js"
+    assert (site / "index.html").read_text() == '<script src="_assets/cdn.example.org/lib.js"></script>'
+
+
+def test_mirror_must_be_a_directory(tmp_path):
+    """Test that a missing mirror directory is an error."""
+    with pytest.raises(ValueError, match="not a directory"):
+        AssetMirror(tmp_path / "missing")
+
+
+def test_main_self_hosts_the_template_assets(resource_dir, mirror, tmp_path, fake_export):
+    """Test that the index loads Tailwind and the logo from the site, and the exports their runtime."""
+    fake_export(PAGE)
+    site = tmp_path / "site"
+    folders = {"notebooks": resource_dir / "notebooks", "apps": resource_dir / "apps", "notebooks_wasm": None}
+
+    html = main(output=site, self_host_assets=True, asset_mirror=mirror, **folders)
+
+    assert "https://" not in "".join(line for line in html.splitlines() if "src=" in line)
+    assert 'src="_assets/cdn.tailwindcss.com/index.js"' in html
+    assert (site / "_assets" / "cdn.tailwindcss.com" / "index.js").read_text() == "/* tailwind */"
+    assert f'src="../_assets/{local_name(f"{RUNTIME}/index.js")}"' in (site / "apps" / "charts.html").read_text()
+
+
+def test_asset_mirror_needs_self_hosting(resource_dir, mirror, tmp_path):
+    """Test that a mirror without self-hosting is rejected before anything is exported."""
+    with pytest.raises(ValueError, match="self-hosting"):
+        main(output=tmp_path / "site", notebooks=resource_dir / "notebooks", asset_mirror=mirror)
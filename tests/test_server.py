@@ -0,0 +1,121 @@
+"""Tests for the server.py module.
+
+This module contains tests for the preview server: lazy exports, ETags, byte ranges
+and compressed variants.
+"""
+
+import gzip
+import os
+import shutil
+import threading
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+import pytest
+
+from marimushka.server import PreviewSite, _byte_range, make_server
+
+
+@pytest.fixture
+def project(resource_dir, tmp_path):
+    """Copy the notebooks into a project folder whose sources the tests can touch."""
+    shutil.copytree(resource_dir / "notebooks", tmp_path / "notebooks")
+    (tmp_path / "notebooks" / "public" / "data.csv").write_text("x,y\n" + "1,2\n" * 1000)
+    return tmp_path
+
+
+@pytest.fixture
+def exports(fake_export):
+    """Record exports instead of running marimo, writing a large page per notebook."""
+    return fake_export(lambda nb: f"<html>{nb.path.stem}</html>" + " " * 4096)
+
+
+@pytest.fixture
+def server(project, resource_dir, exports):
+    """Run a preview server for the project on a free port."""
+    site = PreviewSite(
+        output=project / "_preview",
+        template=resource_dir / "templates" / "tailwind.html.j2",
+        notebooks=project / "notebooks",
+        apps=None,
+        notebooks_wasm=None,
+    )
+    httpd = make_server(site, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _get(url, **headers):
+    """Send a GET request and return the response, also for error statuses."""
+    try:
+        return urllib.request.urlopen(urllib.request.Request(url, headers=headers))
+    except urllib.error.HTTPError as e:
+        return e
+
+
+def test_index_needs_no_export(server, exports):
+    """Test that the index is rendered from discovery without exporting anything."""
+    response = _get(f"{server}/")
+    assert response.status == 200
+    assert "notebooks/fibonacci.html" in response.read().decode()
+    assert exports == []
+
+
+def test_notebook_is_exported_once_and_again_after_a_change(server, exports, project):
+    """Test that a notebook is exported on first request and re-exported when its source changes."""
+    assert _get(f"{server}/notebooks/fibonacci.html").status == 200
+    assert _get(f"{server}/notebooks/fibonacci.html").status == 200
+    assert exports == ["fibonacci.py"]
+
+    source = project / "notebooks" / "fibonacci.py"
+    newer = (project / "_preview" / "notebooks" / "fibonacci.html").stat().st_mtime + 10
+    os.utime(source, (newer, newer))
+    assert _get(f"{server}/notebooks/fibonacci.html").status == 200
+    assert exports == ["fibonacci.py", "fibonacci.py"]
+
+
+def test_failed_export(server):
+    """Test that a failing export is reported as a bad gateway."""
+    with patch("marimushka.notebook.Notebook.export", return_value=False):
+        assert _get(f"{server}/notebooks/penguins.html").status == 502
+
+
+def test_missing_file_and_traversal(server):
+    """Test that unknown paths and paths outside the site are not found."""
+    assert _get(f"{server}/notebooks/missing.html").status == 404
+    assert _get(f"{server}/notebooks/..%2f..%2fconftest.py").status == 404
+
+
+def test_etag_and_not_modified(server):
+    """Test that a matching If-None-Match is answered with 304."""
+    etag = _get(f"{server}/notebooks/public/data.csv").headers["ETag"]
+    assert _get(f"{server}/notebooks/public/data.csv", **{"If-None-Match": etag}).status == 304
+
+
+def test_range_request(server, project):
+    """Test that byte ranges of public data are served from the source folder before an export."""
+    response = _get(f"{server}/notebooks/public/data.csv", Range="bytes=0-3")
+    assert response.status == 206
+    assert response.headers["Content-Range"] == f"bytes 0-3/{(project / 'notebooks/public/data.csv').stat().st_size}"
+    assert response.read() == b"x,y\n"
+    assert _get(f"{server}/notebooks/public/data.csv", Range="bytes=99999-").status == 416
+    assert not list((project / "notebooks" / "public").glob("*.gz"))
+
+
+def test_gzip_variant(server):
+    """Test that exports are sent gzip-compressed when the client accepts it."""
+    response = _get(f"{server}/notebooks/penguins.html", **{"Accept-Encoding": "gzip, deflate"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.read()).startswith(b"<html>penguins</html>")
+
+
+def test_byte_range():
+    """Test parsing of Range headers."""
+    assert _byte_range("bytes=0-99", 50) == (0, 49)
+    assert _byte_range("bytes=0-9,20-29", 50) is None
+    with pytest.raises(ValueError, match="Unsatisfiable"):
+        _byte_range("bytes=60-", 50)
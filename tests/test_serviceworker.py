@@ -0,0 +1,91 @@
+"""Tests for the serviceworker.py module.
+
+This module contains tests for the generated service worker and its precache manifest.
+"""
+
+import json
+from unittest.mock import patch
+
+from marimushka.export import main
+from marimushka.fingerprint import HEADERS
+from marimushka.serviceworker import (
+    PRECACHE_MANIFEST,
+    SERVICE_WORKER,
+    build_service_worker,
+    digest_tree,
+    precache_manifest,
+)
+
+
+def test_digest_tree_skips_hidden_files(tmp_path):
+    """Test that every visible file is hashed and hidden files are skipped."""
+    # Setup
+    (tmp_path / "apps").mkdir()
+    (tmp_path / "apps" / "charts.html").write_text("charts")
+    (tmp_path / ".nojekyll").touch()
+
+    # Execute
+    digests = digest_tree(tmp_path)
+
+    # Assert
+    assert list(digests) == ["apps/charts.html"]
+    assert len(digests["apps/charts.html"]) == 64
+
+
+def test_revision_follows_content():
+    """Test that a changed file gets a new revision and the worker source changes with it."""
+    before = precache_manifest({"apps/charts.html": "a" * 64, "index.html": "b" * 64})
+    after = precache_manifest({"apps/charts.html": "c" * 64, "index.html": "b" * 64})
+
+    assert before[0]["revision"] != after[0]["revision"]
+    assert before[1] == after[1]
+    assert build_service_worker(before) != build_service_worker(after)
+
+
+def test_build_service_worker_embeds_manifest():
+    """Test that the manifest and the runtime hosts are embedded in the worker."""
+    manifest = precache_manifest({"index.html": "b" * 64})
+
+    source = build_service_worker(manifest)
+
+    assert json.dumps(manifest, separators=(",", ":")) in source
+    assert "cdn.jsdelivr.net" in source
+    assert "__MANIFEST__" not in source
+
+
+@patch("marimushka.notebook.Notebook.export")
+def test_main_with_service_worker(mock_export, resource_dir, tmp_path):
+    """Test that main writes the worker and manifest and registers the worker."""
+    # Setup
+    (tmp_path / "apps" / "assets").mkdir(parents=True)
+    (tmp_path / "apps" / "assets" / "index-4f2a.js").write_text("runtime")
+
+    # Execute
+    html = main(
+        output=tmp_path,
+        notebooks=resource_dir / "notebooks",
+        apps="",
+        notebooks_wasm="",
+        service_worker=True,
+    )
+
+    # Assert
+    assert f'navigator.serviceWorker.register("{SERVICE_WORKER}")' in html
+    manifest = {entry["url"]: entry for entry in json.loads((tmp_path / PRECACHE_MANIFEST).read_text())}
+    assert set(manifest) == {"index.html", "apps/assets/index-4f2a.js"}
+    assert manifest["index.html"]["precache"]
+    assert manifest["apps/assets/index-4f2a.js"]["precache"]
+    assert (tmp_path / SERVICE_WORKER).read_text().startswith("// Generated by marimushka")
+
+
+def test_rebuild_keeps_the_worker(resource_dir, tmp_path, fake_export):
+    """Test that two identical builds write byte-identical workers and manifests, without server configuration."""
+    fake_export()
+    folders = {"notebooks": resource_dir / "notebooks", "apps": resource_dir / "apps", "notebooks_wasm": None}
+
+    main(output=tmp_path / "site", service_worker=True, fingerprint=True, **folders)
+    first = {name: (tmp_path / "site" / name).read_bytes() for name in (SERVICE_WORKER, PRECACHE_MANIFEST)}
+    main(output=tmp_path / "site", service_worker=True, fingerprint=True, **folders)
+
+    assert {name: (tmp_path / "site" / name).read_bytes() for name in first} == first
+    assert HEADERS not in {entry["url"] for entry in json.loads(first[PRECACHE_MANIFEST])}
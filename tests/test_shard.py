@@ -0,0 +1,175 @@
+"""Tests for the shard.py and history.py modules.
+
+This module contains tests for splitting an export over several runners, merging
+the shard directories, and the build history that balances the shards.
+"""
+
+import json
+
+import pytest
+
+from marimushka.export import main, merge
+from marimushka.history import BuildHistory
+from marimushka.notebook import Kind, Notebook, folder2notebooks
+from marimushka.shard import SHARD_MANIFEST, layout_digest, merge_shards, parse_shard, partition, write_manifest
+
+
+@pytest.fixture
+def exports(fake_export):
+    """Record exports instead of running marimo, writing a page and a shared public/ file per notebook."""
+    return fake_export(public={"shared.csv": "x,y\n1,2\n"})
+
+
+def _notebooks(resource_dir):
+    """Return all notebooks of the test resources as one list."""
+    return [
+        *folder2notebooks(resource_dir / "notebooks", kind=Kind.NB),
+        *folder2notebooks(resource_dir / "apps", kind=Kind.APP),
+    ]
+
+
+def test_parse_shard():
+    """Test that shard selectors are parsed and invalid ones rejected."""
+    assert parse_shard(" 3 / 4 ") == (3, 4)
+    for spec in ("0/2", "3/2", "1", "a/b", "1/0"):
+        with pytest.raises(ValueError, match="Invalid shard"):
+            parse_shard(spec)
+
+
+class TestPartition:
+    """Tests for the partition function."""
+
+    def test_deterministic_and_complete(self, resource_dir):
+        """Test that the partition covers every notebook once and ignores discovery order."""
+        notebooks = _notebooks(resource_dir)
+
+        shards = partition(notebooks, 2)
+
+        assert sorted(map(BuildHistory.key, (nb for shard in shards for nb in shard))) == sorted(
+            map(BuildHistory.key, notebooks)
+        )
+        assert partition(list(reversed(notebooks)), 2) == shards
+        assert layout_digest(partition(list(reversed(notebooks)), 2)) == layout_digest(shards)
+
+    def test_balanced_by_cost(self, tmp_path):
+        """Test that expensive notebooks are spread over the shards and unknown ones cost the median."""
+        for name in "abcdef":
+            (tmp_path / f"{name}.py").write_text("import marimo")
+        notebooks = [Notebook(tmp_path / f"{name}.py") for name in "abcdef"]
+        costs = {"a": 60.0, "b": 50.0, "c": 10.0, "d": 10.0, "e": 10.0, "f": None}
+
+        shards = partition(notebooks, 2, cost=lambda nb: costs[nb.path.stem])
+
+        totals = sorted(sum(costs[nb.path.stem] or 10.0 for nb in shard) for shard in shards)
+        assert totals == [70.0, 80.0]
+        assert {nb.path.stem for nb in shards[0]} >= {"a"}
+        assert {nb.path.stem for nb in shards[1]} >= {"b"}
+
+    def test_more_shards_than_notebooks(self, resource_dir):
+        """Test that surplus shards are empty."""
+        shards = partition(_notebooks(resource_dir), 5)
+
+        assert [len(shard) for shard in shards] == [1, 1, 1, 0, 0]
+
+
+def test_history_round_trip(resource_dir, tmp_path):
+    """Test that recorded measurements survive a reload."""
+    nb = Notebook(resource_dir / "notebooks" / "fibonacci.py")
+    history = BuildHistory(tmp_path / "history.json")
+    history.record(nb, seconds=4.2)
+    history.update({"app:elsewhere.py": {"seconds": 1.0}})
+    history.save()
+
+    reloaded = BuildHistory(tmp_path / "history.json")
+
+    assert reloaded.get(nb, "seconds") == 4.2
+    assert reloaded.get(nb, "peak_rss") is None
+    assert reloaded.get(Notebook(resource_dir / "apps" / "charts.py", Kind.APP), "seconds") is None
+
+
+class TestMergeShards:
+    """Tests for the merge_shards function."""
+
+    @staticmethod
+    def _shard(root, spec, files, layout="layout"):
+        """Write a shard directory with the given files and a manifest."""
+        root.mkdir(parents=True)
+        for name, content in files.items():
+            (root / name).parent.mkdir(parents=True, exist_ok=True)
+            (root / name).write_text(content)
+        write_manifest(root, spec, layout, {})
+        return root
+
+    def test_identical_duplicates_are_merged(self, tmp_path):
+        """Test that files present in several shards with the same content are copied once."""
+        a = self._shard(tmp_path / "a", "1/2", {"notebooks/a.html": "a", "notebooks/public/x.csv": "x"})
+        b = self._shard(tmp_path / "b", "2/2", {"notebooks/b.html": "b", "notebooks/public/x.csv": "x"})
+
+        merge_shards([a, b], tmp_path / "site")
+
+        assert sorted(p.relative_to(tmp_path / "site").as_posix() for p in (tmp_path / "site").rglob("*.*")) == [
+            "notebooks/a.html",
+            "notebooks/b.html",
+            "notebooks/public/x.csv",
+        ]
+
+    def test_collision(self, tmp_path):
+        """Test that a file with different contents in two shards fails the merge before copying."""
+        a = self._shard(tmp_path / "a", "1/2", {"notebooks/public/x.csv": "x"})
+        b = self._shard(tmp_path / "b", "2/2", {"notebooks/public/x.csv": "y"})
+
+        with pytest.raises(ValueError, match=r"disagree on 1 files: notebooks/public/x.csv"):
+            merge_shards([a, b], tmp_path / "site")
+        assert not (tmp_path / "site").exists()
+
+    def test_incomplete_or_inconsistent(self, tmp_path):
+        """Test that missing shards, foreign directories and different partitions are refused."""
+        a = self._shard(tmp_path / "a", "1/3", {})
+        b = self._shard(tmp_path / "b", "2/3", {})
+        c = self._shard(tmp_path / "c", "3/3", {}, layout="other")
+        (tmp_path / "plain").mkdir()
+
+        with pytest.raises(ValueError, match="Incomplete set of shards"):
+            merge_shards([a, b], tmp_path / "site")
+        with pytest.raises(ValueError, match="partitioned differently"):
+            merge_shards([a, b, c], tmp_path / "site")
+        with pytest.raises(ValueError, match="was not written by"):
+            merge_shards([a, tmp_path / "plain"], tmp_path / "site")
+        with pytest.raises(ValueError, match="not found"):
+            merge_shards([tmp_path / "missing"], tmp_path / "site")
+        with pytest.raises(ValueError, match="No shard directories"):
+            merge_shards([], tmp_path / "site")
+
+
+def test_sharded_build(resource_dir, tmp_path, exports):
+    """Test that two shards export disjoint halves and merge into a complete site."""
+    # Setup
+    template = resource_dir / "templates" / "tailwind.html.j2"
+    folders = {"notebooks": resource_dir / "notebooks", "apps": resource_dir / "apps", "notebooks_wasm": None}
+
+    # Execute
+    for i in (1, 2):
+        assert main(output=tmp_path / f"shard-{i}", template=template, shard=f"{i}/2", **folders) == ""
+    first, second = exports[:2], exports[2:]
+    html = merge([tmp_path / "shard-1", tmp_path / "shard-2"], output=tmp_path / "site", template=template, **folders)
+
+    # Assert
+    assert sorted(exports) == ["charts.py", "fibonacci.py", "penguins.py"]
+    assert first and second and not set(first) & set(second)
+    assert not (tmp_path / "shard-1" / "index.html").exists()
+    assert not (tmp_path / "site" / SHARD_MANIFEST).exists()
+    for page in ("notebooks/fibonacci.html", "notebooks/penguins.html", "apps/charts.html"):
+        assert page in html
+        assert (tmp_path / "site" / page).is_file()
+
+    # The merged timings are in the history, so the next partition is weighted by them
+    manifest = json.loads((tmp_path / "shard-1" / SHARD_MANIFEST).read_text())
+    history = BuildHistory()
+    for key in manifest["notebooks"]:
+        assert key in history._entries
+
+
+def test_shard_rejects_archive(resource_dir, tmp_path):
+    """Test that a shard cannot be written to an archive."""
+    with pytest.raises(ValueError, match="cannot be written to an archive"):
+        main(output=tmp_path, notebooks=resource_dir / "notebooks", shard="1/2", archive=tmp_path / "site.zip")
@@ -0,0 +1,80 @@
+"""Start-up benchmark for the command line interface.
+
+This module checks that the CLI module and `marimushka version` do not load the
+modules that are only needed to build a site. The budgets for the import time of
+marimushka.export and the wall time of fast commands depend on the machine, so they
+are only checked when the MARIMUSHKA_BENCHMARK environment variable is set.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import pytest
+
+# Budgets are generous multiples of a local run, they catch regressions rather than noise
+IMPORT_BUDGET_MS = 400
+VERSION_BUDGET_MS = 1500
+RUNS = 5
+
+# Timing assertions are opt-in, shared CI runners are too noisy for them
+benchmark = pytest.mark.skipif(not os.environ.get("MARIMUSHKA_BENCHMARK"), reason="set MARIMUSHKA_BENCHMARK to run")
+
+# Modules the export path needs, which must not be loaded just to show the version or help
+DEFERRED = ("jinja2", "loguru", "rich", "marimushka.archive", "marimushka.tailwind", "marimushka.templating")
+
+
+def _importtime(module: str) -> dict[str, int]:
+    """Import a module in a fresh interpreter and return the cumulative import time (µs) per module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_does_not_import_build_dependencies():
+    """Test that importing the CLI module leaves the build dependencies unloaded."""
+    times = _importtime("marimushka.export")
+    assert "marimushka.export" in times
+    assert [name for name in DEFERRED if name in times] == []
+
+
+def test_version_does_not_import_build_dependencies():
+    """Test that showing the version leaves marimo and the build dependencies unloaded."""
+    code = (
+        "import sys\n"
+        "from marimushka.export import app\n"
+        "app(['version'], standalone_mode=False)\n"
+        f"print(sorted(name for name in {('marimo', *DEFERRED)!r} if name in sys.modules), file=sys.stderr)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert "version" in result.stdout
+    assert result.stderr.strip() == "[]"
+
+
+@benchmark
+def test_import_time_budget():
+    """Test that the median import time of the CLI module stays within its budget."""
+    median = statistics.median(_importtime("marimushka.export")["marimushka.export"] for _ in range(RUNS)) / 1000
+    assert median < IMPORT_BUDGET_MS, f"marimushka.export imports in {median:.1f} ms"
+
+
+@benchmark
+@pytest.mark.parametrize("args", [["version"], ["--help"]])
+def test_wall_time_budget(args):
+    """Test that the median wall time of fast CLI commands stays within its budget."""
+    durations = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run(["marimushka", *args], capture_output=True, check=True)
+        durations.append(time.perf_counter() - start)
+    median = statistics.median(durations) * 1000
+    assert median < VERSION_BUDGET_MS, f"marimushka {' '.join(args)} takes {median:.1f} ms"
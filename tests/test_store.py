@@ -0,0 +1,294 @@
+"""Tests for the store.py module.
+
+This module contains tests for the shared export cache, including several processes
+exporting the same notebooks into one cache directory at once.
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from typer.testing import CliRunner
+
+from marimushka.export import app, main
+from marimushka.notebook import Kind, Notebook
+from marimushka.store import LOCK_SUFFIX, MARKER_SUFFIX, ExportCache, FileLock
+
+# Files marimo copies next to the exported pages
+PUBLIC = {"data.csv": "x\n1\n"}
+
+
+def _build(root: str, notebooks: str, output: str) -> None:
+    """Export all notebooks of a folder through the shared cache, run in a separate process."""
+    cache = ExportCache(root)
+    for source in sorted(Path(notebooks).glob("*.py")):
+        assert cache.export(Notebook(source), Path(output))
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork to share the patched export with the workers")
+def test_concurrent_builders_export_each_notebook_once(resource_dir, tmp_path, fake_export):
+    """Test that builders running at once wait for each other instead of exporting twice."""
+    # Setup
+    root, log = tmp_path / "cache", tmp_path / "exports.log"
+    fake_export(public=PUBLIC, log=log, delay=0.5)
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=_build, args=(root, resource_dir / "notebooks", tmp_path / f"site-{i}"))
+        for i in range(4)
+    ]
+
+    # Execute
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+
+    # Assert
+    assert [worker.exitcode for worker in workers] == [0, 0, 0, 0]
+    exported = sorted(line.split()[1] for line in log.read_text().splitlines())
+    assert exported == ["fibonacci.py", "penguins.py"]
+    for i in range(4):
+        assert (tmp_path / f"site-{i}" / "penguins.html").read_text() == "<html>penguins</html>"
+        assert (tmp_path / f"site-{i}" / "public" / "penguins.csv").is_file()
+    assert not list(root.rglob(f"*{MARKER_SUFFIX}"))
+    assert not list(root.rglob("*.tmp"))
+
+
+def test_key_depends_on_source_and_kind(resource_dir, tmp_path):
+    """Test that the key changes with the notebook source and the kind of export."""
+    source = tmp_path / "nb.py"
+    source.write_text("import marimo\n")
+    cache = ExportCache(tmp_path / "cache")
+    key = cache.key(Notebook(source))
+
+    assert cache.key(Notebook(source)) == key
+    assert cache.key(Notebook(source, Kind.APP)) != key
+    source.write_text("import marimo\n# changed\n")
+    assert cache.key(Notebook(source)) != key
+
+
+def test_key_depends_on_the_marimo_version(tmp_path):
+    """Test that the key changes with the version of marimo the export command runs."""
+    source = tmp_path / "nb.py"
+    source.write_text("import marimo\n")
+    cache = ExportCache(tmp_path / "cache")
+
+    with patch("marimushka.store._tool_version", return_value="0.13.0") as version:
+        key = cache.key(Notebook(source))
+    with patch("marimushka.store._tool_version", return_value="0.14.0"):
+        assert cache.key(Notebook(source)) != key
+
+    version.assert_called_with("uvx", "marimo")
+
+
+def test_notebooks_with_the_same_source_get_their_own_exports(tmp_path, fake_export):
+    """Test that a copy of a notebook under another name is exported, not served the entry of the original."""
+    (tmp_path / "nb").mkdir()
+    for name in ("a.py", "b.py"):
+        (tmp_path / "nb" / name).write_text("import marimo\n")
+    cache = ExportCache(tmp_path / "cache")
+
+    fake_export(public=PUBLIC)
+    for name in ("a.py", "b.py"):
+        assert cache.export(Notebook(tmp_path / "nb" / name), tmp_path / "site")
+
+    assert sorted(p.name for p in (tmp_path / "site").glob("*.html")) == ["a.html", "b.html"]
+
+
+def test_entry_without_the_page_is_not_a_hit(tmp_path):
+    """Test that an entry that does not hold the page of the notebook is not reported as exported."""
+    source = tmp_path / "nb.py"
+    source.write_text("import marimo\n")
+    cache = ExportCache(tmp_path / "cache")
+    cache.entry(cache.key(Notebook(source))).mkdir(parents=True)
+
+    assert not cache.export(Notebook(source), tmp_path / "site")
+
+
+def test_failed_export_is_not_published(resource_dir, tmp_path):
+    """Test that a failed export leaves no entry, so the next build tries again."""
+    cache = ExportCache(tmp_path / "cache")
+    nb = Notebook(resource_dir / "notebooks" / "fibonacci.py")
+
+    with patch("marimushka.notebook.Notebook.export", return_value=False):
+        assert not cache.export(nb, tmp_path / "site")
+
+    assert not cache.entry(cache.key(nb)).exists()
+    assert not list((tmp_path / "cache").rglob(f"*{MARKER_SUFFIX}"))
+
+
+def test_leftovers_of_an_interrupted_export_are_removed(resource_dir, tmp_path, fake_export):
+    """Test that a marker without a lock holder counts as a crashed builder and is cleaned up."""
+    # Setup: a builder died after creating its marker and temporary directory
+    cache = ExportCache(tmp_path / "cache")
+    nb = Notebook(resource_dir / "notebooks" / "fibonacci.py")
+    entry = cache.entry(cache.key(nb))
+    leftover = entry.with_name(f".{entry.name}.dead.tmp")
+    leftover.mkdir(parents=True)
+    marker = entry.with_name(entry.name + MARKER_SUFFIX)
+    marker.write_text(json.dumps({"host": "elsewhere", "pid": 1, "tmp": leftover.name}))
+    fake_export(public=PUBLIC)
+
+    # Execute
+    assert cache.export(nb, tmp_path / "site")
+
+    # Assert
+    assert not leftover.exists()
+    assert not marker.exists()
+    assert (entry / "fibonacci.html").is_file()
+
+
+def test_gives_up_waiting(resource_dir, tmp_path, fake_export):
+    """Test that a builder exports itself when another holds the lock for too long."""
+    cache = ExportCache(tmp_path / "cache", wait=0.2)
+    nb = Notebook(resource_dir / "notebooks" / "fibonacci.py")
+    entry = cache.entry(cache.key(nb))
+    fake_export(public=PUBLIC)
+
+    with FileLock(entry.with_name(entry.name + LOCK_SUFFIX)):
+        assert cache.export(nb, tmp_path / "site")
+
+    assert (tmp_path / "site" / "fibonacci.html").is_file()
+    assert not entry.exists()
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    """Test that a held lock cannot be taken a second time until it is released."""
+    first, second = FileLock(tmp_path / "x.lock"), FileLock(tmp_path / "x.lock")
+
+    assert first.acquire(timeout=0)
+    assert not second.acquire(timeout=0.2)
+    first.release()
+    assert second.acquire(timeout=0)
+    second.release()
+
+
+def test_main_reuses_exports(resource_dir, tmp_path, fake_export):
+    """Test that a second build with the same export cache exports nothing."""
+    folders = {"notebooks": resource_dir / "notebooks", "apps": resource_dir / "apps", "notebooks_wasm": None}
+
+    exported = fake_export(public=PUBLIC)
+    main(output=tmp_path / "first", export_cache=tmp_path / "cache", **folders)
+    main(output=tmp_path / "second", export_cache=tmp_path / "cache", **folders)
+
+    assert len(exported) == 3
+    assert (tmp_path / "second" / "apps" / "charts.html").read_text() == "<html>charts</html>"
+
+
+def test_main_with_cache_dir(resource_dir, tmp_path, fake_export):
+    """Test that a cache directory holds the exports and is the uv cache of the export subprocesses."""
+    seen = []
+
+    def page(nb):
+        seen.append(os.environ.get("UV_CACHE_DIR"))
+        return f"<html>{nb.path.stem}</html>"
+
+    fake_export(page, public=PUBLIC)
+    main(
+        output=tmp_path / "site",
+        notebooks=resource_dir / "notebooks",
+        apps=None,
+        notebooks_wasm=None,
+        cache_dir=tmp_path / "ci",
+    )
+
+    assert seen == [str(tmp_path / "ci" / "uv")] * 2
+    assert len(list((tmp_path / "ci" / "exports").glob("*/*/fibonacci.html"))) == 1
+    assert (tmp_path / "ci" / "history.json").is_file()
+    assert os.environ.get("UV_CACHE_DIR") != str(tmp_path / "ci" / "uv")
+
+
+def test_data_refresh_reexports_only_affected_notebooks(resource_dir, tmp_path, fake_export):
+    """Test that changing a data file re-exports the notebooks that may read it, and nothing else."""
+    shutil.copytree(resource_dir / "notebooks", tmp_path / "notebooks")
+    other = 'import marimo as mo\nf = mo.notebook_location() / "public" / "x.csv"\n'
+    (tmp_path / "notebooks" / "other.py").write_text(other)
+    folders = {"notebooks": tmp_path / "notebooks", "apps": None, "notebooks_wasm": None}
+
+    exported = fake_export(public=PUBLIC)
+    main(output=tmp_path / "site", export_cache=tmp_path / "cache", **folders)
+    (tmp_path / "notebooks" / "public" / "penguins.csv").write_text("species\nAdelie\n")
+    main(output=tmp_path / "site", export_cache=tmp_path / "cache", **folders)
+
+    # fibonacci.py names no data, so it may read penguins.csv; other.py reads only x.csv
+    assert sorted(exported) == ["fibonacci.py", "fibonacci.py", "other.py", "penguins.py", "penguins.py"]
+
+
+def test_shared_public_folder_is_never_served_stale(tmp_path):
+    """Test that a cache hit copies the public/ folder as it is now, not as it was when the entry was made."""
+    apps = tmp_path / "apps"
+    (apps / "public").mkdir(parents=True)
+    (apps / "public" / "logo.png").write_text("v1")
+    (apps / "reader.py").write_text('import marimo as mo\nmo.md("![logo](public/logo.png)")\n')
+    (apps / "other.py").write_text('import marimo as mo\nmo.md("![data](public/data.csv)")\n')
+    cache = ExportCache(tmp_path / "cache")
+    site = tmp_path / "site"
+
+    def export(self, output_dir):
+        output_dir.mkdir(parents=True, exist_ok=True)
+        (output_dir / f"{self.path.stem}.html").write_text(self.path.stem)
+        shutil.copytree(self.path.parent / "public", output_dir / "public", dirs_exist_ok=True)
+        return True
+
+    with patch("marimushka.notebook.Notebook.export", export):
+        for name in ("reader.py", "other.py"):
+            assert cache.export(Notebook(apps / name), site)
+        (apps / "public" / "logo.png").write_text("v2")
+        for name in ("reader.py", "other.py"):
+            assert cache.export(Notebook(apps / name), site)
+
+    assert (site / "public" / "logo.png").read_text() == "v2"
+    assert not list(cache.root.rglob("logo.png"))
+
+
+def test_prune_removes_entries_no_build_used(resource_dir, tmp_path, fake_export):
+    """Test that pruning keeps the entries a build used recently, also those it only read from the cache."""
+    # Setup: two entries made long ago, one of which the last build took from the cache
+    fake_export(public=PUBLIC)
+    cache = ExportCache(tmp_path / "cache")
+    used, unused = (Notebook(resource_dir / "notebooks" / name) for name in ("fibonacci.py", "penguins.py"))
+    for nb in (used, unused):
+        assert cache.export(nb, tmp_path / "site")
+        os.utime(cache.entry(cache.key(nb)), (1_000_000, 1_000_000))
+    assert cache.export(used, tmp_path / "site")
+
+    # Execute
+    removed = cache.prune(max_age=3600)
+
+    # Assert
+    assert removed == [cache.entry(cache.key(unused))]
+    assert cache.contains(used)
+    assert not cache.contains(unused)
+    assert not list(cache.root.rglob("*.tmp"))
+    with pytest.raises(ValueError, match="negative"):
+        cache.prune(max_age=-1)
+
+
+def test_prune_keeps_locked_entries(resource_dir, tmp_path, fake_export):
+    """Test that an entry a builder holds the lock of is not pruned."""
+    fake_export(public=PUBLIC)
+    cache = ExportCache(tmp_path / "cache")
+    nb = Notebook(resource_dir / "notebooks" / "fibonacci.py")
+    assert cache.export(nb, tmp_path / "site")
+    entry = cache.entry(cache.key(nb))
+
+    with FileLock(entry.with_name(entry.name + LOCK_SUFFIX)):
+        assert cache.prune(max_age=0) == []
+    assert cache.prune(max_age=0) == [entry]
+
+
+def test_prune_command(resource_dir, tmp_path, fake_export):
+    """Test that the prune command clears the exports in the cache directory of a build."""
+    fake_export(public=PUBLIC)
+    folders = {"notebooks": resource_dir / "notebooks", "apps": None, "notebooks_wasm": None}
+    main(output=tmp_path / "site", cache_dir=tmp_path / "ci", **folders)
+
+    result = CliRunner().invoke(app, ["prune", "--cache-dir", str(tmp_path / "ci"), "--max-age", "0"])
+
+    assert result.exit_code == 0
+    assert "Removed 2 unused exports" in result.output
+    assert not list((tmp_path / "ci" / "exports").glob("*/*/*.html"))
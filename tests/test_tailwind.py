@@ -0,0 +1,124 @@
+"""Tests for the tailwind.py module.
+
+This module contains tests for compiling the index stylesheet at build time.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from marimushka.export import main
+from marimushka.tailwind import STYLESHEET_PATH, build_stylesheet, compile_css, extract_classes, utility
+
+PAGE = """<html><head>
+<script src="https://cdn.tailwindcss.com"></script>
+</head><body class="bg-white text-gray-800">
+<div class="grid grid-cols-1 sm:grid-cols-2 md:grid-cols-3 p-4 px-3 py-0.5">
+<a class="bg-blue-500 hover:bg-blue-600 w-1/2" href="x.html">x</a>
+</div></body></html>"""
+
+
+class TestUtility:
+    """Tests for translating single utilities."""
+
+    @pytest.mark.parametrize(
+        ("name", "declarations"),
+        [
+            ("p-4", "padding:1rem"),
+            ("py-0.5", "padding-top:0.125rem;padding-bottom:0.125rem"),
+            ("mx-auto", "margin-left:auto;margin-right:auto"),
+            ("w-1/2", "width:50%"),
+            ("h-auto", "height:auto"),
+            ("max-w-4xl", "max-width:56rem"),
+            ("grid-cols-3", "grid-template-columns:repeat(3,minmax(0,1fr))"),
+            ("rounded-lg", "border-radius:0.5rem"),
+            ("border", "border-width:1px"),
+            ("border-gray-200", "border-color:#e5e7eb"),
+            ("text-2xl", "font-size:1.5rem;line-height:2rem"),
+            ("text-white", "color:#fff"),
+            ("font-bold", "font-weight:700"),
+            ("shadow-sm", "box-shadow:0 1px 2px 0 rgb(0 0 0 / 0.05)"),
+        ],
+    )
+    def test_supported(self, name, declarations):
+        """Test that supported utilities compile to the Tailwind declarations."""
+        assert utility(name)[1] == declarations
+
+    def test_unsupported(self):
+        """Test that unknown classes are not compiled."""
+        assert utility("my-custom-card") is None
+        assert utility("bg-chartreuse-500") is None
+
+
+class TestBuildStylesheet:
+    """Tests for the build_stylesheet function."""
+
+    def test_variants(self):
+        """Test that breakpoints become ordered media queries and hover a pseudo class."""
+        css, unsupported = build_stylesheet(extract_classes(PAGE))
+
+        assert not unsupported
+        assert r".hover\:bg-blue-600:hover{background-color:#2563eb}" in css
+        assert r".py-0\.5{" in css
+        assert r".w-1\/2{width:50%}" in css
+        assert css.index("@media (min-width:640px)") < css.index("@media (min-width:768px)")
+        # Padding shorthands come before the axis utilities they are combined with
+        assert css.index(".p-4{") < css.index(".px-3{")
+
+    def test_unknown_variant(self):
+        """Test that classes with unknown variants are reported."""
+        _, unsupported = build_stylesheet({"dark:bg-black", "p-4"})
+        assert unsupported == {"dark:bg-black"}
+
+
+class TestCompileCss:
+    """Tests for the compile_css function."""
+
+    def test_inline(self):
+        """Test that the CDN script is replaced by an inline stylesheet."""
+        html, stylesheet = compile_css(PAGE, mode="inline")
+
+        assert "cdn.tailwindcss.com" not in html
+        assert "<style>" in html
+        assert ".bg-white{background-color:#fff}" in html
+        assert stylesheet is None
+
+    def test_link(self):
+        """Test that the CDN script is replaced by a link to the stylesheet."""
+        html, stylesheet = compile_css(PAGE, mode="link")
+
+        assert "cdn.tailwindcss.com" not in html
+        assert f'<link rel="stylesheet" href="{STYLESHEET_PATH}">' in html
+        assert ".bg-white{background-color:#fff}" in stylesheet
+
+    def test_cdn(self):
+        """Test that cdn mode leaves the page untouched."""
+        assert compile_css(PAGE, mode="cdn") == (PAGE, None)
+
+    def test_without_cdn_script(self):
+        """Test that pages without the CDN script are left untouched."""
+        assert compile_css("<html></html>", mode="link") == ("<html></html>", None)
+
+    def test_invalid_mode(self):
+        """Test that an invalid mode raises a ValueError."""
+        with pytest.raises(ValueError, match="Invalid Tailwind mode"):
+            compile_css(PAGE, mode="postcss")
+
+
+@patch("marimushka.notebook.Notebook.export")
+def test_bundled_template_fully_compiled(mock_export, resource_dir, tmp_path):
+    """Test that every class of the bundled template has a build-time rule."""
+    # Execute
+    html = main(
+        output=tmp_path,
+        notebooks=resource_dir / "notebooks",
+        apps=resource_dir / "apps",
+        notebooks_wasm=resource_dir / "notebooks_wasm",
+        tailwind="link",
+    )
+
+    # Assert
+    _, unsupported = build_stylesheet(extract_classes(html))
+    assert not unsupported
+    assert "cdn.tailwindcss.com" not in html
+    assert (tmp_path / STYLESHEET_PATH).exists()
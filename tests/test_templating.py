@@ -0,0 +1,56 @@
+"""Tests for the templating.py module.
+
+This module contains tests for the shared Jinja2 environments and the bytecode cache.
+"""
+
+import os
+
+import jinja2
+
+from marimushka.cache import UV_CACHE_ENV, cache_dir, use_cache_dir
+from marimushka.templating import BUNDLED_TEMPLATES, COMPILED_VERSION, clear_environments, get_environment
+
+
+def test_environment_is_reused(resource_dir):
+    """Test that one environment is shared per template directory."""
+    env = get_environment(resource_dir / "templates")
+    assert get_environment(resource_dir / "templates" / ".." / "templates") is env
+    assert get_environment(BUNDLED_TEMPLATES) is not env
+
+    clear_environments()
+    assert get_environment(resource_dir / "templates") is not env
+
+
+def test_bytecode_cache_is_written(resource_dir):
+    """Test that compiled templates are stored in the marimushka cache directory."""
+    get_environment(resource_dir / "templates").get_template("tailwind.html.j2")
+    assert list(cache_dir("jinja").glob("__jinja2_*.cache"))
+
+
+def test_bundled_templates_load_from_source_without_precompiled_modules():
+    """Test that a source tree without precompiled modules renders the bundled template."""
+    assert not (BUNDLED_TEMPLATES / "_compiled" / COMPILED_VERSION).exists()
+    env = get_environment(BUNDLED_TEMPLATES)
+    assert isinstance(env.loader, jinja2.FileSystemLoader)
+    assert "<html" in env.get_template("tailwind.html.j2").render(notebooks=[], apps=[], notebooks_wasm=[])
+
+
+def test_cache_dir_location(monkeypatch, tmp_path):
+    """Test the lookup order of the cache directory."""
+    monkeypatch.delenv("MARIMUSHKA_CACHE_DIR")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert cache_dir() == tmp_path / "marimushka"
+    assert cache_dir("jinja") == tmp_path / "marimushka" / "jinja"
+
+
+def test_use_cache_dir(monkeypatch, tmp_path):
+    """Test that a cache directory is used for marimushka and uv while the block runs, and restored after."""
+    monkeypatch.delenv(UV_CACHE_ENV, raising=False)
+    before = cache_dir()
+
+    with use_cache_dir(tmp_path / "ci") as root:
+        assert cache_dir("exports") == root / "exports"
+        assert os.environ[UV_CACHE_ENV] == str(tmp_path / "ci" / "uv")
+
+    assert cache_dir() == before
+    assert UV_CACHE_ENV not in os.environ
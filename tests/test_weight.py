@@ -0,0 +1,108 @@
+"""Tests for the weight.py module.
+
+This module contains tests for measuring exported pages and enforcing size budgets.
+"""
+
+import pytest
+from typer.testing import CliRunner
+
+from marimushka.export import app, main
+from marimushka.notebook import Kind, Notebook
+from marimushka.weight import WeightReport, measure, parse_budgets, parse_size
+
+PNG = "data:image/png;base64," + "A" * 1000
+
+
+def _html(padding=0):
+    """Return an exported page with inline code, an external script and a data URI."""
+    return (
+        "<html><head>"
+        '<script src="https://cdn.example/marimo.js"></script>'
+        "<script>console.log(1)</script>"
+        "<style>body{margin:0}</style>"
+        f'</head><body><img src="{PNG}">{" " * padding}</body></html>'
+    )
+
+
+def _page(path, padding=0):
+    """Write an exported page with inline code, an external script and a data URI."""
+    path.write_text(_html(padding))
+    return path
+
+
+def test_measure(resource_dir, tmp_path):
+    """Test that inline scripts, styles and data URIs are counted separately."""
+    nb = Notebook(resource_dir / "notebooks" / "fibonacci.py")
+    page = _page(tmp_path / "fibonacci.html", padding=10_000)
+
+    weight = measure(nb, page, budget=5_000)
+
+    assert weight.total == page.stat().st_size
+    assert weight.scripts == len("console.log(1)")
+    assert weight.styles == len("body{margin:0}")
+    assert weight.data_uris == len(PNG)
+    assert weight.compressed < weight.total / 5
+    assert weight.over_budget
+
+
+def test_parse_budgets():
+    """Test parsing of sizes and per-kind budgets."""
+    assert parse_budgets(["app=5MB", "notebook = 750 kB"]) == {Kind.APP: 5_000_000, Kind.NB: 750_000}
+    assert parse_size("1 MiB") == 1024**2
+    with pytest.raises(ValueError, match="Invalid size"):
+        parse_size("5 parsecs")
+    with pytest.raises(ValueError, match="Must be KIND=SIZE"):
+        parse_budgets(["5MB"])
+    with pytest.raises(ValueError, match="Invalid Kind"):
+        parse_budgets(["slides=5MB"])
+
+
+@pytest.mark.parametrize("value", [2.5, True, -1, ["1 MB"], {"size": 1}])
+def test_parse_size_of_toml_values(value):
+    """Test that numbers in a header count bytes and other TOML values are rejected."""
+    if isinstance(value, float):
+        assert parse_size(value) == 2
+    else:
+        with pytest.raises(ValueError, match="Invalid size"):
+            parse_size(value)
+
+
+def test_header_budget_overrides_kind(tmp_path):
+    """Test that a budget in the PEP 723 header takes precedence over the budget of the kind."""
+    source = tmp_path / "heavy.py"
+    source.write_text('# /// script\n# dependencies = ["marimo"]\n#\n# [tool.marimushka]\n# budget = "20 MB"\n# ///\n')
+    report = WeightReport({Kind.NB: 1000})
+
+    assert report.budget(Notebook(source)) == 20_000_000
+    assert report.budget(Notebook(source, Kind.APP)) == 20_000_000
+    source.write_text("import marimo\n")
+    assert report.budget(Notebook(source)) == 1000
+    assert report.budget(Notebook(source, Kind.APP)) is None
+    source.write_text('# /// script\n# dependencies = ["marimo"]\n#\n# [tool.marimushka]\n# budget = [1]\n# ///\n')
+    with pytest.raises(ValueError, match="Invalid budget in the header of .*heavy.py"):
+        report.budget(Notebook(source))
+
+
+def test_build_fails_over_budget(resource_dir, tmp_path, fake_export):
+    """Test that a page over budget is reported and fails the build after the site is written."""
+    fake_export(lambda nb: _html(padding=5_000 if nb.path.stem == "penguins" else 0))
+    folders = {"notebooks": resource_dir / "notebooks", "apps": resource_dir / "apps", "notebooks_wasm": None}
+    main(output=tmp_path / "ok", budgets=["notebook=10kB"], **folders)
+    with pytest.raises(ValueError, match=r"1 exported pages exceed .*/penguins.html \(6.\d kB > 5.0 kB\)"):
+        main(output=tmp_path / "site", budgets=["notebook=5kB", "app=1MB"], **folders)
+
+    assert (tmp_path / "site" / "index.html").is_file()
+
+
+def test_cli_reports_budget_without_traceback(resource_dir, tmp_path, fake_export):
+    """Test that the command logs pages over budget and invalid options and exits with status 1."""
+    fake_export(lambda nb: _html())
+    folders = ["-n", str(resource_dir / "notebooks"), "-a", str(resource_dir / "apps"), "-nw", str(tmp_path / "none")]
+
+    result = CliRunner().invoke(app, ["export", "-o", str(tmp_path / "site"), "--budget", "app=10B", *folders])
+    assert result.exit_code == 1
+    assert not isinstance(result.exception, ValueError)
+
+    result = CliRunner().invoke(app, ["export", "-o", str(tmp_path / "site"), "--jobs", "0", *folders])
+    assert result.exit_code == 1
+    assert not isinstance(result.exception, ValueError)
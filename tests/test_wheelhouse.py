@@ -0,0 +1,158 @@
+"""Tests for the wheelhouse.py module.
+
+This module contains tests for finding the wheels the notebooks need in a directory
+of prebuilt wheels, fetching them, and exporting with the package index disabled.
+"""
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from typer.testing import CliRunner
+
+from marimushka.export import app, main
+from marimushka.lockfile import compile_lock
+from marimushka.notebook import Notebook
+from marimushka.wheelhouse import (
+    UV_FIND_LINKS_ENV,
+    UV_NO_INDEX_ENV,
+    fetch_wheels,
+    missing_wheels,
+    requirements,
+    use_wheelhouse,
+    wheels,
+)
+
+# Wheels satisfying every header of the test notebooks
+PREBUILT = [
+    "marimo-0.13.15-py3-none-any.whl",
+    "polars-1.30.0-cp39-abi3-manylinux_2_17_x86_64.manylinux2014_x86_64.whl",
+    "altair-4.2.0-py3-none-any.whl",
+    "pandas-2.3.0-cp312-cp312-manylinux_2_17_x86_64.whl",
+]
+
+
+@pytest.fixture
+def folder(resource_dir, tmp_path):
+    """Return a copy of the test notebooks."""
+    shutil.copytree(resource_dir / "notebooks", tmp_path / "notebooks")
+    return tmp_path / "notebooks"
+
+
+@pytest.fixture
+def wheelhouse(tmp_path):
+    """Return a directory of prebuilt wheels."""
+    root = tmp_path / "wheelhouse"
+    root.mkdir()
+    for name in PREBUILT:
+        (root / name).write_bytes(b"PK")
+    return root
+
+
+def test_wheels(wheelhouse):
+    """Test that wheels are found by canonical name and version, and other files are ignored."""
+    (wheelhouse / "Typing_Extensions-4.12.2-py3-none-any.whl").write_bytes(b"PK")
+    (wheelhouse / "notes.txt").write_text("not a wheel")
+
+    found = wheels(wheelhouse)
+
+    assert found["typing-extensions"] == {"4.12.2"}
+    assert found["polars"] == {"1.30.0"}
+    assert len(found) == 5
+
+
+def test_missing_wheels(folder, wheelhouse):
+    """Test that prebuilt wheels satisfy the headers, and a missing or wrong version is reported."""
+    notebooks = [Notebook(folder / "fibonacci.py"), Notebook(folder / "penguins.py")]
+    assert missing_wheels(notebooks, wheelhouse) == {}
+
+    (wheelhouse / PREBUILT[1]).unlink()
+    (wheelhouse / "altair-5.0.0-py3-none-any.whl").write_bytes(b"PK")
+    (wheelhouse / PREBUILT[2]).unlink()
+
+    assert missing_wheels(notebooks, wheelhouse) == {notebooks[1]: ["polars==1.30.0", "altair==4.2.0"]}
+
+
+def test_requirements_of_a_locked_notebook(folder):
+    """Test that a notebook with a fresh lock needs its pinned versions, and marimo is always needed."""
+    source = folder / "plain.py"
+    source.write_text('# /// script\n# dependencies = ["polars>=1.0"]\n# ///\nimport marimo\n')
+    nb = Notebook(source)
+    assert requirements(nb) == ["polars>=1.0", "marimo"]
+
+    def uv(cmd, cwd=None, **kwargs):
+        (Path(cwd) / "requirements.txt").write_text("marimo==0.13.15\npolars==1.30.0\n")
+        return MagicMock(returncode=0)
+
+    with patch("marimushka.lockfile.subprocess.run", side_effect=uv):
+        compile_lock(nb)
+
+    assert requirements(nb) == ["marimo==0.13.15", "polars==1.30.0"]
+
+
+def test_use_wheelhouse(wheelhouse, tmp_path):
+    """Test that the index is disabled inside the block and the environment restored after it."""
+    os.environ[UV_FIND_LINKS_ENV] = "elsewhere"
+    try:
+        with use_wheelhouse(wheelhouse) as root:
+            assert os.environ[UV_NO_INDEX_ENV] == "1"
+            assert os.environ[UV_FIND_LINKS_ENV] == str(root)
+        assert UV_NO_INDEX_ENV not in os.environ
+        assert os.environ[UV_FIND_LINKS_ENV] == "elsewhere"
+    finally:
+        os.environ.pop(UV_FIND_LINKS_ENV)
+
+    with pytest.raises(ValueError, match="Wheelhouse not found"), use_wheelhouse(tmp_path / "missing"):
+        pass
+
+
+def test_fetch_wheels(folder, tmp_path):
+    """Test that each distinct set of requirements is downloaded once for the build host."""
+    calls = []
+
+    def pip(cmd, **kwargs):
+        calls.append(cmd)
+        dest = Path(cmd[cmd.index("--dest") + 1])
+        for name in PREBUILT:
+            (dest / name).write_bytes(b"PK")
+        return MagicMock(returncode=0)
+
+    notebooks = [Notebook(folder / "fibonacci.py"), Notebook(folder / "penguins.py"), Notebook(folder / "penguins.py")]
+    with patch("marimushka.wheelhouse.subprocess.run", side_effect=pip):
+        missing = fetch_wheels(notebooks, tmp_path / "wh", python_version="3.12", platforms=["manylinux_2_17_x86_64"])
+
+    assert missing == {}
+    assert len(calls) == 2
+    assert calls[0][:3] == ["uvx", "pip", "download"]
+    assert calls[0][calls[0].index("--python-version") + 1] == "3.12"
+    assert calls[0][calls[0].index("--platform") + 1] == "manylinux_2_17_x86_64"
+
+
+def test_fetch_command_reports_missing_wheels(folder, tmp_path):
+    """Test that the fetch command fails and names the requirements it could not fetch."""
+    error = subprocess.CalledProcessError(1, "pip", stderr="No matching distribution found")
+    options = ["--wheelhouse", str(tmp_path / "wh"), "--notebooks", str(folder), "--apps", "", "--notebooks-wasm", ""]
+
+    with patch("marimushka.wheelhouse.subprocess.run", side_effect=error):
+        result = CliRunner().invoke(app, ["fetch", *options])
+
+    assert result.exit_code == 1
+    assert "no wheel for marimo==0.13.15" in result.output
+
+
+def test_main_exports_from_the_wheelhouse(folder, wheelhouse, tmp_path):
+    """Test that exports run with the index disabled and find-links pointing at the wheelhouse."""
+    seen = []
+
+    def export(self, output_dir):
+        seen.append((os.environ.get(UV_NO_INDEX_ENV), os.environ.get(UV_FIND_LINKS_ENV)))
+        return True
+
+    with patch("marimushka.notebook.Notebook.export", export):
+        main(output=tmp_path / "site", notebooks=folder, apps=None, notebooks_wasm=None, wheelhouse=wheelhouse)
+
+    assert seen == [("1", str(wheelhouse))] * 2
+    assert UV_NO_INDEX_ENV not in os.environ